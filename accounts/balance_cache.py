@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from commons.raw_logger import logger
+
+# Set the cached balance unless the cache already holds the same or a later version
+SET_IF_NEWER_SCRIPT = """
+local cached = redis.call('GET', KEYS[1])
+if cached then
+    local cached_version = tonumber(string.match(cached, '^(%d+):'))
+    if cached_version and cached_version >= tonumber(ARGV[1]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class WalletBalanceCache:
+    """
+    Wallet balances cached in Redis as `<version>:<balance>`.
+    Postings write the new balance through after they commit. Writes carrying
+    an older wallet version than the cached one are rejected, so postings that
+    commit out of order can not leave a stale balance in the cache.
+    The cache is best effort, callers fall back to the database when it fails.
+    Balances that fail to be written are dropped and the others expire after
+    BALANCE_CACHE_TIMEOUT, so a missed write can not keep a stale balance long.
+    """
+
+    def key(self, user_id) -> str:
+        return cache.make_and_validate_key(f"wallet_balance:{user_id}")
+
+    def get_client(self, key: str, *, write: bool = False):
+        return cache._cache.get_client(key, write=write)  # type: ignore
+
+    def get(self, user_id) -> Decimal | None:
+        """Get the cached balance of a user, None on a miss"""
+        key = self.key(user_id)
+        try:
+            cached = self.get_client(key).get(key)
+        except RedisError as e:
+            logger.warning(f"Failed to read balance of {user_id} from cache: {e}")
+            return None
+
+        if cached is None:
+            return None
+
+        _, balance = cached.decode().split(":", 1)
+        return Decimal(balance)
+
+    def set(self, user_id, *, balance: Decimal, version: int) -> bool:
+        """Cache the balance of a wallet version. Returns False if it was stale."""
+        key = self.key(user_id)
+        try:
+            client = self.get_client(key, write=True)
+            return bool(
+                client.eval(
+                    SET_IF_NEWER_SCRIPT,
+                    1,
+                    key,
+                    version,
+                    str(balance),
+                    settings.BALANCE_CACHE_TIMEOUT,
+                )
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to write balance of {user_id} to cache: {e}")
+            # The cached balance may be higher than the new one, stakes are
+            # checked against it
+            self.delete_many([user_id])
+            return False
+
+    def delete_many(self, user_ids) -> None:
+        """Drop cached balances, e.g. after wallets are rebuilt outside postings"""
+        keys = [self.key(user_id) for user_id in user_ids]
+        if not keys:
+            return
+
+        try:
+            self.get_client(keys[0], write=True).delete(*keys)
+        except RedisError as e:
+            logger.warning(f"Failed to delete cached balances: {e}")
+
+
+BalanceCache = WalletBalanceCache()
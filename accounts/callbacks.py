@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from accounts.constants import MpesaCallbackKinds
+from accounts.models import MpesaCallback, MpesaPayment, Wallet, Withdrawal
+from accounts.utils import apply_b2c_payment_result, apply_mpesa_stk_result
+from commons.constants import User
+from commons.models import ExternalResponse
+from commons.raw_logger import logger
+
+STK_RESULT_FIELDS = [
+    "result_code",
+    "result_description",
+    "amount",
+    "receipt_number",
+    "transaction_date",
+    "phone_number",
+]
+B2C_RESULT_FIELDS = [
+    "result_type",
+    "result_code",
+    "result_description",
+    "transaction_id",
+]
+
+
+class ProcessMpesaCallbacks:
+    """
+    Process the inbox of M-Pesa callbacks in batches.
+    Pending callbacks are claimed with SKIP LOCKED so that concurrent workers
+    never process the same callback. The payments and withdrawals of a batch
+    are looked up with one query and saved with one bulk update per model.
+    """
+
+    def process(self, *, batch_size: int | None = None) -> int:
+        """Process pending callbacks until none is left and return their number"""
+        batch_size = batch_size or settings.MPESA_CALLBACK_BATCH_SIZE
+        processed_count = 0
+        # Callbacks left pending by this run, kept locally since workers run threads
+        deferred_ids: set = set()
+        while claimed := self.process_batch(batch_size, deferred_ids=deferred_ids):
+            processed_count += len(claimed) - len(deferred_ids.intersection(claimed))
+
+        logger.info(f"Processed {processed_count} M-Pesa callbacks.")
+        return processed_count
+
+    def process_batch(self, batch_size: int, *, deferred_ids: set) -> list:
+        """Process a batch of pending callbacks and return the ids claimed.
+        The ids of callbacks left pending are added to `deferred_ids`."""
+        with transaction.atomic():
+            callbacks = list(
+                MpesaCallback.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True)
+                .exclude(id__in=deferred_ids)
+                .order_by("created_at")[:batch_size]
+            )
+            if not callbacks:
+                return []
+
+            try:
+                with transaction.atomic():
+                    processed = self.apply_callbacks(callbacks)
+            except Exception as e:
+                logger.error(f"Failed to process callbacks in a batch: {e}")
+                processed = self.apply_callbacks_one_by_one(callbacks)
+
+            # Left pending for the next run
+            deferred_ids.update(
+                callback.id for callback in callbacks if callback not in processed
+            )
+            now = datetime.now()
+            MpesaCallback.objects.filter(
+                id__in=[callback.id for callback in processed]
+            ).update(processed_at=now, updated_at=now)
+
+        return [callback.id for callback in callbacks]
+
+    def apply_callbacks_one_by_one(self, callbacks: list) -> list:
+        """Isolate the callbacks that fail. They are left pending to be replayed."""
+        processed = []
+        for callback in callbacks:
+            try:
+                with transaction.atomic():
+                    processed += self.apply_callbacks([callback])
+            except Exception as e:
+                logger.error(f"Failed to process {callback}: {e}")
+
+        return processed
+
+    def apply_callbacks(self, callbacks: list) -> list:
+        """Apply the callbacks to their requests and return the processed ones"""
+        stk_callbacks = {
+            callback.request_id: callback
+            for callback in callbacks
+            if callback.kind == MpesaCallbackKinds.STKPUSH.value
+        }
+        b2c_callbacks = {
+            callback.request_id: callback
+            for callback in callbacks
+            if callback.kind == MpesaCallbackKinds.B2C.value
+        }
+        processed = []
+
+        if stk_callbacks:
+            mpesa_payments = list(
+                MpesaPayment.objects.filter(checkout_request_id__in=stk_callbacks)
+            )
+            for mpesa_payment in mpesa_payments:
+                callback = stk_callbacks.pop(mpesa_payment.checkout_request_id)
+                apply_mpesa_stk_result(mpesa_payment, callback.payload)
+                processed.append(callback)
+            self.bulk_save(MpesaPayment, mpesa_payments, STK_RESULT_FIELDS)
+
+        if b2c_callbacks:
+            withdrawals = list(
+                Withdrawal.objects.filter(conversation_id__in=b2c_callbacks)
+            )
+            for withdrawal in withdrawals:
+                callback = b2c_callbacks.pop(withdrawal.conversation_id)
+                apply_b2c_payment_result(withdrawal, callback.payload)
+                processed.append(callback)
+            self.bulk_save(Withdrawal, withdrawals, B2C_RESULT_FIELDS)
+
+        return processed + self.get_expired_orphans(
+            [*stk_callbacks.values(), *b2c_callbacks.values()]
+        )
+
+    def get_expired_orphans(self, orphans: list) -> list:
+        """
+        Callbacks can arrive before their request is committed, e.g. while the
+        rest of a payouts batch is being sent. Wait for the request a while
+        before dropping the callback.
+        """
+        expires_at = datetime.now() - timedelta(
+            seconds=settings.MPESA_CALLBACK_ORPHAN_TIMEOUT
+        )
+        expired = []
+        for callback in orphans:
+            if callback.created_at < expires_at:
+                logger.warning(f"No request found for {callback}. Dropping it.")
+                expired.append(callback)
+            else:
+                logger.info(f"No request found for {callback} yet.")
+
+        return expired
+
+    def bulk_save(self, model, objs: list, fields: list[str]) -> None:
+        """Update the objects at once, then send the post_save signal of each.
+        Deposits are credited by the post_save signal of their payment."""
+        if not objs:
+            return
+
+        ExternalResponse.objects.save_pending(objs)
+        now = datetime.now()
+        for obj in objs:
+            obj.updated_at = now
+
+        model.objects.bulk_update(
+            objs, [*fields, "external_response_record", "updated_at"]
+        )
+        # Lock the wallets in order first, postings take them one at a time
+        Wallet.objects.lock_many(
+            User.objects.filter(
+                phone_number__in=[obj.phone_number for obj in objs]
+            ).values_list("id", flat=True)
+        )
+        for obj in objs:
+            post_save.send(
+                sender=model,
+                instance=obj,
+                created=False,
+                update_fields=None,
+                raw=False,
+                using=obj._state.db,
+            )
+
+
+MpesaCallbackProcessor = ProcessMpesaCallbacks()
@@ -81,6 +81,11 @@ class B2CMpesaCommandIDs(str, Enum):
     PROMOTIONPAYMENT = "PromotionPayment"
 
 
+class MpesaCallbackKinds(str, Enum):
+    STKPUSH = "STKPUSH"
+    B2C = "B2C"
+
+
 MPESA_WHITE_LISTED_IPS = [
     "196.201.214.200",
     "196.201.214.206",
@@ -95,3 +100,8 @@ MPESA_WHITE_LISTED_IPS = [
     "196.201.212.74",
     "196.201.212.69",
 ]
+
+
+class ExportFormats(str, Enum):
+    CSV = "csv"
+    JSONL = "jsonl"
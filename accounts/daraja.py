@@ -0,0 +1,86 @@
+import os
+import threading
+from time import perf_counter
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from commons.metrics import Metrics
+from commons.raw_logger import logger
+
+
+class DarajaClient:
+    """
+    HTTP client for the M-Pesa Daraja API.
+    Every worker process keeps a pool of keep-alive connections to Safaricom
+    instead of opening a new TLS connection per call.
+
+    Failed connections are retried with a jittered exponential backoff since
+    the request never reached M-Pesa. Timeouts and server errors are only
+    retried for idempotent GET calls, payments are never sent twice.
+    """
+
+    def __init__(self) -> None:
+        self._session: requests.Session | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """Session of the current process. Forked workers create their own."""
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self.create_session()
+                    self._pid = os.getpid()
+
+        return self._session
+
+    def create_session(self) -> requests.Session:
+        retry = Retry(
+            total=settings.MPESA_MAX_RETRIES,
+            allowed_methods=frozenset(["GET"]),
+            status_forcelist=(429, 500, 502, 503, 504),
+            backoff_factor=settings.MPESA_RETRY_BACKOFF,
+            backoff_jitter=settings.MPESA_RETRY_BACKOFF,
+            backoff_max=10,
+            raise_on_status=False,  # Return the last response once retries run out
+        )
+        adapter = HTTPAdapter(pool_maxsize=settings.MPESA_POOL_SIZE, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def request(self, method: str, url: str, *, endpoint: str, **kwargs):
+        """Send a request and record its latency under the endpoint name"""
+        kwargs.setdefault(
+            "timeout", (settings.MPESA_CONNECT_TIMEOUT, settings.MPESA_READ_TIMEOUT)
+        )
+        outcome = "error"
+        started_at = perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            seconds = perf_counter() - started_at
+            logger.info(f"Daraja {endpoint} call: {outcome} in {seconds:.3f}s")
+            Metrics.observe(
+                "daraja_request_seconds", seconds, endpoint=endpoint, outcome=outcome
+            )
+
+    def get(self, url: str, *, endpoint: str, **kwargs):
+        return self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    def post(self, url: str, *, endpoint: str, **kwargs):
+        return self.request("POST", url, endpoint=endpoint, **kwargs)
+
+
+Daraja = DarajaClient()
@@ -0,0 +1,110 @@
+import csv
+import json
+import zlib
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from accounts.constants import ExportFormats
+
+TRANSACTION_EXPORT_FIELDS = [
+    "id",
+    "created_at",
+    "external_transaction_id",
+    "user_id",
+    "user__phone_number",
+    "cash_flow",
+    "type",
+    "status",
+    "service",
+    "amount",
+    "fee",
+    "tax",
+    "charge",
+    "initial_balance",
+    "final_balance",
+    "description",
+]
+
+EXPORT_CONTENT_TYPES = {
+    ExportFormats.CSV.value: "text/csv",
+    ExportFormats.JSONL.value: "application/x-ndjson",
+}
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """Encode values such as phone numbers by their string representation."""
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return str(o)
+
+
+class Echo:
+    """File-like object whose writes return the written value."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def export_transactions(
+    transactions, *, export_format: str, chunk_size: int = 2000
+) -> Iterator[str]:
+    """
+    Stream transactions as CSV or JSON lines.
+    Rows are read with a server-side cursor so memory use does not grow with the export.
+    """
+    rows = (
+        transactions.order_by("created_at", "id")
+        .values_list(*TRANSACTION_EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    if export_format == ExportFormats.CSV.value:
+        writer = csv.writer(Echo())
+        yield writer.writerow(TRANSACTION_EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+
+    else:
+        for row in rows:
+            yield (
+                json.dumps(
+                    dict(zip(TRANSACTION_EXPORT_FIELDS, row)), cls=ExportJSONEncoder
+                )
+                + "\n"
+            )
+
+
+def encode_stream(
+    chunks: Iterable[str], *, compress: bool = False, buffer_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    """
+    Encode a stream of text into blocks of about `buffer_size` bytes.
+    Blocks are gzipped when `compress` is set.
+    """
+    # A wbits offset of 16 writes a gzip header and trailer
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buffer: list[bytes] = []
+    buffered = 0
+
+    for chunk in chunks:
+        data = chunk.encode()
+        buffer.append(data)
+        buffered += len(data)
+
+        if buffered >= buffer_size:
+            block = b"".join(buffer)
+            buffer, buffered = [], 0
+            if compressor:
+                block = compressor.compress(block)
+            if block:
+                yield block
+
+    block = b"".join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
@@ -0,0 +1,18 @@
+from django_filters import rest_framework as filters
+
+from accounts.models import Transaction
+
+
+class TransactionFilter(filters.FilterSet):
+    """Filter transactions by their state and by when they were created."""
+
+    created_after = filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="gte"
+    )
+    created_before = filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="lt"
+    )
+
+    class Meta:
+        model = Transaction
+        fields = ["cash_flow", "type", "status"]
@@ -0,0 +1,322 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from phone_gen import PhoneNumber
+from rest_framework.exceptions import ValidationError
+
+from accounts.callbacks import MpesaCallbackProcessor
+from accounts.constants import (
+    TransactionCashFlow,
+    TransactionServices,
+    TransactionStatuses,
+    TransactionTypes,
+)
+from accounts.models import MpesaPayment, Transaction, Wallet, Withdrawal
+from accounts.payouts import PayoutDispatcher
+from accounts.simulator import DarajaSimulator
+from accounts.utils import trigger_mpesa_stkpush_payment
+from commons.raw_logger import logger
+from commons.serializers import UserPhoneNumberField
+from commons.utils import calculate_b2c_withdrawal_charge
+from users.models import User
+
+
+def percentiles(latencies: list[float]) -> dict:
+    """Nearest rank percentiles of the latencies, in seconds"""
+    if not latencies:
+        return {}
+
+    latencies = sorted(latencies)
+    return {
+        f"p{rank}": latencies[max(math.ceil(rank / 100 * len(latencies)) - 1, 0)]
+        for rank in (50, 90, 99)
+    } | {"max": latencies[-1]}
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class PaymentsLoadTest:
+    """
+    Drive concurrent deposits and withdrawals against the Daraja simulator.
+    The app is served from a background thread so that the simulator posts its
+    results to the real callback views. In place of the Celery workers, the
+    callbacks inbox is processed and payouts are dispatched in this process.
+    Every user is first credited what they withdraw, since payouts are only sent
+    to users who can afford them. Then every user deposits and withdraws once,
+    at the same time. The report holds end to end
+    latency percentiles and checks the ledger of every user.
+    Only run it against a development database, the users it creates are kept.
+    """
+
+    def __init__(
+        self,
+        *,
+        users: int,
+        concurrency: int = 10,
+        deposit_amount: int = 100,
+        withdrawal_amount: int = 50,
+        timeout: float = 120,
+        **simulator_options,
+    ) -> None:
+        self.users_count = users
+        self.concurrency = concurrency
+        self.deposit_amount = deposit_amount
+        self.withdrawal_amount = withdrawal_amount
+        self.timeout = timeout
+        self.simulator_options = simulator_options
+
+    def run(self) -> dict:
+        simulator = DarajaSimulator(**self.simulator_options)
+        simulator.start()
+        app_server = ThreadedWSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler)
+        app_server.set_app(WSGIHandler())
+        threading.Thread(target=app_server.serve_forever, daemon=True).start()
+        app_url = "http://127.0.0.1:{}".format(app_server.server_address[1])
+
+        stopped = threading.Event()
+        worker = threading.Thread(target=self.process_callbacks, args=(stopped,))
+        try:
+            with override_settings(
+                **simulator.urls,
+                MPESA_CALLBACK_URL=app_url + reverse("mpesa:stkpush-callback"),
+                MPESA_B2C_RESULT_URL=app_url + reverse("mpesa:withdrawal-result"),
+                MPESA_B2C_QUEUE_TIMEOUT_URL=app_url
+                + reverse("mpesa:withdrawal-timeout"),
+            ):
+                # Tokens of the real API are not accepted by the simulator
+                cache.delete_many(["mpesa_access_token", "mpesa_b2c_access_token"])
+                worker.start()
+                return self.drive(self.create_users())
+        finally:
+            stopped.set()
+            if worker.is_alive():
+                worker.join()
+            simulator.stop()
+            app_server.shutdown()
+            app_server.server_close()
+            cache.delete_many(["mpesa_access_token", "mpesa_b2c_access_token"])
+
+    def create_users(self) -> list[User]:
+        phone_field = UserPhoneNumberField()
+        phone_numbers: set[str] = set()
+        while len(phone_numbers) < self.users_count:
+            try:
+                phone_numbers.add(
+                    phone_field.to_internal_value(
+                        PhoneNumber("KE").get_mobile(full=True)
+                    )
+                )
+            except ValidationError:
+                continue  # Not every generated number is accepted by the app
+            phone_numbers -= set(
+                str(phone_number)
+                for phone_number in User.objects.filter(
+                    phone_number__in=phone_numbers
+                ).values_list("phone_number", flat=True)
+            )
+
+        users = [User(phone_number=phone_number) for phone_number in phone_numbers]
+        for user in users:
+            user.set_unusable_password()
+
+        return User.objects.bulk_create(users)
+
+    @property
+    def withdrawal_total(self) -> Decimal:
+        """What a withdrawal debits, including the B2C charge"""
+        return Decimal(
+            self.withdrawal_amount
+            + calculate_b2c_withdrawal_charge(self.withdrawal_amount)
+        )
+
+    def fund(self, users: list[User]) -> None:
+        """Credit every user what they withdraw"""
+        Transaction.objects.bulk_post(
+            [
+                Transaction(
+                    external_transaction_id=f"LOADTEST{user.id.hex}",
+                    cash_flow=TransactionCashFlow.INWARD.value,
+                    type=TransactionTypes.BONUS.value,
+                    status=TransactionStatuses.SUCCESSFUL.value,
+                    service=TransactionServices.MAJIBU.value,
+                    amount=self.withdrawal_total,
+                    description="Load test funding",
+                    user=user,
+                )
+                for user in users
+            ]
+        )
+
+    def process_callbacks(self, stopped: threading.Event) -> None:
+        """Stand in for the Celery worker processing the callbacks inbox"""
+        try:
+            while not stopped.wait(0.05):
+                MpesaCallbackProcessor.process()
+        finally:
+            connection.close()
+
+    def deposit(self, user: User) -> None:
+        try:
+            trigger_mpesa_stkpush_payment(self.deposit_amount, str(user.phone_number))
+        except Exception as e:
+            logger.warning(f"Load test deposit of {user} failed: {e}")
+        finally:
+            connection.close()
+
+    def withdraw(self, users: list[User]) -> None:
+        try:
+            for user in users:
+                PayoutDispatcher.enqueue(user=user, amount=self.withdrawal_amount)
+            PayoutDispatcher.dispatch()
+        finally:
+            connection.close()
+
+    def drive(self, users: list[User]) -> dict:
+        phone_numbers = [str(user.phone_number) for user in users]
+        logger.info(f"Load testing payments of {len(users)} users...")
+        self.fund(users)
+
+        started_at = datetime.now()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            executor.submit(self.withdraw, users)
+            list(executor.map(self.deposit, users))
+        requests_seconds = (datetime.now() - started_at).total_seconds()
+
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline and (
+            MpesaPayment.objects.filter(
+                phone_number__in=phone_numbers, result_code__isnull=True
+            ).exists()
+            or Withdrawal.objects.filter(
+                phone_number__in=phone_numbers, result_code__isnull=True
+            ).exists()
+        ):
+            time.sleep(0.1)
+
+        return {
+            "users": len(users),
+            "requests_seconds": requests_seconds,
+            "deposits": self.report_deposits(phone_numbers, started_at),
+            "withdrawals": self.report_withdrawals(phone_numbers, started_at),
+            "ledger_errors": self.check_ledger(users),
+        }
+
+    def report_deposits(self, phone_numbers: list[str], started_at: datetime) -> dict:
+        mpesa_payments = list(
+            MpesaPayment.objects.filter(phone_number__in=phone_numbers)
+        )
+        credited_at = dict(
+            Transaction.objects.filter(
+                type=TransactionTypes.DEPOSIT.value,
+                external_transaction_id__in=[
+                    mpesa_payment.receipt_number for mpesa_payment in mpesa_payments
+                ],
+            ).values_list("external_transaction_id", "created_at")
+        )
+        completed = [p for p in mpesa_payments if p.result_code is not None]
+        return {
+            "requested": len(phone_numbers),
+            "accepted": len(mpesa_payments),
+            "succeeded": sum(1 for p in completed if p.result_code == 0),
+            "failed": sum(1 for p in completed if p.result_code != 0),
+            "pending": len(mpesa_payments) - len(completed),
+            "latency": percentiles(
+                [
+                    (
+                        credited_at.get(p.receipt_number, p.updated_at) - started_at
+                    ).total_seconds()
+                    for p in completed
+                ]
+            ),
+        }
+
+    def report_withdrawals(
+        self, phone_numbers: list[str], started_at: datetime
+    ) -> dict:
+        withdrawals = list(Withdrawal.objects.filter(phone_number__in=phone_numbers))
+        completed = [w for w in withdrawals if w.result_code is not None]
+        return {
+            "requested": len(phone_numbers),
+            "accepted": len(withdrawals),
+            "succeeded": sum(1 for w in completed if w.result_code == 0),
+            "failed": sum(1 for w in completed if w.result_code != 0),
+            "pending": len(withdrawals) - len(completed),
+            "latency": percentiles(
+                [(w.updated_at - started_at).total_seconds() for w in completed]
+            ),
+        }
+
+    def check_ledger(self, users: list[User]) -> list[str]:
+        """Compare every user's ledger to the payments M-Pesa accepted"""
+        expected_balances: dict = defaultdict(Decimal)
+        expected_counts: dict = defaultdict(int)
+        users_by_phone = {str(user.phone_number): user.id for user in users}
+
+        # Every user was funded with what they withdraw
+        for user in users:
+            expected_balances[user.id] += self.withdrawal_total
+            expected_counts[user.id] += 1
+
+        for mpesa_payment in MpesaPayment.objects.filter(
+            phone_number__in=users_by_phone, result_code=0
+        ):
+            user_id = users_by_phone[mpesa_payment.phone_number]
+            expected_balances[user_id] += Decimal(mpesa_payment.amount)
+            expected_counts[user_id] += 1
+
+        # Withdrawals are debited when M-Pesa accepts the request
+        for withdrawal in Withdrawal.objects.filter(
+            phone_number__in=users_by_phone, response_code=0
+        ):
+            user_id = users_by_phone[withdrawal.phone_number]
+            expected_balances[user_id] -= withdrawal.transaction_amount + (
+                calculate_b2c_withdrawal_charge(withdrawal.transaction_amount)
+            )
+            expected_counts[user_id] += 1
+
+        wallets = {
+            wallet.user_id: wallet
+            for wallet in Wallet.objects.filter(user_id__in=users_by_phone.values())
+        }
+        transactions = defaultdict(list)
+        for transaction_obj in Transaction.objects.filter(
+            user_id__in=users_by_phone.values()
+        ).order_by("created_at"):
+            transactions[transaction_obj.user_id].append(transaction_obj)
+
+        errors = []
+        for user in users:
+            expected_balance = expected_balances[user.id]
+            wallet = wallets.get(user.id)
+            balance = wallet.balance if wallet else Decimal("0.0")
+            if balance != expected_balance:
+                errors.append(
+                    f"{user}: wallet holds {balance}, expected {expected_balance}"
+                )
+            if len(transactions[user.id]) != expected_counts[user.id]:
+                errors.append(
+                    f"{user}: {len(transactions[user.id])} transactions posted, "
+                    f"expected {expected_counts[user.id]}"
+                )
+
+            previous_final_balance = Decimal("0.0")
+            for transaction_obj in transactions[user.id]:
+                if transaction_obj.initial_balance != previous_final_balance:
+                    errors.append(f"{user}: broken chain at {transaction_obj.id}")
+                previous_final_balance = transaction_obj.final_balance
+
+        return errors
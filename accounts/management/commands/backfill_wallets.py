@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.balance_cache import BalanceCache
+from accounts.models import Transaction, Wallet
+from commons.constants import User
+
+
+class Command(BaseCommand):
+    help = "Build a wallet for every user from the latest transaction in their ledger."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of wallets written per query.",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help=(
+                "Rebuild wallets that already exist. Only use this while no "
+                "transactions are being posted."
+            ),
+        )
+
+    def handle(self, *args, **options) -> None:
+        batch_size = options["batch_size"]
+        overwrite = options["overwrite"]
+
+        user_transactions = Transaction.objects.filter(user=OuterRef("pk"))
+        latest_balance = user_transactions.order_by("-created_at").values(
+            "final_balance"
+        )[:1]
+        transactions_count = (
+            user_transactions.order_by()
+            .values("user")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+
+        users = (
+            User.objects.annotate(
+                ledger_balance=Coalesce(
+                    Subquery(latest_balance), Value(Decimal("0.0"))
+                ),
+                postings=Coalesce(Subquery(transactions_count), Value(0)),
+            )
+            .order_by("id")
+            .values_list("id", "ledger_balance", "postings")
+        )
+
+        wallets: list[Wallet] = []
+        total = 0
+        for user_id, balance, postings in users.iterator(chunk_size=batch_size):
+            wallets.append(Wallet(user_id=user_id, balance=balance, version=postings))
+
+            if len(wallets) >= batch_size:
+                total += self.save_wallets(wallets, overwrite)
+                wallets = []
+
+        if wallets:
+            total += self.save_wallets(wallets, overwrite)
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} wallets."))
+
+    def save_wallets(self, wallets: list[Wallet], overwrite: bool) -> int:
+        """Insert the wallets, skipping or overwriting wallets that already exist"""
+        if overwrite:
+            Wallet.objects.bulk_create(
+                wallets,
+                update_conflicts=True,
+                unique_fields=["user"],
+                update_fields=["balance", "version", "updated_at"],
+            )
+            # Rebuilt wallets may go back to an older version than the cached one
+            BalanceCache.delete_many(wallet.user_id for wallet in wallets)
+        else:
+            Wallet.objects.bulk_create(wallets, ignore_conflicts=True)
+
+        return len(wallets)
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.constants import ExportFormats
+from accounts.exports import encode_stream, export_transactions
+from accounts.filters import TransactionFilter
+from accounts.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Stream transactions matching the filters as a CSV or JSON lines file."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--cash-flow", help="Only export this cash flow.")
+        parser.add_argument("--type", help="Only export this transaction type.")
+        parser.add_argument("--status", help="Only export this transaction status.")
+        parser.add_argument(
+            "--created-after",
+            help="Only export transactions created at or after this ISO 8601 time.",
+        )
+        parser.add_argument(
+            "--created-before",
+            help="Only export transactions created before this ISO 8601 time.",
+        )
+        parser.add_argument(
+            "--format",
+            dest="export_format",
+            choices=[export_format.value for export_format in ExportFormats],
+            default=ExportFormats.CSV.value,
+        )
+        parser.add_argument("--gzip", action="store_true", help="Gzip the export.")
+        parser.add_argument(
+            "--output", help="File to write the export to. Defaults to stdout."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of transactions fetched from the database at a time.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        transaction_filter = TransactionFilter(
+            data={
+                "cash_flow": options["cash_flow"],
+                "type": options["type"],
+                "status": options["status"],
+                "created_after": options["created_after"],
+                "created_before": options["created_before"],
+            },
+            queryset=Transaction.objects.all(),
+        )
+        if not transaction_filter.is_valid():
+            raise CommandError(transaction_filter.errors.as_text())
+
+        if options["gzip"] and not options["output"]:
+            raise CommandError("--gzip requires --output.")
+
+        chunks = export_transactions(
+            transaction_filter.qs,
+            export_format=options["export_format"],
+            chunk_size=options["chunk_size"],
+        )
+
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        with open(options["output"], "wb") as output:
+            for block in encode_stream(chunks, compress=options["gzip"]):
+                output.write(block)
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.constants import DEPOSIT_AMOUNT_CHOICES
+from accounts.loadtest import PaymentsLoadTest
+from accounts.management.commands.run_daraja_simulator import add_simulator_arguments
+
+
+class Command(BaseCommand):
+    help = (
+        "Make concurrent M-Pesa deposits and withdrawals against the Daraja "
+        "simulator and report their latency and the correctness of the ledger."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Number of users created, each deposits and withdraws once.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Number of deposits requested at the same time.",
+        )
+        parser.add_argument(
+            "--deposit-amount",
+            type=int,
+            default=100,
+            choices=DEPOSIT_AMOUNT_CHOICES,
+        )
+        parser.add_argument("--withdrawal-amount", type=int, default=50)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=120,
+            help="Seconds to wait for the results after the last request.",
+        )
+        add_simulator_arguments(parser)
+
+    def handle(self, *args, **options) -> None:
+        if not settings.DEBUG:
+            raise CommandError(
+                "The load test creates users and payments. "
+                "Only run it against a development database with DEBUG on."
+            )
+
+        report = PaymentsLoadTest(
+            users=options["users"],
+            concurrency=options["concurrency"],
+            deposit_amount=options["deposit_amount"],
+            withdrawal_amount=options["withdrawal_amount"],
+            timeout=options["timeout"],
+            callback_delay=options["callback_delay"],
+            failure_rate=options["failure_rate"],
+            result_failure_rate=options["result_failure_rate"],
+            duplicate_rate=options["duplicate_rate"],
+        ).run()
+
+        self.stdout.write(
+            f"Requested payments of {report['users']} users "
+            f"in {report['requests_seconds']:.2f}s."
+        )
+        for flow in ("deposits", "withdrawals"):
+            results = report[flow]
+            latency = " ".join(
+                f"{rank}={seconds:.3f}s" for rank, seconds in results["latency"].items()
+            )
+            self.stdout.write(
+                f"{flow}: requested={results['requested']} "
+                f"accepted={results['accepted']} succeeded={results['succeeded']} "
+                f"failed={results['failed']} pending={results['pending']} {latency}"
+            )
+
+        for error in report["ledger_errors"]:
+            self.stdout.write(self.style.ERROR(error))
+        if report["ledger_errors"]:
+            raise CommandError(f"Found {len(report['ledger_errors'])} ledger errors.")
+
+        self.stdout.write(self.style.SUCCESS("Ledger is consistent."))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from accounts.reconciliation import ReconcileLedger
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify that every transaction starts from the final balance of the one "
+        "before it, resuming from each user's last balance checkpoint."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of transactions fetched from the database at a time.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore the checkpoints and verify every ledger from the start.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        reconciler = ReconcileLedger(
+            chunk_size=options["chunk_size"], full=options["full"]
+        )
+        for drift in reconciler.reconcile():
+            self.stdout.write(
+                self.style.ERROR(
+                    f"User {drift['user_id']}, transaction {drift['transaction_id']}: "
+                    f"{drift['reason']} Expected {drift['expected']}, found {drift['found']}."
+                )
+            )
+
+        summary = (
+            f"Reconciled {reconciler.transactions_count} transactions for "
+            f"{reconciler.users_count} users. "
+            f"Found {reconciler.drifts_count} drifts."
+        )
+        if reconciler.drifts_count:
+            self.stdout.write(self.style.ERROR(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+
+from accounts.simulator import DarajaSimulator
+
+
+def add_simulator_arguments(parser) -> None:
+    parser.add_argument(
+        "--callback-delay",
+        type=float,
+        default=1.0,
+        help="Seconds before STK push and B2C results are posted back.",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="Share of API calls answered with a 503, between 0 and 1.",
+    )
+    parser.add_argument(
+        "--result-failure-rate",
+        type=float,
+        default=0.0,
+        help="Share of results reporting a failed payment, between 0 and 1.",
+    )
+    parser.add_argument(
+        "--duplicate-rate",
+        type=float,
+        default=0.0,
+        help="Share of results posted twice, between 0 and 1.",
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Daraja OAuth, STK push, STK query and B2C "
+        "APIs. Point the M-Pesa URL settings at it to make payments without "
+        "Safaricom."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8010)
+        add_simulator_arguments(parser)
+        parser.add_argument(
+            "--drop-rate",
+            type=float,
+            default=0.0,
+            help="Share of STK push results never posted back, between 0 and 1.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        simulator = DarajaSimulator(
+            host=options["host"],
+            port=options["port"],
+            callback_delay=options["callback_delay"],
+            failure_rate=options["failure_rate"],
+            result_failure_rate=options["result_failure_rate"],
+            duplicate_rate=options["duplicate_rate"],
+            drop_rate=options["drop_rate"],
+        )
+        for setting, url in simulator.urls.items():
+            self.stdout.write(f"{setting}={url}")
+
+        try:
+            simulator.serve_forever()
+        except KeyboardInterrupt:
+            simulator.stop()
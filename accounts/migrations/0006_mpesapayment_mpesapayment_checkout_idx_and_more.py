@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:37
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0005_wallet"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="mpesapayment",
+            index=models.Index(
+                fields=["checkout_request_id"], name="mpesapayment_checkout_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "-created_at"], name="transaction_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:42
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0006_mpesapayment_mpesapayment_checkout_idx_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BalanceCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, null=True)),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.0"),
+                        help_text="Final balance of the last verified transaction.",
+                        max_digits=10,
+                    ),
+                ),
+                (
+                    "transaction_created_at",
+                    models.DateTimeField(
+                        help_text="When the last verified transaction was created."
+                    ),
+                ),
+                (
+                    "transactions_count",
+                    models.PositiveBigIntegerField(
+                        default=0, help_text="Number of transactions verified so far."
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="balance_checkpoint",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-created_at",),
+                "abstract": False,
+            },
+        ),
+    ]
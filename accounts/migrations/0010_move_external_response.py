@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0009_transaction_transaction_search_idx"),
+        ("commons", "0002_externalresponse"),
+    ]
+
+    # Existing rows are linked to their payloads by 0013, in batches
+    operations = [
+        migrations.AddField(
+            model_name="mpesapayment",
+            name="external_response_record",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="commons.externalresponse",
+            ),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="external_response_record",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="commons.externalresponse",
+            ),
+        ),
+        migrations.AddField(
+            model_name="withdrawal",
+            name="external_response_record",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="commons.externalresponse",
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:45
+
+import commons.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0010_move_external_response"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="balancecheckpoint",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="mpesapayment",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="wallet",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="withdrawal",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
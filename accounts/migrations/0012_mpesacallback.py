@@ -0,0 +1,69 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:16
+
+import accounts.constants
+import commons.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0011_alter_balancecheckpoint_id_alter_mpesapayment_id_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MpesaCallback",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=commons.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, null=True)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            (
+                                accounts.constants.MpesaCallbackKinds["STKPUSH"],
+                                "STKPUSH",
+                            ),
+                            (accounts.constants.MpesaCallbackKinds["B2C"], "B2C"),
+                        ],
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "request_id",
+                    models.CharField(
+                        help_text="CheckoutRequestID of STKPush or ConversationID of B2C callbacks.",
+                        max_length=255,
+                    ),
+                ),
+                ("payload", models.JSONField()),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ("-created_at",),
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["created_at"],
+                        name="mpesacallback_pending_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="mpesacallback",
+            constraint=models.UniqueConstraint(
+                fields=("kind", "request_id"), name="mpesacallback_request_uniq"
+            ),
+        ),
+    ]
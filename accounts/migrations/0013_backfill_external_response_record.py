@@ -0,0 +1,92 @@
+# Generated by Django 5.0.6 on 2026-10-19 18:10
+
+import json
+
+from django.db import migrations, transaction
+
+MODELS = ["mpesapayment", "transaction", "withdrawal"]
+BATCH_SIZE = 1000
+
+
+def decode_payload(value):
+    """Payloads were often saved as JSON encoded strings, sometimes twice"""
+    while isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            break
+    return value
+
+
+def get_batches(rows, fields):
+    """Walk the rows by primary key, BATCH_SIZE rows at a time"""
+    rows = rows.order_by("id").values_list("id", *fields)
+    batch = list(rows[:BATCH_SIZE])
+    while batch:
+        yield batch
+        batch = list(rows.filter(id__gt=batch[-1][0])[:BATCH_SIZE])
+
+
+def move_external_responses(apps, schema_editor):
+    """
+    Link every row to an ExternalResponse holding its payload.
+    Each batch commits on its own so that the tables stay writable, and rows
+    that are already linked are skipped so that the backfill can be resumed.
+    """
+    ExternalResponse = apps.get_model("commons", "ExternalResponse")
+    for model_name in MODELS:
+        model = apps.get_model("accounts", model_name)
+        rows = model.objects.filter(
+            external_response__isnull=False, external_response_record__isnull=True
+        )
+        for batch in get_batches(rows, ["external_response"]):
+            records = [
+                (row_id, ExternalResponse(payload=payload))
+                for row_id, external_response in batch
+                if (payload := decode_payload(external_response)) is not None
+            ]
+            with transaction.atomic(using=schema_editor.connection.alias):
+                link_external_responses(model, ExternalResponse, records)
+
+
+def link_external_responses(model, ExternalResponse, records) -> None:
+    ExternalResponse.objects.bulk_create([record for _, record in records])
+    model.objects.bulk_update(
+        [
+            model(id=row_id, external_response_record_id=record.id)
+            for row_id, record in records
+        ],
+        ["external_response_record"],
+    )
+
+
+def restore_external_responses(apps, schema_editor):
+    ExternalResponse = apps.get_model("commons", "ExternalResponse")
+    for model_name in MODELS:
+        model = apps.get_model("accounts", model_name)
+        rows = model.objects.filter(external_response_record__isnull=False)
+        for batch in get_batches(rows, ["external_response_record_id"]):
+            payloads = ExternalResponse.objects.in_bulk(
+                [record_id for _, record_id in batch]
+            )
+            with transaction.atomic(using=schema_editor.connection.alias):
+                model.objects.bulk_update(
+                    [
+                        model(id=row_id, external_response=payloads[record_id].payload)
+                        for row_id, record_id in batch
+                    ],
+                    ["external_response"],
+                )
+
+
+class Migration(migrations.Migration):
+    # Batches commit one at a time instead of locking the tables until the end
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0012_mpesacallback"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_external_responses, restore_external_responses),
+    ]
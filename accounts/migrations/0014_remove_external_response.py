@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-19 18:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0013_backfill_external_response_record"),
+    ]
+
+    # The models stop using the columns, which stay in the database so that
+    # the previous release keeps working during the deploy. A later release
+    # re-runs the backfill for rows written in the meantime and then drops them.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name="mpesapayment",
+                    name="external_response",
+                ),
+                migrations.RemoveField(
+                    model_name="transaction",
+                    name="external_response",
+                ),
+                migrations.RemoveField(
+                    model_name="withdrawal",
+                    name="external_response",
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:45
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0014_remove_external_response"),
+        ("commons", "0003_alter_archivedrecord_id_alter_externalresponse_id"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="mpesapayment",
+            index=models.Index(
+                condition=models.Q(("external_response_record__isnull", False)),
+                fields=["external_response_record"],
+                name="mpesapayment_response_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("external_response_record__isnull", False)),
+                fields=["external_response_record"],
+                name="transaction_response_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="withdrawal",
+            index=models.Index(
+                condition=models.Q(("external_response_record__isnull", False)),
+                fields=["external_response_record"],
+                name="withdrawal_response_idx",
+            ),
+        ),
+    ]
@@ -1,31 +1,124 @@
+from datetime import datetime
 from decimal import Decimal
+from io import StringIO
+from operator import attrgetter
+from typing import Iterable
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, models, transaction
 
+from accounts.balance_cache import BalanceCache
 from accounts.constants import (
     PAYBILL_B2C_DESCRIPTION,
     STKPUSH_DEPOSIT_DESCRPTION,
+    MpesaCallbackKinds,
     TransactionCashFlow,
     TransactionStatuses,
     TransactionTypes,
 )
 from commons.constants import MONETARY_DECIMAL_PLACES
-from commons.models import Base
+from commons.models import Base, ExternalResponse, ExternalResponseMixin
 
 User = get_user_model()
 
+# Characters escaped in the text format of COPY
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_value(value) -> str:
+    """Format a value for the text format of COPY"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    return str(value)
+
 
 class TransactionManager(models.Manager):
     def get_user_balance(self, user) -> Decimal:
         """Get current user balance"""
+        return Wallet.objects.get_user_balance(user)
+
+    def get_cached_user_balance(self, user) -> Decimal:
+        """Get current user balance without hitting the database on a cache hit"""
+        return Wallet.objects.get_cached_balance(user)
+
+    def bulk_post(self, entries: list["Transaction"]) -> list["Transaction"]:
+        """
+        Post many transactions at once.
+        Balances are calculated in memory from one locked wallet read per user,
+        then the entries are written with a single COPY.
+        """
+        if any(entry.user_id is None for entry in entries):
+            raise ValueError("Bulk posted transactions must belong to a user.")
+
+        with transaction.atomic():
+            wallets = Wallet.objects.lock_many(entry.user_id for entry in entries)
+
+            for entry in entries:
+                wallet = wallets[str(entry.user_id)]
+                entry.update_balance_fields(wallet.balance)
+                entry.update_description_field()
+
+                wallet.balance = entry.final_balance
+                wallet.version += 1
+                wallet.updated_at = datetime.now()
+
+            ExternalResponse.objects.save_pending(entries)
+            self.copy_entries(entries)
+            Wallet.objects.bulk_update(
+                wallets.values(), ["balance", "version", "updated_at"]
+            )
+            for wallet in wallets.values():
+                wallet.cache_balance_on_commit()
+
+        return entries
+
+    def copy_entries(self, entries: list["Transaction"]) -> None:
+        """
+        Insert the entries with COPY, which skips the per-row work of
+        bulk_create and is several times faster for large batches.
+        Like bulk_create, it does not send signals.
+        """
+        if not entries:
+            return
+
+        now = datetime.now()
+        fields = self.model._meta.concrete_fields
+        get_values = attrgetter(*(field.attname for field in fields))
+        rows = StringIO()
+        for entry in entries:
+            entry.created_at = entry.updated_at = now
+            rows.write("\t".join(map(copy_value, get_values(entry))) + "\n")
+        rows.seek(0)
+
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", rows)
+
+        for entry in entries:
+            entry._state.adding = False
+            entry._state.db = self.db
+
+    def get_ledger_balance(self, user) -> Decimal:
+        """Get the user balance from the latest transaction in their ledger"""
         latest_transaction = self.filter(user=user).order_by("-created_at").first()
         if latest_transaction:
             return latest_transaction.final_balance
         return Decimal("0.0")
 
 
-class Transaction(Base):
+# Words staff search transactions by. Served by a GIN index on the same expression
+TRANSACTION_SEARCH_VECTOR = SearchVector(
+    "external_transaction_id", "description", config="simple"
+)
+
+
+class Transaction(Base, ExternalResponseMixin):
     external_transaction_id = models.CharField(max_length=255, unique=True)
     initial_balance = models.DecimalField(
         max_digits=10, decimal_places=MONETARY_DECIMAL_PLACES, default=Decimal("0.0")
@@ -60,7 +153,6 @@ class Transaction(Base):
     status = models.CharField(max_length=255, default=TransactionStatuses.PENDING.value)
     service = models.CharField(max_length=255, null=False)
     description = models.TextField()
-    external_response = models.JSONField(null=True, blank=True)
     user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -70,22 +162,29 @@ class Transaction(Base):
     )
 
     objects = TransactionManager()
+    search_vector = TRANSACTION_SEARCH_VECTOR
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="transaction_user_created_idx"
+            ),
+            # Exports stream date ranges across all users in created_at order
+            models.Index(fields=["created_at"], name="transaction_created_idx"),
+            GinIndex(TRANSACTION_SEARCH_VECTOR, name="transaction_search_idx"),
+            models.Index(
+                fields=["external_response_record"],
+                condition=models.Q(external_response_record__isnull=False),
+                name="transaction_response_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.external_transaction_id
 
-    def update_balance_fields(self) -> None:
+    def update_balance_fields(self, initial_final_balance: Decimal) -> None:
         """Auto-calculate initial and final balances"""
-        latest_trans = (
-            Transaction.objects.filter(user=self.user).order_by("-created_at").first()
-        )
-
-        initial_final_balance = (
-            latest_trans.final_balance if latest_trans else Decimal(0.0)
-        )
         charge = Decimal(0.0)
 
         if self.cash_flow == TransactionCashFlow.INWARD.value:
@@ -115,12 +214,158 @@ class Transaction(Base):
 
     def save(self, *args, **kwargs):
         """Auto fill db fields."""
-        self.update_balance_fields()
-        self.update_description_field()
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            # Balances are calculated once, when the transaction is posted.
+            self.update_description_field()
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            if self.user_id:
+                # Postings for this user wait here until the wallet is released
+                wallet = Wallet.objects.lock(self.user_id)
+                self.update_balance_fields(wallet.balance)
+            else:
+                self.update_balance_fields(
+                    Transaction.objects.get_ledger_balance(self.user)
+                )
+
+            self.update_description_field()
+            super().save(*args, **kwargs)
+
+            if self.user_id:
+                wallet.post(self)
+
+
+class WalletManager(models.Manager):
+    def get_user_balance(self, user) -> Decimal:
+        """Get current user balance from the user's wallet"""
+        try:
+            return self.values_list("balance", flat=True).get(user=user)
+        except Wallet.DoesNotExist:
+            # Wallets are created on the first posting or by the `backfill_wallets`
+            # command. Until then, the ledger is the source of truth.
+            return Transaction.objects.get_ledger_balance(user)
+
+    def get_cached_balance(self, user) -> Decimal:
+        """Get current user balance from the cache, filling it from the wallet"""
+        balance = BalanceCache.get(user.id)
+        if balance is not None:
+            return balance
+
+        try:
+            balance, version = self.values_list("balance", "version").get(user=user)
+        except Wallet.DoesNotExist:
+            return Transaction.objects.get_ledger_balance(user)
+
+        BalanceCache.set(user.id, balance=balance, version=version)
+        return balance
+
+    def lock(self, user_id) -> "Wallet":
+        """
+        Get the user's wallet and lock its row until the end of the db transaction.
+        Postings for the same user are serialized while other users are unaffected.
+        """
+        return self.lock_many([user_id])[str(user_id)]
+
+    def lock_many(self, user_ids: Iterable) -> dict[str, "Wallet"]:
+        """Lock the wallets of several users, creating the missing ones.
+        Wallets are locked in user id order so that batches can not deadlock."""
+        user_ids = sorted({str(user_id) for user_id in user_ids})
+        wallets = {
+            str(wallet.user_id): wallet
+            for wallet in self.select_for_update()
+            .filter(user_id__in=user_ids)
+            .order_by("user_id")
+        }
+
+        missing_user_ids = [user_id for user_id in user_ids if user_id not in wallets]
+        if missing_user_ids:
+            # Concurrent postings may race to create a wallet, only one insert wins.
+            self.bulk_create(
+                [
+                    Wallet(
+                        user_id=user_id,
+                        balance=Transaction.objects.get_ledger_balance(user_id),
+                    )
+                    for user_id in missing_user_ids
+                ],
+                ignore_conflicts=True,
+            )
+            wallets.update(
+                {
+                    str(wallet.user_id): wallet
+                    for wallet in self.select_for_update()
+                    .filter(user_id__in=missing_user_ids)
+                    .order_by("user_id")
+                }
+            )
+
+        return wallets
+
+
+class Wallet(Base):
+    """
+    Current balance of a user.
+    Updated in the same db transaction as every posting to the user's ledger
+    so that reading a balance does not have to search the ledger.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="wallet")
+    balance = models.DecimalField(
+        max_digits=10, decimal_places=MONETARY_DECIMAL_PLACES, default=Decimal("0.0")
+    )
+    version = models.PositiveBigIntegerField(
+        default=0, help_text="Incremented on every posting to the wallet."
+    )
+
+    objects = WalletManager()
+
+    def __str__(self):
+        return f"Wallet for {self.user}"
+
+    def post(self, transaction_obj: Transaction) -> None:
+        """Move the wallet to the final balance of a transaction posted to it.
+        The wallet must be locked with `Wallet.objects.lock` first."""
+        self.balance = transaction_obj.final_balance
+        self.version += 1
+        self.save(update_fields=["balance", "version", "updated_at"])
+        self.cache_balance_on_commit()
+
+    def cache_balance_on_commit(self) -> None:
+        """Write the balance through to the cache once the posting is committed"""
+        user_id, balance, version = self.user_id, self.balance, self.version
+        transaction.on_commit(
+            lambda: BalanceCache.set(user_id, balance=balance, version=version)
+        )
+
+
+class BalanceCheckpoint(Base):
+    """
+    Last verified point in a user's ledger.
+    Reconciliation resumes from the checkpoint instead of the start of the ledger.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="balance_checkpoint"
+    )
+    balance = models.DecimalField(
+        max_digits=10,
+        decimal_places=MONETARY_DECIMAL_PLACES,
+        default=Decimal("0.0"),
+        help_text="Final balance of the last verified transaction.",
+    )
+    transaction_created_at = models.DateTimeField(
+        help_text="When the last verified transaction was created."
+    )
+    transactions_count = models.PositiveBigIntegerField(
+        default=0, help_text="Number of transactions verified so far."
+    )
+
+    def __str__(self):
+        return f"Balance checkpoint for {self.user}"
 
 
-class MpesaPayment(Base):
+class MpesaPayment(Base, ExternalResponseMixin):
     """
     Records for Payment done through Mpesa.
 
@@ -197,13 +442,25 @@ class MpesaPayment(Base):
             "transaction completed."
         ),
     )
-    external_response = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["checkout_request_id"], name="mpesapayment_checkout_idx"
+            ),
+            models.Index(
+                fields=["external_response_record"],
+                condition=models.Q(external_response_record__isnull=False),
+                name="mpesapayment_response_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.merchant_request_id
 
 
-class Withdrawal(Base):
+class Withdrawal(Base, ExternalResponseMixin):
     """
     Records any withdrawals initiated by the user
 
@@ -310,7 +567,63 @@ class Withdrawal(Base):
         help_text="Available balance of the Charges Paid account under the B2C shortcode.",
     )
     is_mpesa_registered_customer = models.BooleanField(null=True, blank=True)
-    external_response = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["external_response_record"],
+                condition=models.Q(external_response_record__isnull=False),
+                name="withdrawal_response_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.conversation_id
+
+
+class MpesaCallbackManager(models.Manager):
+    def receive(self, *, kind: str, request_id: str, payload: dict) -> bool:
+        """Add a callback to the inbox. Returns False if it was already received."""
+        _, created = self.get_or_create(
+            kind=kind, request_id=request_id, defaults={"payload": payload}
+        )
+        return created
+
+
+class MpesaCallback(Base):
+    """
+    Inbox of the callbacks received from M-Pesa.
+    Callbacks are keyed by their request id so that the ones M-Pesa retries
+    are only processed once. They are processed in batches in the background.
+    """
+
+    kind = models.CharField(
+        max_length=255, choices=[(tag, tag.value) for tag in MpesaCallbackKinds]
+    )
+    request_id = models.CharField(
+        max_length=255,
+        help_text="CheckoutRequestID of STKPush or ConversationID of B2C callbacks.",
+    )
+    payload = models.JSONField()
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = MpesaCallbackManager()
+
+    class Meta:
+        ordering = ("-created_at",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "request_id"], name="mpesacallback_request_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(processed_at__isnull=True),
+                name="mpesacallback_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} callback {self.request_id}"
@@ -0,0 +1,264 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from accounts.models import Transaction
+from accounts.serializers.mpesa import WithdrawalCreateSerializer
+from accounts.utils import initiate_b2c_payment
+from commons.constants import User
+from commons.locks import Locks
+from commons.raw_logger import logger
+from commons.utils import calculate_b2c_withdrawal_charge, md5_hash
+
+
+class RateLimiter:
+    """Space out calls shared by many threads to at most `rate` per second"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate
+        self.next_call_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            call_at = max(now, self.next_call_at)
+            self.next_call_at = call_at + self.interval
+
+        time.sleep(call_at - now)
+
+
+class DispatchPayouts:
+    """
+    Send queued B2C withdrawal requests to M-Pesa in batches.
+    Requests are queued in a Redis list and drained by a single dispatcher at a
+    time. A batch is moved to a processing list before it is sent, and each
+    request only leaves that list once its withdrawal is saved, so a dispatcher
+    that stops mid batch never loses track of a payout. Payouts are sent from a
+    bounded pool of threads, no faster than the rate the B2C shortcode allows.
+    """
+
+    queue_key = "payout_requests"
+    processing_key = "payout_requests:processing"
+    # Requests left behind by a dispatcher that stopped. They may have been paid,
+    # so they are kept for staff to reconcile instead of being sent again.
+    unconfirmed_key = "payout_requests:unconfirmed"
+    lock_key = "payout_dispatcher_lock"
+
+    def key(self, name: str) -> str:
+        return cache.make_and_validate_key(name)
+
+    def get_client(self, key: str, *, write: bool = False):
+        return cache._cache.get_client(key, write=write)  # type: ignore
+
+    def set_withdraw_request_guard(self, phone_number: str, amount: int) -> None:
+        # Save hashed value that expires after a couple of seconds.
+        # That effectively only limits a user to 1 successful withdrawal
+        # each 2 minutes or thereabout
+        hashed_withdrawal_request = md5_hash(f"{phone_number}:withdraw_request")
+        cache.set(
+            hashed_withdrawal_request, amount, timeout=settings.WITHDRAWAL_BUFFER_PERIOD
+        )
+
+    def enqueue(self, *, user, amount: int) -> None:
+        """Queue a withdrawal request of the user"""
+        self.set_withdraw_request_guard(str(user.phone_number), amount)
+
+        key = self.key(self.queue_key)
+        self.get_client(key, write=True).rpush(
+            key, json.dumps({"user_id": str(user.id), "amount": amount})
+        )
+
+    def claim_batch(self, batch_size: int) -> list[bytes]:
+        """Move a batch of requests from the queue to the processing list"""
+        queue_key = self.key(self.queue_key)
+        processing_key = self.key(self.processing_key)
+        pipeline = self.get_client(queue_key, write=True).pipeline()
+        for _ in range(batch_size):
+            pipeline.lmove(queue_key, processing_key, "LEFT", "RIGHT")
+        return [request for request in pipeline.execute() if request is not None]
+
+    def complete(self, request: bytes) -> None:
+        """Remove a settled request from the processing list"""
+        key = self.key(self.processing_key)
+        self.get_client(key, write=True).lrem(key, 1, request)
+
+    def release(self, requests: list[bytes]) -> None:
+        """Put requests that were never sent back at the front of the queue"""
+        if not requests:
+            return
+
+        queue_key = self.key(self.queue_key)
+        processing_key = self.key(self.processing_key)
+        pipeline = self.get_client(queue_key, write=True).pipeline()
+        for request in requests:
+            pipeline.lrem(processing_key, 1, request)
+        pipeline.lpush(queue_key, *reversed(requests))
+        pipeline.execute()
+
+    def recover_unconfirmed(self) -> int:
+        """Move the requests a stopped dispatcher was processing to the unconfirmed
+        list. Only one dispatcher runs at a time, so none of them is in flight."""
+        processing_key = self.key(self.processing_key)
+        unconfirmed_key = self.key(self.unconfirmed_key)
+        client = self.get_client(processing_key, write=True)
+
+        count = 0
+        while client.lmove(processing_key, unconfirmed_key, "LEFT", "RIGHT"):
+            count += 1
+
+        if count:
+            logger.error(
+                f"{count} payouts may have been sent without a saved withdrawal. "
+                f"Reconcile the requests in {self.unconfirmed_key}."
+            )
+        return count
+
+    def dispatch(self, *, batch_size: int | None = None) -> int:
+        """Drain the queue and return the number of payouts sent.
+        Returns 0 right away if another dispatcher is already draining it."""
+        batch_size = batch_size or settings.PAYOUT_BATCH_SIZE
+        lock_token = Locks.acquire(
+            self.lock_key, timeout=settings.PAYOUT_DISPATCHER_TIMEOUT
+        )
+        if not lock_token:
+            logger.info("Payouts are being dispatched by another worker.")
+            return 0
+
+        sent_count = 0
+        try:
+            self.recover_unconfirmed()
+
+            # Stop well before the task's soft time limit, the next run sends the rest
+            deadline = time.monotonic() + settings.PAYOUT_DISPATCH_TIME_BUDGET
+            rate_limiter = RateLimiter(settings.MPESA_B2C_RATE_LIMIT)
+            with ThreadPoolExecutor(
+                max_workers=settings.MPESA_B2C_CONCURRENCY
+            ) as executor:
+                while time.monotonic() < deadline and (
+                    requests := self.claim_batch(batch_size)
+                ):
+                    sent_count += self.dispatch_batch(requests, executor, rate_limiter)
+        finally:
+            Locks.release(self.lock_key, lock_token)
+
+        logger.info(f"Dispatched {sent_count} payouts.")
+        return sent_count
+
+    def dispatch_batch(
+        self, requests: list[bytes], executor, rate_limiter: RateLimiter
+    ) -> int:
+        logger.info(f"Dispatching {len(requests)} payouts...")
+        futures = {
+            executor.submit(self.send, user, amount, rate_limiter=rate_limiter): request
+            for request, user, amount in self.get_affordable_payouts(requests)
+        }
+
+        try:
+            for future in as_completed(futures):
+                row = future.result()
+                # Payouts whose withdrawal fails to save stay in the processing list
+                if row is None or self.save_withdrawal(row):
+                    self.complete(futures[future])
+        finally:
+            # If the dispatcher is stopped, do not send the rest of the batch
+            self.release(
+                [request for future, request in futures.items() if future.cancel()]
+            )
+
+        return len(futures)
+
+    def get_affordable_payouts(self, requests: list[bytes]) -> list[tuple]:
+        """Payouts of the batch that their users can still afford, as
+        (request, user, amount). Balances may have changed since the requests
+        were queued. Dropped requests are removed from the processing list."""
+        payouts = [(request, json.loads(request)) for request in requests]
+        users = {
+            str(user.id): user
+            for user in User.objects.filter(
+                id__in=[payout["user_id"] for _, payout in payouts]
+            )
+        }
+
+        affordable = []
+        balances: dict = {}
+        for request, payout in payouts:
+            user = users.get(payout["user_id"])
+            if user is None:
+                logger.warning(f"Dropping payout of missing user {payout['user_id']}")
+                self.complete(request)
+                continue
+
+            if user.id not in balances:
+                balances[user.id] = Transaction.objects.get_user_balance(user)
+
+            amount = payout["amount"]
+            total_charge = amount + calculate_b2c_withdrawal_charge(amount)
+            if balances[user.id] < total_charge:
+                logger.warning(
+                    f"Dropping payout of {user.phone_number}, their balance is too low."
+                )
+                self.complete(request)
+                continue
+
+            balances[user.id] -= total_charge
+            affordable.append((request, user, amount))
+
+        return affordable
+
+    def send(self, user, amount: int, *, rate_limiter: RateLimiter) -> dict | None:
+        """Send a payout and return the withdrawal to save from its response"""
+        try:
+            self.set_withdraw_request_guard(str(user.phone_number), amount)
+            rate_limiter.wait()
+
+            data = initiate_b2c_payment(
+                amount=amount,
+                party_b=str(user.phone_number).lstrip(
+                    "+"
+                ),  # M-Pesa phone number format: 254703405601
+            )
+        except Exception as e:
+            logger.error(f"An execption ocurred while sending payout of {user}: {e}")
+            return None
+
+        # If response data is not an error, then save it
+        if data is None or "ConversationID" not in data:
+            return None
+
+        return {
+            "conversation_id": data["ConversationID"],
+            "originator_conversation_id": data["OriginatorConversationID"],
+            "response_code": data["ResponseCode"],
+            "response_description": data["ResponseDescription"],
+            "transaction_amount": amount,
+            "phone_number": str(user.phone_number),
+        }
+
+    def save_withdrawal(self, row: dict) -> bool:
+        """Save the withdrawal of a sent payout, which posts its debit.
+        Returns whether it was saved."""
+        withdrawal_serializer = WithdrawalCreateSerializer(data=row)
+        if not withdrawal_serializer.is_valid():
+            logger.error(
+                f"Failed to save withdrawal {row['conversation_id']}: "
+                f"{withdrawal_serializer.errors}"
+            )
+            return False
+
+        try:
+            with transaction.atomic():
+                withdrawal_serializer.save()
+        except Exception as e:
+            logger.error(f"Failed to save withdrawal {row['conversation_id']}: {e}")
+            return False
+
+        return True
+
+
+PayoutDispatcher = DispatchPayouts()
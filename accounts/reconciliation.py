@@ -0,0 +1,212 @@
+from decimal import Decimal
+from typing import Iterator
+
+from django.db.models import F, Q
+
+from accounts.constants import TransactionCashFlow
+from accounts.models import BalanceCheckpoint, Transaction
+from commons.models import ArchivedRecord
+from commons.raw_logger import logger
+
+
+class ReconcileLedger:
+    """
+    Verify the chained balances in the transactions ledger.
+    Transactions are streamed ordered by user and created_at so that memory use
+    does not grow with the ledger. Every consistent chain is saved as a checkpoint
+    that the next run resumes from.
+    An instance holds the state of one run, every run creates its own.
+    """
+
+    def __init__(self, *, chunk_size: int = 2000, full: bool = False) -> None:
+        """Pass `full` to ignore the checkpoints and verify the ledger from the start"""
+        self.chunk_size = chunk_size
+        self.full = full
+        self.transactions_count = 0
+        self.users_count = 0
+        self.drifts_count = 0
+        self.checkpoints: list[BalanceCheckpoint] = []
+
+    def reconcile(self) -> Iterator[dict]:
+        """Stream the ledger and yield every drift found in it"""
+        logger.info(
+            f"Reconciling ledger (full={self.full}) in chunks of {self.chunk_size}..."
+        )
+        user_id, timestamp = None, None
+        rows: list = []  # Transactions of the current user created at the same time
+
+        for row in self.get_ledger_stream().iterator(chunk_size=self.chunk_size):
+            if row.user_id != user_id:
+                if user_id:
+                    yield from self.verify_rows(rows)
+                    yield from self.close_user()
+                self.open_user(row)
+                user_id, timestamp, rows = row.user_id, None, []
+
+            if row.created_at != timestamp and rows:
+                yield from self.verify_rows(rows)
+                rows = []
+
+            timestamp = row.created_at
+            rows.append(row)
+
+        if user_id:
+            yield from self.verify_rows(rows)
+            yield from self.close_user()
+
+        self.save_checkpoints()
+        logger.info(
+            f"Reconciled {self.transactions_count} transactions for "
+            f"{self.users_count} users. Found {self.drifts_count} drifts."
+        )
+
+    def get_ledger_stream(self):
+        """Transactions to verify, together with the user's checkpoint and wallet."""
+        transactions = Transaction.objects.filter(user__isnull=False)
+
+        if not self.full:
+            transactions = transactions.filter(
+                Q(user__balance_checkpoint__isnull=True)
+                | Q(
+                    created_at__gt=F("user__balance_checkpoint__transaction_created_at")
+                )
+            )
+
+        return transactions.order_by("user_id", "created_at").values_list(
+            "id",
+            "user_id",
+            "created_at",
+            "cash_flow",
+            "charge",
+            "initial_balance",
+            "final_balance",
+            "user__balance_checkpoint__balance",
+            "user__balance_checkpoint__transactions_count",
+            "user__wallet__balance",
+            named=True,
+        )
+
+    def open_user(self, row) -> None:
+        """Start verifying a user's chain from their checkpoint"""
+        has_checkpoint = (
+            not self.full and row.user__balance_checkpoint__balance is not None
+        )
+        self.user_id = row.user_id
+        if has_checkpoint:
+            self.balance = row.user__balance_checkpoint__balance
+            self.user_transactions_count = (
+                row.user__balance_checkpoint__transactions_count
+            )
+        else:
+            self.balance, self.user_transactions_count = self.get_archived_chain(
+                row.user_id
+            )
+        self.wallet_balance = row.user__wallet__balance
+        self.last_created_at = None
+        self.user_has_drift = False
+        self.users_count += 1
+
+    def get_archived_chain(self, user_id) -> tuple[Decimal, int]:
+        """Final balance and count of the user's archived transactions.
+        Archived transactions were verified before they were moved."""
+        archived = ArchivedRecord.objects.of(Transaction).filter(user_id=user_id)
+        final_balance = (
+            archived.order_by("-record_created_at")
+            .values_list("data__final_balance", flat=True)
+            .first()
+        )
+        if final_balance is None:
+            return Decimal("0.0"), 0
+
+        return Decimal(final_balance), archived.count()
+
+    def verify_rows(self, rows: list) -> Iterator[dict]:
+        """Verify transactions created at the same time, following their chain"""
+        rows = list(rows)
+        while rows:
+            # Postings within the same microsecond can not be ordered by created_at
+            row = next(
+                (row for row in rows if row.initial_balance == self.balance), rows[0]
+            )
+            rows.remove(row)
+
+            if row.initial_balance != self.balance:
+                yield self.drift(
+                    row,
+                    "Initial balance does not match the previous final balance.",
+                    expected=self.balance,
+                    found=row.initial_balance,
+                )
+
+            charge = (
+                row.charge
+                if row.cash_flow == TransactionCashFlow.INWARD.value
+                else -row.charge
+            )
+            if row.final_balance != row.initial_balance + charge:
+                yield self.drift(
+                    row,
+                    "Final balance does not match the charge.",
+                    expected=row.initial_balance + charge,
+                    found=row.final_balance,
+                )
+
+            # Continue from the recorded balance so a drift is only reported once
+            self.balance = row.final_balance
+            self.last_created_at = row.created_at
+            self.user_transactions_count += 1
+            self.transactions_count += 1
+
+    def close_user(self) -> Iterator[dict]:
+        """Compare the end of the chain to the wallet and checkpoint it"""
+        if self.wallet_balance is not None and self.wallet_balance != self.balance:
+            yield self.drift(
+                None,
+                "Wallet balance does not match the ledger.",
+                expected=self.balance,
+                found=self.wallet_balance,
+            )
+
+        if self.user_has_drift:
+            return  # Keep verifying from the old checkpoint until the drift is fixed
+
+        self.checkpoints.append(
+            BalanceCheckpoint(
+                user_id=self.user_id,
+                balance=self.balance,
+                transaction_created_at=self.last_created_at,
+                transactions_count=self.user_transactions_count,
+            )
+        )
+        if len(self.checkpoints) >= self.chunk_size:
+            self.save_checkpoints()
+
+    def drift(self, row, reason: str, *, expected: Decimal, found: Decimal) -> dict:
+        logger.warning(f"Ledger drift for user {self.user_id}: {reason}")
+        self.user_has_drift = True
+        self.drifts_count += 1
+        return {
+            "user_id": str(self.user_id),
+            "transaction_id": str(row.id) if row else None,
+            "reason": reason,
+            "expected": expected,
+            "found": found,
+        }
+
+    def save_checkpoints(self) -> None:
+        """Insert or move the checkpoints verified so far"""
+        if not self.checkpoints:
+            return
+
+        BalanceCheckpoint.objects.bulk_create(
+            self.checkpoints,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=[
+                "balance",
+                "transaction_created_at",
+                "transactions_count",
+                "updated_at",
+            ],
+        )
+        self.checkpoints = []
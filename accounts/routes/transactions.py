@@ -2,6 +2,7 @@ from django.urls import path
 
 from accounts.views.transactions import (
     TransactionCreateView,
+    TransactionExportView,
     TransactionListView,
     TransactionRetrieveUpdateView,
     TransactionRetrieveUserBalanceView,
@@ -15,6 +16,11 @@ urlpatterns = [
         TransactionCreateView.as_view(),
         name="transaction-create",
     ),
+    path(
+        "export/",
+        TransactionExportView.as_view(),
+        name="transaction-export",
+    ),
     path(
         "<str:id>/",
         TransactionRetrieveUpdateView.as_view(),
@@ -65,6 +65,7 @@ class MpesaPaymentCreateSerializer(serializers.ModelSerializer):
             "response_code",
             "response_description",
             "customer_message",
+            "amount",
         ]
 
 
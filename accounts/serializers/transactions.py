@@ -1,10 +1,13 @@
 from rest_framework import serializers
 
+from accounts.constants import ExportFormats
 from accounts.models import Transaction
 from users.serializers import UserReadSerializer
 
 
 class TransactionCreateSerializer(serializers.ModelSerializer):
+    external_response = serializers.JSONField(required=False, allow_null=True)
+
     class Meta:
         model = Transaction
         exclude = ["charge"]
@@ -17,21 +20,24 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
             "fee": {"required": False},
             "tax": {"required": False},
             "description": {"required": False},
-            "external_response": {"required": False},
+            # Links the payload of the payment, responses return the payload itself
+            "external_response_record": {"write_only": True},
         }
 
 
 class TransactionRetrieveUpdateSerializer(serializers.ModelSerializer):
+    external_response = serializers.JSONField(required=False, allow_null=True)
+
     class Meta:
         model = Transaction
-        fields = "__all__"
+        exclude = ["external_response_record"]
         read_only_fields = ("id", "created_at", "updated_at", "user")
 
 
 class TransactionRetrieveSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
-        exclude = ["updated_at", "description", "external_response"]
+        exclude = ["updated_at", "description", "external_response_record"]
 
 
 class TransactionListSerializer(serializers.ModelSerializer):
@@ -39,4 +45,12 @@ class TransactionListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
-        exclude = ["updated_at", "description", "external_response"]
+        exclude = ["updated_at", "description", "external_response_record"]
+
+
+class TransactionExportSerializer(serializers.Serializer):
+    export_format = serializers.ChoiceField(
+        choices=[export_format.value for export_format in ExportFormats],
+        default=ExportFormats.CSV.value,
+    )
+    gzip = serializers.BooleanField(default=False)
@@ -1,5 +1,3 @@
-import json
-
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -13,7 +11,7 @@ from accounts.models import MpesaPayment, Withdrawal
 from accounts.serializers.transactions import TransactionCreateSerializer
 from commons.constants import User
 from commons.raw_logger import logger
-from commons.tasks import send_push
+from commons.tasks import queue_pushes
 from commons.utils import calculate_b2c_withdrawal_charge
 from notifications.constants import NotificationTypes, PushNotifications
 
@@ -40,7 +38,8 @@ def create_withdrawal_transaction_instance(sender, instance, created, **kwargs)
                     "service": TransactionServices.MPESA.value,
                     "amount": instance.transaction_amount,
                     "fee": calculate_b2c_withdrawal_charge(instance.transaction_amount),
-                    "external_response": json.dumps(instance.external_response),
+                    # Link the payload the transaction was created from
+                    "external_response_record": instance.external_response_record_id,
                 }
             )
 
@@ -56,11 +55,15 @@ def create_withdrawal_transaction_instance(sender, instance, created, **kwargs)
                     transaction_obj.fee,
                     transaction_obj.final_balance,
                 )
-                send_push.delay(
-                    type=NotificationTypes.WITHDRAW.value,
-                    title=PushNotifications.MPESA_WITHDRAW.title,
-                    message=push_message,
-                    user_id=user.id,
+                queue_pushes(
+                    [
+                        {
+                            "type": NotificationTypes.WITHDRAW.value,
+                            "title": PushNotifications.MPESA_WITHDRAW.title,
+                            "message": push_message,
+                            "user_id": user.id,
+                        }
+                    ]
                 )
 
 
@@ -85,7 +88,8 @@ def create_deposit_transaction_instance(sender, instance, created, **kwargs):
                     "status": TransactionStatuses.SUCCESSFUL.value,
                     "service": TransactionServices.MPESA.value,
                     "amount": instance.amount,
-                    "external_response": json.dumps(instance.external_response),
+                    # Link the payload the transaction was created from
+                    "external_response_record": instance.external_response_record_id,
                 }
             )
 
@@ -97,11 +101,15 @@ def create_deposit_transaction_instance(sender, instance, created, **kwargs):
                     transaction_obj.amount,
                     transaction_obj.final_balance,
                 )
-                send_push.delay(
-                    type=NotificationTypes.DEPOSIT.value,
-                    title=PushNotifications.MPESA_DEPOSIT.title,
-                    message=push_message,
-                    user_id=user.id,
+                queue_pushes(
+                    [
+                        {
+                            "type": NotificationTypes.DEPOSIT.value,
+                            "title": PushNotifications.MPESA_DEPOSIT.title,
+                            "message": push_message,
+                            "user_id": user.id,
+                        }
+                    ]
                 )
                 logger.info(
                     f"External transaction id {instance.receipt_number} saved successfully."
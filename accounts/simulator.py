@@ -0,0 +1,281 @@
+import json
+import random
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+import requests
+
+from accounts.constants import MPESA_WHITE_LISTED_IPS
+from commons.raw_logger import logger
+
+MPESA_TRANSACTION_DATE_FORMAT = "%Y%m%d%H%M%S"
+
+
+class DarajaSimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive like Daraja does
+
+    def do_GET(self) -> None:
+        if "oauth" in self.path:
+            return self.respond(*self.server.simulator.generate_token())  # type: ignore
+        self.respond(404, {"errorMessage": "Resource not found"})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        simulator: DarajaSimulator = self.server.simulator  # type: ignore
+
+        if "stkpushquery" in self.path:
+            return self.respond(*simulator.query_stk_push(payload))
+        if "stkpush" in self.path:
+            return self.respond(*simulator.process_stk_push(payload))
+        if "b2c" in self.path:
+            return self.respond(*simulator.process_b2c_payment(payload))
+        self.respond(404, {"errorMessage": "Resource not found"})
+
+    def respond(self, status_code: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"Daraja simulator: {format % args}")
+
+
+class DarajaSimulator:
+    """
+    Local stand-in for the Daraja OAuth, STK push, STK query and B2C APIs.
+    Requests are answered with the payloads Safaricom returns, then the STK
+    push and B2C results are posted to the callback URLs of the requests.
+
+    - `callback_delay`: seconds before a result is posted back.
+    - `failure_rate`: share of API calls answered with a 503.
+    - `result_failure_rate`: share of results that report a failed payment.
+    - `duplicate_rate`: share of results posted twice, as M-Pesa retries do.
+    - `drop_rate`: share of STK push results that are never posted. They can
+      still be queried.
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        callback_delay: float = 1.0,
+        failure_rate: float = 0.0,
+        result_failure_rate: float = 0.0,
+        duplicate_rate: float = 0.0,
+        drop_rate: float = 0.0,
+    ) -> None:
+        self.callback_delay = callback_delay
+        self.failure_rate = failure_rate
+        self.result_failure_rate = result_failure_rate
+        self.duplicate_rate = duplicate_rate
+        self.drop_rate = drop_rate
+        self.stk_results: dict[str, dict] = {}
+
+        self.server = ThreadingHTTPServer((host, port), DarajaSimulatorHandler)
+        self.server.simulator = self  # type: ignore
+        self.callbacks: list[threading.Timer] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self) -> dict:
+        """Daraja URL settings pointing at the simulator"""
+        return {
+            "MPESA_TOKEN_URL": f"{self.url}/oauth/v1/generate?grant_type=client_credentials",
+            "MPESA_STKPUSH_URL": f"{self.url}/mpesa/stkpush/v1/processrequest",
+            "MPESA_STK_QUERY_URL": f"{self.url}/mpesa/stkpushquery/v1/query",
+            "MPESA_B2C_URL": f"{self.url}/mpesa/b2c/v3/paymentrequest",
+        }
+
+    def start(self) -> None:
+        """Serve requests from a background thread"""
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logger.info(f"Daraja simulator listening on {self.url}")
+
+    def stop(self) -> None:
+        for callback in self.callbacks:
+            callback.cancel()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def serve_forever(self) -> None:
+        logger.info(f"Daraja simulator listening on {self.url}")
+        self.server.serve_forever()
+
+    def is_unavailable(self) -> bool:
+        return random.random() < self.failure_rate
+
+    def unavailable(self) -> tuple[int, dict]:
+        return 503, {
+            "requestId": uuid4().hex,
+            "errorCode": "503.001.01",
+            "errorMessage": "Service is currently unreachable",
+        }
+
+    def generate_token(self) -> tuple[int, dict]:
+        if self.is_unavailable():
+            return self.unavailable()
+        return 200, {"access_token": uuid4().hex, "expires_in": "3599"}
+
+    def process_stk_push(self, payload: dict) -> tuple[int, dict]:
+        if self.is_unavailable():
+            return self.unavailable()
+
+        merchant_request_id = f"{random.randint(10000, 99999)}-{uuid4().int % 10**8}-1"
+        checkout_request_id = f"ws_CO_{datetime.now():%d%m%Y%H%M%S}{uuid4().hex[:12]}"
+
+        receipt_number = uuid4().hex[:10].upper()
+        transaction_date = int(datetime.now().strftime(MPESA_TRANSACTION_DATE_FORMAT))
+        phone_number = int(payload["PhoneNumber"])
+
+        result: dict = {
+            "MerchantRequestID": merchant_request_id,
+            "CheckoutRequestID": checkout_request_id,
+        }
+        if random.random() < self.result_failure_rate:
+            result.update(
+                {"ResultCode": 1032, "ResultDesc": "Request cancelled by user"}
+            )
+        else:
+            result.update(
+                {
+                    "ResultCode": 0,
+                    "ResultDesc": "The service request is processed successfully.",
+                    "CallbackMetadata": {
+                        "Item": [
+                            {"Name": "Amount", "Value": float(payload["Amount"])},
+                            {"Name": "MpesaReceiptNumber", "Value": receipt_number},
+                            {"Name": "TransactionDate", "Value": transaction_date},
+                            {"Name": "PhoneNumber", "Value": phone_number},
+                        ]
+                    },
+                }
+            )
+        self.stk_results[checkout_request_id] = result
+        if random.random() >= self.drop_rate:
+            self.schedule_callback(
+                payload["CallBackURL"], {"Body": {"stkCallback": result}}
+            )
+
+        return 200, {
+            "MerchantRequestID": merchant_request_id,
+            "CheckoutRequestID": checkout_request_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    def query_stk_push(self, payload: dict) -> tuple[int, dict]:
+        if self.is_unavailable():
+            return self.unavailable()
+
+        result = self.stk_results.get(payload["CheckoutRequestID"])
+        if result is None:
+            return 500, {
+                "requestId": uuid4().hex,
+                "errorCode": "500.001.1001",
+                "errorMessage": "The transaction is being processed",
+            }
+
+        return 200, {
+            "ResponseCode": "0",
+            "ResponseDescription": "The service request has been accepted successsfully",
+            "MerchantRequestID": result["MerchantRequestID"],
+            "CheckoutRequestID": result["CheckoutRequestID"],
+            "ResultCode": str(result["ResultCode"]),
+            "ResultDesc": result["ResultDesc"],
+        }
+
+    def process_b2c_payment(self, payload: dict) -> tuple[int, dict]:
+        if self.is_unavailable():
+            return self.unavailable()
+
+        conversation_id = f"AG_{datetime.now():%Y%m%d}_{uuid4().hex[:20]}"
+        originator_conversation_id = (
+            f"{random.randint(10000, 99999)}-{uuid4().int % 10**8}-1"
+        )
+        transaction_id = uuid4().hex[:10].upper()
+
+        result: dict = {
+            "ResultType": 0,
+            "OriginatorConversationID": originator_conversation_id,
+            "ConversationID": conversation_id,
+            "TransactionID": transaction_id,
+            "ReferenceData": {
+                "ReferenceItem": {
+                    "Key": "QueueTimeoutURL",
+                    "Value": payload["QueueTimeOutURL"],
+                }
+            },
+        }
+        if random.random() < self.result_failure_rate:
+            result.update(
+                {
+                    "ResultCode": 2001,
+                    "ResultDesc": "The initiator information is invalid.",
+                }
+            )
+        else:
+            completed_at = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+            result.update(
+                {
+                    "ResultCode": 0,
+                    "ResultDesc": "The service request is processed successfully.",
+                    "ResultParameters": {
+                        "ResultParameter": [
+                            {"Key": "TransactionAmount", "Value": payload["Amount"]},
+                            {"Key": "TransactionReceipt", "Value": transaction_id},
+                            {"Key": "B2CRecipientIsRegisteredCustomer", "Value": "Y"},
+                            {
+                                "Key": "ReceiverPartyPublicName",
+                                "Value": f"{payload['PartyB']} - Load Test",
+                            },
+                            {
+                                "Key": "TransactionCompletedDateTime",
+                                "Value": completed_at,
+                            },
+                        ]
+                    },
+                }
+            )
+        self.schedule_callback(payload["ResultURL"], {"Result": result})
+
+        return 200, {
+            "ConversationID": conversation_id,
+            "OriginatorConversationID": originator_conversation_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Accept the service request successfully.",
+        }
+
+    def schedule_callback(self, url: str, data: dict) -> None:
+        deliveries = 2 if random.random() < self.duplicate_rate else 1
+        callback = threading.Timer(
+            self.callback_delay, self.post_callback, args=(url, data, deliveries)
+        )
+        with self.lock:
+            self.callbacks = [
+                pending for pending in self.callbacks if pending.is_alive()
+            ]
+            self.callbacks.append(callback)
+        callback.start()
+
+    def post_callback(self, url: str, data: dict, deliveries: int) -> None:
+        # Callbacks are only accepted from M-Pesa addresses
+        headers = {"Fly-Client-IP": MPESA_WHITE_LISTED_IPS[0]}
+        for _ in range(deliveries):
+            try:
+                response = requests.post(url, json=data, headers=headers, timeout=30)
+                logger.debug(f"Posted callback to {url}: {response.status_code}")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Failed to post callback to {url}: {e}")
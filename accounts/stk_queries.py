@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.callbacks import MpesaCallbackProcessor
+from accounts.constants import MpesaCallbackKinds
+from accounts.models import MpesaCallback, MpesaPayment
+from accounts.payouts import RateLimiter
+from accounts.utils import query_mpesa_stkpush_status
+from commons.raw_logger import logger
+
+
+class QueryStkPayments:
+    """
+    Settle STKPush payments whose callback never arrived.
+    Stale pending payments are queried in batches from a bounded pool of
+    threads, no faster than the query rate limit. Every answer is received in
+    the callbacks inbox like the callback it stands in for, so a late callback
+    is dropped as a duplicate and the deposit is credited once.
+    """
+
+    lock_key = "stk_query_poller_lock"
+    lock_timeout = 10 * 60
+
+    def poll(self, *, batch_size: int | None = None) -> int:
+        """Query the stale pending payments and return the number settled"""
+        if not cache.add(self.lock_key, 1, timeout=self.lock_timeout):
+            logger.info("STKPush payments are being queried by another worker.")
+            return 0
+
+        batch_size = batch_size or settings.MPESA_STK_QUERY_BATCH_SIZE
+        rate_limiter = RateLimiter(settings.MPESA_STK_QUERY_RATE_LIMIT)
+        queried_ids: set = set()
+        settled_count = 0
+        try:
+            with ThreadPoolExecutor(
+                max_workers=settings.MPESA_STK_QUERY_CONCURRENCY
+            ) as executor:
+                while mpesa_payments := self.get_stale_payments(
+                    batch_size, exclude_ids=queried_ids
+                ):
+                    queried_ids.update(payment.id for payment in mpesa_payments)
+                    results = executor.map(
+                        lambda payment: self.query(payment, rate_limiter=rate_limiter),
+                        mpesa_payments,
+                    )
+                    settled_count += self.receive_results(mpesa_payments, results)
+        finally:
+            cache.delete(self.lock_key)
+
+        if settled_count:
+            MpesaCallbackProcessor.process()
+
+        logger.info(f"Settled {settled_count} STKPush payments from their status.")
+        return settled_count
+
+    def get_stale_payments(self, batch_size: int, *, exclude_ids: set) -> list:
+        """Pending payments old enough for their callback to have been received"""
+        now = datetime.now()
+        return list(
+            MpesaPayment.objects.filter(
+                result_code__isnull=True,
+                created_at__lt=now - timedelta(seconds=settings.MPESA_STK_QUERY_DELAY),
+                created_at__gte=now
+                - timedelta(seconds=settings.MPESA_STK_QUERY_MAX_AGE),
+            )
+            .exclude(id__in=exclude_ids)
+            .exclude(
+                # Received callbacks are settled by the callbacks inbox
+                checkout_request_id__in=MpesaCallback.objects.filter(
+                    kind=MpesaCallbackKinds.STKPUSH.value
+                ).values("request_id")
+            )
+            .order_by("created_at")[:batch_size]
+        )
+
+    def query(self, mpesa_payment: MpesaPayment, *, rate_limiter) -> dict | None:
+        try:
+            rate_limiter.wait()
+            return query_mpesa_stkpush_status(mpesa_payment.checkout_request_id)
+        except Exception as e:
+            logger.error(
+                f"Failed to query STKPush {mpesa_payment.checkout_request_id}: {e}"
+            )
+            return None
+
+    def receive_results(self, mpesa_payments: list, results) -> int:
+        received_count = 0
+        for mpesa_payment, result in zip(mpesa_payments, results):
+            if result is None:
+                continue  # Still being processed
+
+            payload = self.to_callback(mpesa_payment, result)
+            if payload is None:
+                continue
+
+            received_count += MpesaCallback.objects.receive(
+                kind=MpesaCallbackKinds.STKPUSH.value,
+                request_id=mpesa_payment.checkout_request_id,
+                payload=payload,
+            )
+
+        return received_count
+
+    def to_callback(self, mpesa_payment: MpesaPayment, result: dict) -> dict | None:
+        """
+        Shape the query result like the STKPush callback.
+        The query result has no metadata. Successful payments are credited with
+        the amount requested and the checkout request id as their receipt.
+        """
+        payload = {
+            "MerchantRequestID": result["MerchantRequestID"],
+            "CheckoutRequestID": result["CheckoutRequestID"],
+            "ResultCode": int(result["ResultCode"]),
+            "ResultDesc": result["ResultDesc"],
+        }
+        if payload["ResultCode"] != 0:
+            return payload
+
+        if mpesa_payment.amount is None:
+            logger.warning(
+                f"STKPush {mpesa_payment.checkout_request_id} succeeded "
+                "but its amount is unknown. It has to be settled by support."
+            )
+            return None
+
+        payload["CallbackMetadata"] = {
+            "Item": [
+                {"Name": "Amount", "Value": float(mpesa_payment.amount)},
+                {
+                    "Name": "MpesaReceiptNumber",
+                    "Value": mpesa_payment.checkout_request_id,
+                },
+                {
+                    "Name": "TransactionDate",
+                    "Value": int(
+                        datetime.now().strftime(settings.MPESA_DATETIME_FORMAT)
+                    ),
+                },
+                {"Name": "PhoneNumber", "Value": mpesa_payment.phone_number},
+            ]
+        }
+        return payload
+
+
+StkPaymentsPoller = QueryStkPayments()
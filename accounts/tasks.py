@@ -1,11 +1,17 @@
 from celery import shared_task
 
+from accounts.callbacks import MpesaCallbackProcessor
+from accounts.payouts import PayoutDispatcher
+from accounts.reconciliation import ReconcileLedger
+from accounts.stk_queries import StkPaymentsPoller
 from accounts.utils import (
     process_b2c_payment,
     process_b2c_payment_result,
     process_mpesa_stk,
+    renew_mpesa_access_tokens,
     trigger_mpesa_stkpush_payment,
 )
+from commons.raw_logger import logger
 
 
 @shared_task  # type: ignore
@@ -31,3 +37,38 @@ def trigger_mpesa_stkpush_payment_task(*, amount: int, phone_number: str) -> Non
 @shared_task  # type: ignore
 def process_b2c_payment_task(*, user_id, amount) -> None:
     process_b2c_payment(user_id=user_id, amount=amount)
+
+
+@shared_task(name="process_mpesa_callbacks")  # type: ignore
+def process_mpesa_callbacks_task() -> int:
+    """Process the pending M-Pesa callbacks and return their number"""
+    return MpesaCallbackProcessor.process()
+
+
+@shared_task(name="dispatch_payouts")  # type: ignore
+def dispatch_payouts_task() -> int:
+    """Send the queued B2C payouts and return the number sent"""
+    return PayoutDispatcher.dispatch()
+
+
+@shared_task(name="query_stale_stkpush_payments")  # type: ignore
+def query_stale_stkpush_payments_task() -> int:
+    """Settle the STKPush payments whose callback never arrived"""
+    return StkPaymentsPoller.poll()
+
+
+@shared_task(name="renew_mpesa_access_tokens")  # type: ignore
+def renew_mpesa_access_tokens_task() -> None:
+    """Renew the M-Pesa access tokens so that payments never wait for them"""
+    renew_mpesa_access_tokens()
+
+
+@shared_task(name="reconcile_ledger")  # type: ignore
+def reconcile_ledger_task() -> int:
+    """Verify the ledger from the last checkpoints and return the number of drifts"""
+    logger.info("Starting ledger reconciliation in background...")
+    reconciler = ReconcileLedger()
+    for drift in reconciler.reconcile():
+        logger.error(f"Ledger drift: {drift}")
+
+    return reconciler.drifts_count
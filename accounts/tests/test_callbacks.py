@@ -0,0 +1,161 @@
+from copy import deepcopy
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.callbacks import MpesaCallbackProcessor
+from accounts.constants import MpesaCallbackKinds, TransactionCashFlow
+from accounts.models import MpesaCallback, MpesaPayment, Transaction, Withdrawal
+from accounts.tests.test_data import (
+    mock_stk_push_response,
+    mock_stk_push_result,
+    mock_successful_b2c_result,
+    withdrawal_obj_instance,
+)
+from accounts.utils import apply_mpesa_stk_result
+from commons.tests.base_tests import BaseUserAPITestCase
+
+
+class MpesaCallbackProcessorTestCase(BaseUserAPITestCase):
+    def setUp(self) -> None:
+        self.user = self.create_user()
+
+    def receive_stk_callbacks(self, count: int) -> list[MpesaPayment]:
+        """Payments of the user, each with a successful callback in the inbox"""
+        mpesa_payments = []
+        for index in range(count):
+            mpesa_payment = MpesaPayment.objects.create(
+                phone_number=str(self.user.phone_number),
+                merchant_request_id=mock_stk_push_response["MerchantRequestID"],
+                checkout_request_id=f"ws_CO_{index}",
+                response_code=mock_stk_push_response["ResponseCode"],
+                response_description=mock_stk_push_response["ResponseDescription"],
+                customer_message=mock_stk_push_response["CustomerMessage"],
+            )
+            stk_callback = deepcopy(mock_stk_push_result["Body"]["stkCallback"])
+            stk_callback["CheckoutRequestID"] = f"ws_CO_{index}"
+            stk_callback["CallbackMetadata"]["Item"][1]["Value"] = f"RECEIPT{index}"
+            MpesaCallback.objects.receive(
+                kind=MpesaCallbackKinds.STKPUSH.value,
+                request_id=f"ws_CO_{index}",
+                payload=stk_callback,
+            )
+            mpesa_payments.append(mpesa_payment)
+
+        return mpesa_payments
+
+    def receive_b2c_callbacks(self, count: int, prefix: str = "AG") -> list[Withdrawal]:
+        withdrawals = []
+        for index in range(count):
+            withdrawal = Withdrawal.objects.create(
+                **{**withdrawal_obj_instance, "conversation_id": f"{prefix}_{index}"}
+            )
+            result = {**mock_successful_b2c_result["Result"]}
+            result["ConversationID"] = f"{prefix}_{index}"
+            MpesaCallback.objects.receive(
+                kind=MpesaCallbackKinds.B2C.value,
+                request_id=f"{prefix}_{index}",
+                payload=result,
+            )
+            withdrawals.append(withdrawal)
+
+        return withdrawals
+
+    def test_retried_callbacks_are_dropped(self) -> None:
+        payload = mock_stk_push_result["Body"]["stkCallback"]
+        for _ in range(3):
+            MpesaCallback.objects.receive(
+                kind=MpesaCallbackKinds.STKPUSH.value,
+                request_id=payload["CheckoutRequestID"],
+                payload=payload,
+            )
+
+        self.assertEqual(MpesaCallback.objects.count(), 1)
+
+    def test_stk_callbacks_credit_deposits(self) -> None:
+        mpesa_payments = self.receive_stk_callbacks(5)
+
+        self.assertEqual(MpesaCallbackProcessor.process(batch_size=2), 5)
+
+        for mpesa_payment in mpesa_payments:
+            mpesa_payment.refresh_from_db()
+            self.assertEqual(mpesa_payment.result_code, 0)
+            self.assertIsNotNone(mpesa_payment.external_response_record_id)
+        self.assertEqual(
+            Transaction.objects.filter(
+                user=self.user, cash_flow=TransactionCashFlow.INWARD.value
+            ).count(),
+            5,
+        )
+        self.assertFalse(MpesaCallback.objects.filter(processed_at__isnull=True))
+
+        # Processed callbacks are never processed again
+        self.assertEqual(MpesaCallbackProcessor.process(), 0)
+
+    def test_b2c_callbacks_update_withdrawals(self) -> None:
+        withdrawals = self.receive_b2c_callbacks(3)
+
+        MpesaCallbackProcessor.process()
+
+        for withdrawal in withdrawals:
+            withdrawal.refresh_from_db()
+            self.assertEqual(withdrawal.result_code, 0)
+            self.assertEqual(withdrawal.transaction_id, "REH3SOIU9T")
+
+    def test_batches_are_looked_up_and_saved_in_bulk(self) -> None:
+        self.receive_b2c_callbacks(2)
+        with CaptureQueriesContext(connection) as small_batch:
+            MpesaCallbackProcessor.process()
+
+        self.receive_b2c_callbacks(20, prefix="AG_LARGE")
+        with CaptureQueriesContext(connection) as large_batch:
+            MpesaCallbackProcessor.process()
+
+        self.assertEqual(len(small_batch), len(large_batch))
+
+    def test_callbacks_wait_for_their_request(self) -> None:
+        MpesaCallback.objects.receive(
+            kind=MpesaCallbackKinds.B2C.value,
+            request_id="AG_0",
+            payload={**mock_successful_b2c_result["Result"], "ConversationID": "AG_0"},
+        )
+        self.receive_stk_callbacks(2)
+
+        # The withdrawal is saved after its result was received
+        self.assertEqual(MpesaCallbackProcessor.process(batch_size=1), 2)
+        withdrawal = Withdrawal.objects.create(
+            **{**withdrawal_obj_instance, "conversation_id": "AG_0"}
+        )
+
+        self.assertEqual(MpesaCallbackProcessor.process(), 1)
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.result_code, 0)
+
+    def test_callbacks_without_a_request_are_dropped(self) -> None:
+        MpesaCallback.objects.receive(
+            kind=MpesaCallbackKinds.B2C.value, request_id="AG_MISSING", payload={}
+        )
+        self.assertEqual(MpesaCallbackProcessor.process(), 0)
+
+        MpesaCallback.objects.update(created_at=datetime.now() - timedelta(hours=1))
+        self.assertEqual(MpesaCallbackProcessor.process(), 1)
+        self.assertFalse(MpesaCallback.objects.filter(processed_at__isnull=True))
+
+    def test_failed_callbacks_are_left_pending(self) -> None:
+        self.receive_stk_callbacks(3)
+
+        def apply_or_fail(mpesa_payment, mpesa_response_in) -> None:
+            if mpesa_payment.checkout_request_id == "ws_CO_1":
+                raise ValueError("Malformed callback")
+            apply_mpesa_stk_result(mpesa_payment, mpesa_response_in)
+
+        with patch(
+            "accounts.callbacks.apply_mpesa_stk_result", side_effect=apply_or_fail
+        ):
+            self.assertEqual(MpesaCallbackProcessor.process(), 2)
+
+        pending = MpesaCallback.objects.get(processed_at__isnull=True)
+        self.assertEqual(pending.request_id, "ws_CO_1")
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
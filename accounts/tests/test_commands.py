@@ -0,0 +1,190 @@
+import gzip
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.constants import (
+    TransactionCashFlow,
+    TransactionServices,
+    TransactionStatuses,
+    TransactionTypes,
+)
+from accounts.models import BalanceCheckpoint, Transaction, Wallet
+from accounts.reconciliation import ReconcileLedger
+from commons.tests.base_tests import BaseUserAPITestCase
+
+
+class BackfillWalletsCommandTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = BaseUserAPITestCase().create_user()
+        self.foreign_user = BaseUserAPITestCase().create_foreign_user()
+
+        for index, amount in enumerate(["100.0", "50.0"]):
+            Transaction.objects.create(
+                external_transaction_id=f"TX{index}",
+                cash_flow=TransactionCashFlow.INWARD.value,
+                type=TransactionTypes.DEPOSIT.value,
+                status=TransactionStatuses.SUCCESSFUL.value,
+                service=TransactionServices.MPESA.value,
+                amount=Decimal(amount),
+                user=self.user,
+            )
+
+        # Simulate wallets that were not yet created when the ledger was written
+        Wallet.objects.all().delete()
+
+    def test_command_creates_wallets_from_ledger(self) -> None:
+        call_command("backfill_wallets", stdout=StringIO())
+
+        wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual(wallet.balance, Decimal("150.0"))
+        self.assertEqual(wallet.version, 2)
+
+        foreign_wallet = Wallet.objects.get(user=self.foreign_user)
+        self.assertEqual(foreign_wallet.balance, Decimal("0.0"))
+        self.assertEqual(foreign_wallet.version, 0)
+
+    def test_command_skips_existing_wallets(self) -> None:
+        Wallet.objects.create(user=self.user, balance=Decimal("10.0"), version=7)
+        call_command("backfill_wallets", stdout=StringIO())
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("10.0"))
+
+        call_command("backfill_wallets", "--overwrite", stdout=StringIO())
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("150.0"))
+
+
+class ReconcileLedgerCommandTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = BaseUserAPITestCase().create_user()
+        self.foreign_user = BaseUserAPITestCase().create_foreign_user()
+
+        self.transactions = [
+            self.create_transaction(self.user, index, "100.0") for index in range(3)
+        ] + [self.create_transaction(self.foreign_user, 3, "40.0")]
+
+    def create_transaction(self, user, index: int, amount: str) -> Transaction:
+        return Transaction.objects.create(
+            external_transaction_id=f"TX{index}",
+            cash_flow=TransactionCashFlow.INWARD.value,
+            type=TransactionTypes.DEPOSIT.value,
+            status=TransactionStatuses.SUCCESSFUL.value,
+            service=TransactionServices.MPESA.value,
+            amount=Decimal(amount),
+            user=user,
+        )
+
+    def reconcile(self, *args) -> str:
+        stdout = StringIO()
+        call_command("reconcile_ledger", "--chunk-size", "2", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_consistent_ledger_is_checkpointed(self) -> None:
+        output = self.reconcile()
+
+        self.assertIn("Reconciled 4 transactions for 2 users. Found 0 drifts.", output)
+        checkpoint = BalanceCheckpoint.objects.get(user=self.user)
+        self.assertEqual(checkpoint.balance, Decimal("300.0"))
+        self.assertEqual(checkpoint.transactions_count, 3)
+        self.assertEqual(
+            checkpoint.transaction_created_at, self.transactions[2].created_at
+        )
+
+    def test_reconciliation_resumes_from_checkpoint(self) -> None:
+        self.reconcile()
+        self.create_transaction(self.user, 4, "50.0")
+
+        output = self.reconcile()
+
+        self.assertIn("Reconciled 1 transactions for 1 users. Found 0 drifts.", output)
+        checkpoint = BalanceCheckpoint.objects.get(user=self.user)
+        self.assertEqual(checkpoint.balance, Decimal("350.0"))
+        self.assertEqual(checkpoint.transactions_count, 4)
+
+        # A full run ignores the checkpoints
+        self.assertIn("Reconciled 5 transactions", self.reconcile("--full"))
+
+    def test_drift_is_reported_and_not_checkpointed(self) -> None:
+        Transaction.objects.filter(id=self.transactions[1].id).update(
+            initial_balance=Decimal("90.0"), final_balance=Decimal("190.0")
+        )
+
+        output = self.reconcile()
+
+        self.assertIn(
+            f"transaction {self.transactions[1].id}: "
+            "Initial balance does not match the previous final balance.",
+            output,
+        )
+        # The next transaction no longer follows the changed final balance
+        self.assertIn("Found 2 drifts.", output)
+        self.assertFalse(BalanceCheckpoint.objects.filter(user=self.user).exists())
+        self.assertTrue(
+            BalanceCheckpoint.objects.filter(user=self.foreign_user).exists()
+        )
+
+    def test_overlapping_runs_keep_their_own_state(self) -> None:
+        Transaction.objects.filter(id=self.transactions[1].id).update(
+            initial_balance=Decimal("90.0"), final_balance=Decimal("190.0")
+        )
+        first_run = ReconcileLedger(chunk_size=2)
+        first_drifts = first_run.reconcile()
+        next(first_drifts)  # The first run is paused at its first drift
+
+        second_run = ReconcileLedger(chunk_size=2)
+        self.assertEqual(len(list(second_run.reconcile())), 2)
+        self.assertEqual(second_run.transactions_count, 4)
+
+        self.assertEqual(len(list(first_drifts)), 1)
+        self.assertEqual(first_run.transactions_count, 4)
+        self.assertEqual(first_run.drifts_count, 2)
+
+    def test_transactions_created_at_the_same_time_follow_the_chain(self) -> None:
+        Transaction.objects.filter(user=self.user).update(
+            created_at=self.transactions[0].created_at
+        )
+
+        self.assertIn("Found 0 drifts.", self.reconcile())
+
+
+class ExportTransactionsCommandTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = BaseUserAPITestCase().create_user()
+        for index, status in enumerate(
+            [TransactionStatuses.SUCCESSFUL.value, TransactionStatuses.FAILED.value]
+        ):
+            Transaction.objects.create(
+                external_transaction_id=f"TX{index}",
+                cash_flow=TransactionCashFlow.INWARD.value,
+                type=TransactionTypes.DEPOSIT.value,
+                status=status,
+                service=TransactionServices.MPESA.value,
+                amount=Decimal("10.0"),
+                user=self.user,
+            )
+
+    def test_command_streams_filtered_transactions(self) -> None:
+        stdout = StringIO()
+        call_command(
+            "export_transactions",
+            "--status",
+            "SUCCESSFUL",
+            "--format",
+            "jsonl",
+            stdout=stdout,
+        )
+
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('"external_transaction_id": "TX0"', lines[0])
+
+    def test_command_writes_gzipped_file(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "transactions.csv.gz")
+            call_command("export_transactions", "--gzip", "--output", path)
+
+            with gzip.open(path, "rt") as export:
+                self.assertEqual(len(export.read().splitlines()), 3)
@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+import requests
+from django.test import TestCase, override_settings
+
+from accounts.daraja import DarajaClient
+from commons.metrics import Metrics
+
+
+class StubDarajaHandler(BaseHTTPRequestHandler):
+    """Answers like Daraja, failing the first `failures` calls of /flaky"""
+
+    protocol_version = "HTTP/1.1"  # Keep connections alive
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections_count += 1  # type: ignore
+
+    def respond(self, status_code: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass  # The client timed out and hung up
+
+    def handle_call(self) -> None:
+        self.server.requests_count += 1  # type: ignore
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        if self.path == "/slow":
+            time.sleep(0.5)
+        if self.path == "/flaky" and self.server.failures > 0:  # type: ignore
+            self.server.failures -= 1  # type: ignore
+            self.respond(503, {"errorMessage": "Service unavailable"})
+            return
+
+        self.respond(200, {"ResponseCode": "0"})
+
+    do_GET = handle_call
+    do_POST = handle_call
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@override_settings(
+    MPESA_CONNECT_TIMEOUT=1,
+    MPESA_READ_TIMEOUT=0.2,
+    MPESA_MAX_RETRIES=2,
+    MPESA_RETRY_BACKOFF=0.01,
+)
+class DarajaClientTestCase(TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubDarajaHandler)
+        self.server.connections_count = 0  # type: ignore
+        self.server.requests_count = 0  # type: ignore
+        self.server.failures = 2  # type: ignore
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.client = DarajaClient()
+        self.endpoint = f"test-{uuid4()}"  # Metrics are shared between test runs
+
+    def tearDown(self) -> None:
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_kept_alive(self) -> None:
+        for _ in range(3):
+            response = self.client.post(f"{self.url}/ok", json={}, endpoint="b2c")
+            self.assertEqual(response.json(), {"ResponseCode": "0"})
+
+        self.assertEqual(self.server.connections_count, 1)  # type: ignore
+
+    def test_get_is_retried_on_server_errors(self) -> None:
+        response = self.client.get(f"{self.url}/flaky", endpoint=self.endpoint)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests_count, 3)  # type: ignore
+
+    def test_post_is_not_sent_twice(self) -> None:
+        response = self.client.post(f"{self.url}/flaky", json={}, endpoint="b2c")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests_count, 1)  # type: ignore
+
+    def test_slow_calls_time_out(self) -> None:
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            # Timed out reads of idempotent calls are retried before giving up
+            self.client.get(f"{self.url}/slow", endpoint=self.endpoint)
+
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.client.post(f"{self.url}/slow", json={}, endpoint=self.endpoint)
+
+    def test_latency_is_recorded_per_endpoint_and_outcome(self) -> None:
+        self.client.get(f"{self.url}/ok", endpoint=self.endpoint)
+        self.client.get(f"{self.url}/ok", endpoint=self.endpoint)
+
+        metric = Metrics.get(
+            "daraja_request_seconds", endpoint=self.endpoint, outcome="200"
+        )
+        self.assertEqual(metric["count"], 2)
+        self.assertEqual(metric["le_0.05"], 2)
+        self.assertLess(metric["sum"], 0.1)
@@ -0,0 +1,89 @@
+import random
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from uuid import uuid4
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from accounts.constants import (
+    TransactionCashFlow,
+    TransactionServices,
+    TransactionStatuses,
+    TransactionTypes,
+)
+from accounts.models import Transaction, Wallet
+from commons.tests.base_tests import random_phone
+from users.models import User
+
+
+class ConcurrentLedgerPostingTestCase(TransactionTestCase):
+    """Post thousands of transactions from many threads at once."""
+
+    users_count = 20
+    postings_count = 2000
+    workers = 16
+
+    def setUp(self) -> None:
+        self.users = [
+            User.objects.create_user(
+                phone_number=random_phone(), password="password123"
+            )
+            for _ in range(self.users_count)
+        ]
+
+    def post_transaction(self, user_id, cash_flow: str, amount: Decimal) -> None:
+        try:
+            Transaction.objects.create(
+                external_transaction_id=str(uuid4()),
+                cash_flow=cash_flow,
+                type=TransactionTypes.REWARD.value,
+                status=TransactionStatuses.SUCCESSFUL.value,
+                service=TransactionServices.MAJIBU.value,
+                description="Concurrent posting",
+                amount=amount,
+                user_id=user_id,
+            )
+        finally:
+            connection.close()  # Each thread opens its own connection
+
+    def test_concurrent_postings_keep_exact_balances(self) -> None:
+        expected_balances: dict = defaultdict(Decimal)
+        postings = []
+        for _ in range(self.postings_count):
+            user = random.choice(self.users)
+            cash_flow = random.choice(list(TransactionCashFlow)).value
+            amount = Decimal(random.randint(1, 500))
+
+            expected_balances[user.id] += (
+                amount if cash_flow == TransactionCashFlow.INWARD.value else -amount
+            )
+            postings.append((user.id, cash_flow, amount))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self.post_transaction, *posting) for posting in postings
+            ]
+            for future in futures:
+                future.result()  # Raise any exception from the threads
+
+        self.assertEqual(Transaction.objects.count(), self.postings_count)
+
+        for user_id, expected_balance in expected_balances.items():
+            wallet = Wallet.objects.get(user_id=user_id)
+            self.assertEqual(wallet.balance, expected_balance)
+
+            # Every posting starts from the final balance of the one before it
+            balances = Transaction.objects.filter(user_id=user_id).order_by(
+                "created_at"
+            )
+            previous_final_balance = Decimal("0.0")
+            for transaction_obj in balances:
+                self.assertEqual(
+                    transaction_obj.initial_balance, previous_final_balance
+                )
+                previous_final_balance = transaction_obj.final_balance
+
+            self.assertEqual(previous_final_balance, expected_balance)
+            self.assertEqual(wallet.version, balances.count())
@@ -0,0 +1,46 @@
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+
+from accounts.loadtest import PaymentsLoadTest, percentiles
+from accounts.models import MpesaCallback
+
+
+@override_settings(MPESA_B2C_RATE_LIMIT=100)
+class PaymentsLoadTestTestCase(TransactionTestCase):
+    def test_payments_flow_end_to_end(self) -> None:
+        report = PaymentsLoadTest(
+            users=5, concurrency=5, callback_delay=0.1, duplicate_rate=1.0, timeout=30
+        ).run()
+
+        for flow in ("deposits", "withdrawals"):
+            self.assertEqual(report[flow]["succeeded"], 5, msg=report)
+            self.assertEqual(report[flow]["pending"], 0)
+            self.assertIn("p99", report[flow]["latency"])
+
+        # Every result was posted twice but only processed once
+        self.assertEqual(MpesaCallback.objects.count(), 10)
+        self.assertEqual(report["ledger_errors"], [])
+
+    def test_failed_payments_are_not_posted(self) -> None:
+        report = PaymentsLoadTest(
+            users=4, concurrency=4, callback_delay=0.1, result_failure_rate=1.0
+        ).run()
+
+        self.assertEqual(report["deposits"]["failed"], 4)
+        self.assertEqual(report["withdrawals"]["failed"], 4)
+        self.assertEqual(report["ledger_errors"], [])
+
+    def test_command_refuses_to_run_without_debug(self) -> None:
+        with self.assertRaises(CommandError):
+            call_command("load_test_payments", users=1)
+
+
+class PercentilesTestCase(TransactionTestCase):
+    def test_nearest_rank_percentiles(self) -> None:
+        latencies = [float(seconds) for seconds in range(1, 101)]
+
+        self.assertEqual(
+            percentiles(latencies),
+            {"p50": 50.0, "p90": 90.0, "p99": 99.0, "max": 100.0},
+        )
+        self.assertEqual(percentiles([]), {})
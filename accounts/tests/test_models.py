@@ -1,16 +1,19 @@
 import json
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
+from redis.exceptions import RedisError
 
+from accounts.balance_cache import BalanceCache
 from accounts.constants import (
     STKPUSH_DEPOSIT_DESCRPTION,
     TransactionCashFlow,
     TransactionServices,
     TransactionStatuses,
 )
-from accounts.models import MpesaPayment, Transaction
+from accounts.models import MpesaPayment, Transaction, Wallet
 from accounts.serializers.mpesa import (
     MpesaPaymentCreateSerializer,
     WithdrawalCreateSerializer,
@@ -22,6 +25,7 @@ from accounts.tests.test_data import (
     withdrawal_obj_instance,
 )
 from accounts.utils import process_mpesa_stk
+from commons.models import ExternalResponse
 from commons.tests.base_tests import BaseUserAPITestCase
 
 User = get_user_model()
@@ -73,6 +77,7 @@ class TransactionTestCase(TestCase):
         self.assertEqual(transaction.charge, Decimal(1.00))
         self.assertEqual(transaction.initial_balance, Decimal(0.00))
         self.assertEqual(transaction.final_balance, Decimal(1.00))
+        self.assertNotIn("external_response_record", serializer.data)
 
     def test_create_negative_transaction_instance_successfully(self):
         data = self.sample_positive_transaction_instance_info.copy()
@@ -101,6 +106,56 @@ class TransactionTestCase(TestCase):
         self.assertEqual(transaction.initial_balance, 100.00)
         self.assertEqual(transaction.final_balance, 48.00)
 
+    def test_external_response_is_stored_out_of_row(self) -> None:
+        payload = {"ResultCode": 0, "ResultDesc": "Accepted"}
+        transaction = Transaction.objects.create(
+            **{
+                **self.sample_positive_transaction_instance_info,
+                "external_response": payload,
+                "amount": Decimal("1.0"),
+                "user": self.user,
+            }
+        )
+
+        # Rows are fetched without their payload, which is loaded on access
+        with self.assertNumQueries(1):
+            transaction = Transaction.objects.get(id=transaction.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(transaction.external_response, payload)
+
+        # New payloads are appended, the saved ones are never changed
+        record = transaction.external_response_record
+        transaction.external_response = {"ResultCode": 1}
+        transaction.save(update_fields=["status"])
+        transaction.refresh_from_db()
+
+        self.assertEqual(transaction.external_response, {"ResultCode": 1})
+        self.assertEqual(ExternalResponse.objects.get(id=record.id).payload, payload)
+        with self.assertRaises(ValueError):
+            record.save()
+
+    def test_bulk_posted_transactions_save_external_responses(self) -> None:
+        entries = [
+            Transaction(
+                **{
+                    **self.sample_positive_transaction_instance_info,
+                    "external_transaction_id": f"BULK{index}",
+                    "amount": Decimal("1.0"),
+                    "user": self.user,
+                },
+            )
+            for index in range(2)
+        ]
+        entries[0].external_response = {"id": 1}
+        Transaction.objects.bulk_post(entries)
+
+        self.assertEqual(
+            Transaction.objects.get(id=entries[0].id).external_response, {"id": 1}
+        )
+        self.assertEqual(
+            Transaction.objects.get(id=entries[1].id).external_response, "{}"
+        )
+
 
 class MpesaPaymentTestCase(BaseUserAPITestCase):
     def setUp(self) -> None:
@@ -168,3 +223,227 @@ class WithdrawalTestCase(BaseUserAPITestCase):
         self.assertEqual(transaction_obj.status, TransactionStatuses.SUCCESSFUL.value)
         self.assertEqual(transaction_obj.service, TransactionServices.MPESA.value)
         self.assertEqual(transaction_obj.amount, self.withdrawal.transaction_amount)
+
+
+class WalletTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone_number="+254701301401",
+            password="password123",
+            username="testuser",
+        )
+        self.transaction_info = {
+            "external_transaction_id": "SKJO89BVH",
+            "cash_flow": TransactionCashFlow.INWARD.value,
+            "type": "DEPOSIT",
+            "status": TransactionStatuses.SUCCESSFUL.value,
+            "service": TransactionServices.MPESA.value,
+            "amount": Decimal("100.0"),
+            "user": self.user,
+        }
+
+    def test_posting_transaction_updates_wallet(self) -> None:
+        Transaction.objects.create(**self.transaction_info)
+        Transaction.objects.create(
+            **{
+                **self.transaction_info,
+                "external_transaction_id": "SKJO89BVI",
+                "cash_flow": TransactionCashFlow.OUTWARD.value,
+                "amount": Decimal("30.0"),
+            }
+        )
+
+        wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual(wallet.balance, Decimal("70.0"))
+        self.assertEqual(wallet.version, 2)
+        self.assertEqual(Transaction.objects.get_user_balance(self.user), Decimal(70))
+
+    def test_updating_transaction_does_not_post_it_again(self) -> None:
+        transaction_obj = Transaction.objects.create(**self.transaction_info)
+        transaction_obj.status = TransactionStatuses.FAILED.value
+        transaction_obj.save()
+
+        transaction_obj.refresh_from_db()
+        self.assertEqual(transaction_obj.initial_balance, Decimal("0.0"))
+        self.assertEqual(transaction_obj.final_balance, Decimal("100.0"))
+        self.assertEqual(Wallet.objects.get(user=self.user).version, 1)
+
+    def test_user_balance_falls_back_to_ledger_without_wallet(self) -> None:
+        Transaction.objects.create(**self.transaction_info)
+        Wallet.objects.filter(user=self.user).delete()
+
+        self.assertEqual(
+            Transaction.objects.get_user_balance(self.user), Decimal("100.0")
+        )
+
+        # The next posting creates the wallet from the ledger balance
+        Transaction.objects.create(
+            **{**self.transaction_info, "external_transaction_id": "SKJO89BVI"}
+        )
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("200.0"))
+
+    def test_bulk_post_chains_balances_per_user(self) -> None:
+        foreign_user = User.objects.create_user(
+            phone_number="+254701301402", password="password123"
+        )
+        Transaction.objects.create(**self.transaction_info)
+
+        entries = [
+            Transaction(**{**self.transaction_info, "external_transaction_id": "A1"}),
+            Transaction(
+                **{
+                    **self.transaction_info,
+                    "external_transaction_id": "A2",
+                    "cash_flow": TransactionCashFlow.OUTWARD.value,
+                    "amount": Decimal("50.0"),
+                }
+            ),
+            Transaction(
+                **{
+                    **self.transaction_info,
+                    "external_transaction_id": "B1",
+                    "user": foreign_user,
+                }
+            ),
+        ]
+        Transaction.objects.bulk_post(entries)
+
+        self.assertEqual(entries[0].initial_balance, Decimal("100.0"))
+        self.assertEqual(entries[0].final_balance, Decimal("200.0"))
+        self.assertEqual(entries[1].initial_balance, Decimal("200.0"))
+        self.assertEqual(entries[1].final_balance, Decimal("150.0"))
+        self.assertEqual(entries[2].final_balance, Decimal("100.0"))
+
+        wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual(wallet.balance, Decimal("150.0"))
+        self.assertEqual(wallet.version, 3)
+        self.assertEqual(Wallet.objects.get(user=foreign_user).version, 1)
+
+    def test_bulk_post_requires_a_user(self) -> None:
+        with self.assertRaises(ValueError):
+            Transaction.objects.bulk_post(
+                [Transaction(**{**self.transaction_info, "user": None})]
+            )
+
+    def test_bulk_post_uses_constant_number_of_queries(self) -> None:
+        Transaction.objects.create(**self.transaction_info)
+        entries = [
+            Transaction(
+                **{**self.transaction_info, "external_transaction_id": f"BULK{i}"}
+            )
+            for i in range(10_000)
+        ]
+
+        # Lock the wallet, copy the entries and update the wallet
+        with self.assertNumQueries(5):
+            Transaction.objects.bulk_post(entries)
+
+        self.assertEqual(
+            Wallet.objects.get(user=self.user).balance, Decimal("1000100.0")
+        )
+
+    def test_bulk_post_copies_entries_exactly(self) -> None:
+        description = "Reward\tfor \\N session\nof today\r"
+        entry = Transaction(
+            **{**self.transaction_info, "amount": Decimal("12.5")},
+            description=description,
+        )
+        Transaction.objects.bulk_post([entry])
+
+        self.assertFalse(entry._state.adding)
+        saved = Transaction.objects.get(id=entry.id)
+        self.assertEqual(saved.description, description)
+        self.assertEqual(saved.final_balance, Decimal("12.5"))
+        self.assertEqual(saved.created_at, entry.created_at)
+        self.assertIsNone(saved.external_response_record_id)
+
+
+class WalletBalanceCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone_number="+254701301401",
+            password="password123",
+            username="testuser",
+        )
+        self.transaction_info = {
+            "external_transaction_id": "SKJO89BVH",
+            "cash_flow": TransactionCashFlow.INWARD.value,
+            "type": "DEPOSIT",
+            "status": TransactionStatuses.SUCCESSFUL.value,
+            "service": TransactionServices.MPESA.value,
+            "amount": Decimal("100.0"),
+            "user": self.user,
+        }
+
+    def test_balance_is_filled_on_miss_and_read_from_cache(self) -> None:
+        Transaction.objects.create(**self.transaction_info)
+
+        with self.assertNumQueries(1):
+            balance = Transaction.objects.get_cached_user_balance(self.user)
+        self.assertEqual(balance, Decimal("100.0"))
+
+        with self.assertNumQueries(0):
+            balance = Transaction.objects.get_cached_user_balance(self.user)
+        self.assertEqual(balance, Decimal("100.0"))
+
+    def test_postings_write_through_after_commit(self) -> None:
+        Transaction.objects.create(**self.transaction_info)
+        Transaction.objects.get_cached_user_balance(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                **{**self.transaction_info, "external_transaction_id": "SKJO89BVI"}
+            )
+        self.assertEqual(BalanceCache.get(self.user.id), Decimal("200.0"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.bulk_post(
+                [
+                    Transaction(
+                        **{**self.transaction_info, "external_transaction_id": "A1"}
+                    )
+                ]
+            )
+        self.assertEqual(BalanceCache.get(self.user.id), Decimal("300.0"))
+
+    def test_stale_writes_are_rejected(self) -> None:
+        self.assertTrue(
+            BalanceCache.set(self.user.id, balance=Decimal("50.0"), version=2)
+        )
+        self.assertFalse(
+            BalanceCache.set(self.user.id, balance=Decimal("10.0"), version=1)
+        )
+        self.assertFalse(
+            BalanceCache.set(self.user.id, balance=Decimal("10.0"), version=2)
+        )
+        self.assertEqual(BalanceCache.get(self.user.id), Decimal("50.0"))
+
+    def test_balance_is_read_from_wallet_when_cache_fails(self) -> None:
+        Transaction.objects.create(**self.transaction_info)
+
+        with patch.object(
+            BalanceCache, "get_client", side_effect=RedisError("Connection refused")
+        ):
+            balance = Transaction.objects.get_cached_user_balance(self.user)
+
+        self.assertEqual(balance, Decimal("100.0"))
+
+    def test_balance_is_dropped_when_writing_it_fails(self) -> None:
+        Transaction.objects.create(**self.transaction_info)
+        Transaction.objects.get_cached_user_balance(self.user)
+
+        with patch("redis.Redis.eval", side_effect=RedisError("Connection reset")):
+            with self.captureOnCommitCallbacks(execute=True):
+                Transaction.objects.create(
+                    **{
+                        **self.transaction_info,
+                        "external_transaction_id": "SKJO89BVI",
+                        "cash_flow": TransactionCashFlow.OUTWARD.value,
+                        "type": "WITHDRAWAL",
+                    }
+                )
+
+        self.assertIsNone(BalanceCache.get(self.user.id))
+        self.assertEqual(
+            Transaction.objects.get_cached_user_balance(self.user), Decimal("0.0")
+        )
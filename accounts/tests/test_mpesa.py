@@ -1,3 +1,4 @@
+import json
 from unittest.mock import patch
 
 from django.urls import reverse
@@ -5,7 +6,8 @@ from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
 from accounts.constants import DEPOSIT_AMOUNT_CHOICES, MPESA_WHITE_LISTED_IPS
-from accounts.models import Transaction
+from accounts.models import MpesaCallback, Transaction
+from accounts.payouts import PayoutDispatcher
 from accounts.tests.test_data import (
     mock_failed_b2c_result,
     mock_stk_push_result,
@@ -41,7 +43,7 @@ class WithdrawalResultViewTests(APITestCase):
         )  # Replace with your actual URL name
         self.mock_successful_b2c_result = mock_successful_b2c_result
 
-    @patch("accounts.views.mpesa.process_b2c_payment_result_task.delay")
+    @patch("accounts.views.mpesa.process_mpesa_callbacks_task.delay")
     def test_white_listed_ip_can_make_post_request(self, mock_task) -> None:
         for ip in MPESA_WHITE_LISTED_IPS:
             self.client.defaults["REMOTE_ADDR"] = ip
@@ -58,7 +60,7 @@ class WithdrawalResultViewTests(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
-    @patch("accounts.views.mpesa.process_b2c_payment_result_task.delay")
+    @patch("accounts.views.mpesa.process_mpesa_callbacks_task.delay")
     def test_successful_request_triggers_background_task(self, mock_task) -> None:
         ip = MPESA_WHITE_LISTED_IPS[0]
         self.client.defaults["REMOTE_ADDR"] = ip
@@ -68,7 +70,7 @@ class WithdrawalResultViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         mock_task.assert_called_once()
 
-    @patch("accounts.views.mpesa.process_b2c_payment_result_task.delay")
+    @patch("accounts.views.mpesa.process_mpesa_callbacks_task.delay")
     def test_failed_request_triggers_background_task(self, mock_task) -> None:
         ip = MPESA_WHITE_LISTED_IPS[0]
         self.client.defaults["REMOTE_ADDR"] = ip
@@ -85,7 +87,7 @@ class STKPushCallbackViewTests(APITestCase):
         self.url = reverse("mpesa:stkpush-callback")
         self.mock_stk_push_result = mock_stk_push_result
 
-    @patch("accounts.views.mpesa.process_mpesa_stk_task.delay")
+    @patch("accounts.views.mpesa.process_mpesa_callbacks_task.delay")
     def test_white_listed_ip_can_make_post_request(self, mock_task) -> None:
         for ip in MPESA_WHITE_LISTED_IPS:
             self.client.defaults["REMOTE_ADDR"] = ip
@@ -102,7 +104,7 @@ class STKPushCallbackViewTests(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
-    @patch("accounts.views.mpesa.process_mpesa_stk_task.delay")
+    @patch("accounts.views.mpesa.process_mpesa_callbacks_task.delay")
     def test_successful_request_triggers_background_task(self, mock_task) -> None:
         ip = MPESA_WHITE_LISTED_IPS[0]
         self.client.defaults["REMOTE_ADDR"] = ip
@@ -113,6 +115,18 @@ class STKPushCallbackViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         mock_task.assert_called_once()
 
+    @patch("accounts.views.mpesa.process_mpesa_callbacks_task.delay")
+    def test_retried_callbacks_are_processed_once(self, mock_task) -> None:
+        self.client.defaults["REMOTE_ADDR"] = MPESA_WHITE_LISTED_IPS[0]
+        for _ in range(3):
+            response = self.client.post(
+                self.url, data=self.mock_stk_push_result, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        mock_task.assert_called_once()
+        self.assertEqual(MpesaCallback.objects.count(), 1)
+
 
 class TriggerSTKPushViewTests(BaseUserAPITestCase):
     def setUp(self) -> None:
@@ -160,7 +174,7 @@ class WithdrawalRequestViewTests(BaseUserAPITestCase):
         self.similar_request_data = {"amount": 50}
         self.force_authenticate_user()
 
-    @patch("accounts.views.mpesa.process_b2c_payment_task.delay")
+    @patch("accounts.views.mpesa.dispatch_payouts_task.delay")
     def test_successful_request_calls_delay_task(self, mock_task):
         with patch.object(Transaction.objects, "get_user_balance", return_value=500):
             response = self.client.post(
@@ -168,9 +182,14 @@ class WithdrawalRequestViewTests(BaseUserAPITestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             mock_task.assert_called_once()
+            key = PayoutDispatcher.key(PayoutDispatcher.queue_key)
+            self.assertEqual(
+                PayoutDispatcher.get_client(key).lrange(key, 0, -1),
+                [json.dumps({"user_id": str(self.user.id), "amount": 100}).encode()],
+            )
             MpesaWithdrawalThrottle.cache.clear()
 
-    @patch("accounts.views.mpesa.process_b2c_payment_task.delay")
+    @patch("accounts.views.mpesa.dispatch_payouts_task.delay")
     def test_view_successfully_throttles_requests(self, mock_task):
         with patch.object(Transaction.objects, "get_user_balance", return_value=500):
             for _ in range(5):
@@ -192,7 +211,7 @@ class WithdrawalRequestViewTests(BaseUserAPITestCase):
             self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
             MpesaWithdrawalThrottle.cache.clear()  # Reset throttling
 
-    @patch("accounts.views.mpesa.process_b2c_payment_task.delay")
+    @patch("accounts.views.mpesa.dispatch_payouts_task.delay")
     def test_invalid_serializer(self, mock_task):
         invalid_data = {"amount": 9999}  # Not within min and max values
         response = self.client.post(self.url, data=invalid_data, format="json")
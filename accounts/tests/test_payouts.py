@@ -0,0 +1,215 @@
+import json
+import time
+from decimal import Decimal
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from accounts.constants import (
+    TransactionCashFlow,
+    TransactionServices,
+    TransactionStatuses,
+    TransactionTypes,
+)
+from accounts.models import Transaction, Withdrawal
+from accounts.payouts import PayoutDispatcher
+from accounts.tests.test_data import sample_b2c_response
+from commons.tests.base_tests import BaseUserAPITestCase, random_phone
+from commons.utils import md5_hash
+from users.models import User
+
+
+def accept_b2c_payment(*, amount: int, party_b: str) -> dict:
+    return {**sample_b2c_response, "ConversationID": f"AG_{uuid4().hex}"}
+
+
+class DispatcherStopped(BaseException):
+    """Stops the dispatcher like a task time limit would"""
+
+
+@override_settings(MPESA_B2C_RATE_LIMIT=1000, MPESA_B2C_CONCURRENCY=8)
+class PayoutDispatcherTestCase(BaseUserAPITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.users = [
+            User.objects.create_user(phone_number=random_phone(), password="pass1234")
+            for _ in range(10)
+        ]
+        Transaction.objects.bulk_post(
+            [
+                Transaction(
+                    external_transaction_id=f"DEPOSIT{index}",
+                    cash_flow=TransactionCashFlow.INWARD.value,
+                    type=TransactionTypes.DEPOSIT.value,
+                    status=TransactionStatuses.SUCCESSFUL.value,
+                    service=TransactionServices.MPESA.value,
+                    amount=Decimal("1000.0"),
+                    user=user,
+                )
+                for index, user in enumerate(cls.users)
+            ]
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def enqueue_payouts(self, amount: int = 100) -> None:
+        for user in self.users:
+            PayoutDispatcher.enqueue(user=user, amount=amount)
+
+    def get_requests(self, name: str) -> list[dict]:
+        key = PayoutDispatcher.key(name)
+        requests = PayoutDispatcher.get_client(key).lrange(key, 0, -1)
+        return [json.loads(request) for request in requests]
+
+    def count_withdrawal_debits(self) -> int:
+        return Transaction.objects.filter(
+            type=TransactionTypes.WITHDRAWAL.value
+        ).count()
+
+    def test_enqueue_guards_against_similar_requests(self) -> None:
+        PayoutDispatcher.enqueue(user=self.users[0], amount=100)
+
+        guard = md5_hash(f"{self.users[0].phone_number}:withdraw_request")
+        self.assertEqual(cache.get(guard), 100)
+        self.assertEqual(len(self.get_requests(PayoutDispatcher.queue_key)), 1)
+
+    @patch("accounts.payouts.initiate_b2c_payment", side_effect=accept_b2c_payment)
+    def test_dispatch_sends_and_saves_every_payout(self, mock_initiate) -> None:
+        self.enqueue_payouts()
+
+        sent_count = PayoutDispatcher.dispatch(batch_size=3)
+
+        self.assertEqual(sent_count, 10)
+        self.assertEqual(mock_initiate.call_count, 10)
+        self.assertEqual(Withdrawal.objects.count(), 10)
+        # Every withdrawal still posts its own debit
+        self.assertEqual(self.count_withdrawal_debits(), 10)
+        self.assertEqual(self.get_requests(PayoutDispatcher.queue_key), [])
+        self.assertEqual(self.get_requests(PayoutDispatcher.processing_key), [])
+
+    @patch("accounts.payouts.initiate_b2c_payment")
+    def test_failed_payouts_do_not_stop_the_batch(self, mock_initiate) -> None:
+        mock_initiate.side_effect = [
+            Exception("Connection reset"),
+            None,
+            *[accept_b2c_payment(amount=100, party_b="") for _ in range(8)],
+        ]
+        self.enqueue_payouts()
+
+        PayoutDispatcher.dispatch()
+
+        self.assertEqual(mock_initiate.call_count, 10)
+        self.assertEqual(Withdrawal.objects.count(), 8)
+
+    @override_settings(MPESA_B2C_RATE_LIMIT=20)
+    @patch("accounts.payouts.initiate_b2c_payment", side_effect=accept_b2c_payment)
+    def test_dispatch_is_rate_limited(self, mock_initiate) -> None:
+        self.enqueue_payouts()
+
+        started_at = time.monotonic()
+        PayoutDispatcher.dispatch()
+
+        # 10 calls spaced 50ms apart
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.45)
+
+    @patch("accounts.payouts.initiate_b2c_payment")
+    def test_payouts_are_sent_concurrently(self, mock_initiate) -> None:
+        def slow_b2c_payment(**kwargs) -> dict:
+            time.sleep(0.2)
+            return accept_b2c_payment(**kwargs)
+
+        mock_initiate.side_effect = slow_b2c_payment
+        self.enqueue_payouts()
+
+        started_at = time.monotonic()
+        PayoutDispatcher.dispatch()
+
+        # Two rounds of 8 threads instead of 10 calls in a row
+        self.assertLess(time.monotonic() - started_at, 1.0)
+        self.assertEqual(Withdrawal.objects.count(), 10)
+
+    @patch("accounts.payouts.initiate_b2c_payment", side_effect=accept_b2c_payment)
+    def test_one_dispatcher_drains_the_queue_at_a_time(self, mock_initiate) -> None:
+        self.enqueue_payouts()
+        cache.set(PayoutDispatcher.lock_key, 1)
+
+        self.assertEqual(PayoutDispatcher.dispatch(), 0)
+        mock_initiate.assert_not_called()
+
+    @patch("accounts.payouts.initiate_b2c_payment", side_effect=accept_b2c_payment)
+    def test_payouts_users_can_no_longer_afford_are_dropped(
+        self, mock_initiate
+    ) -> None:
+        PayoutDispatcher.enqueue(user=self.users[0], amount=900)
+        PayoutDispatcher.enqueue(user=self.users[0], amount=900)
+        PayoutDispatcher.enqueue(user=self.users[1], amount=1000)
+
+        self.assertEqual(PayoutDispatcher.dispatch(), 1)
+
+        # The second request of the first user exceeds what is left, the second
+        # user can not pay the withdrawal charge on top of the amount
+        mock_initiate.assert_called_once()
+        self.assertEqual(Withdrawal.objects.get().transaction_amount, 900)
+        self.assertEqual(self.get_requests(PayoutDispatcher.processing_key), [])
+
+    @override_settings(PAYOUT_DISPATCH_TIME_BUDGET=0)
+    @patch("accounts.payouts.initiate_b2c_payment", side_effect=accept_b2c_payment)
+    def test_dispatch_stops_once_its_time_budget_is_spent(self, mock_initiate) -> None:
+        self.enqueue_payouts()
+
+        self.assertEqual(PayoutDispatcher.dispatch(), 0)
+        mock_initiate.assert_not_called()
+        self.assertEqual(len(self.get_requests(PayoutDispatcher.queue_key)), 10)
+
+    @override_settings(MPESA_B2C_CONCURRENCY=1)
+    @patch("accounts.payouts.initiate_b2c_payment")
+    def test_withdrawals_are_saved_as_their_payouts_are_accepted(
+        self, mock_initiate
+    ) -> None:
+        def stop_on_third_payout(**kwargs) -> dict:
+            time.sleep(0.1)
+            if mock_initiate.call_count == 3:
+                raise DispatcherStopped
+            return accept_b2c_payment(**kwargs)
+
+        mock_initiate.side_effect = stop_on_third_payout
+        self.enqueue_payouts()
+
+        with self.assertRaises(DispatcherStopped):
+            PayoutDispatcher.dispatch()
+
+        # Payouts accepted before the dispatcher stopped were debited
+        self.assertEqual(Withdrawal.objects.count(), 2)
+        self.assertEqual(self.count_withdrawal_debits(), 2)
+        self.assertLessEqual(mock_initiate.call_count, 4)
+        # Requests in flight stay in the processing list, the rest were never sent
+        in_flight = self.get_requests(PayoutDispatcher.processing_key)
+        queued = self.get_requests(PayoutDispatcher.queue_key)
+        self.assertEqual(len(in_flight), mock_initiate.call_count - 2)
+        self.assertEqual(len(in_flight) + len(queued), 8)
+
+        mock_initiate.reset_mock(side_effect=True)
+        mock_initiate.side_effect = accept_b2c_payment
+        PayoutDispatcher.dispatch()
+
+        # Requests that may have been paid are kept aside instead of being resent
+        self.assertEqual(mock_initiate.call_count, len(queued))
+        self.assertEqual(self.get_requests(PayoutDispatcher.unconfirmed_key), in_flight)
+        self.assertEqual(Withdrawal.objects.count(), 2 + len(queued))
+
+    @patch("accounts.payouts.initiate_b2c_payment", side_effect=accept_b2c_payment)
+    def test_payouts_whose_withdrawal_is_not_saved_stay_in_processing(
+        self, mock_initiate
+    ) -> None:
+        self.enqueue_payouts()
+
+        with patch.object(PayoutDispatcher, "save_withdrawal", return_value=False):
+            PayoutDispatcher.dispatch()
+
+        self.assertEqual(len(self.get_requests(PayoutDispatcher.processing_key)), 10)
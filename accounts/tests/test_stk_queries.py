@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from accounts.constants import MpesaCallbackKinds, TransactionTypes
+from accounts.models import MpesaCallback, MpesaPayment, Transaction
+from accounts.simulator import DarajaSimulator
+from accounts.stk_queries import StkPaymentsPoller
+from accounts.tests.test_data import mock_stk_push_response, mock_stk_push_result
+from accounts.utils import trigger_mpesa_stkpush_payment
+from commons.tests.base_tests import BaseUserAPITestCase
+
+mock_stk_query_result = {
+    "ResponseCode": "0",
+    "ResponseDescription": "The service request has been accepted successsfully",
+    "MerchantRequestID": mock_stk_push_response["MerchantRequestID"],
+    "CheckoutRequestID": mock_stk_push_response["CheckoutRequestID"],
+    "ResultCode": "0",
+    "ResultDesc": "The service request is processed successfully.",
+}
+
+
+@override_settings(MPESA_STK_QUERY_RATE_LIMIT=1000)
+class StkPaymentsPollerTestCase(BaseUserAPITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = self.create_user()
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def create_payment(
+        self, checkout_request_id: str = mock_stk_push_response["CheckoutRequestID"]
+    ) -> MpesaPayment:
+        mpesa_payment = MpesaPayment.objects.create(
+            phone_number=str(self.user.phone_number),
+            merchant_request_id=mock_stk_push_response["MerchantRequestID"],
+            checkout_request_id=checkout_request_id,
+            response_code=mock_stk_push_response["ResponseCode"],
+            amount=100,
+        )
+        self.make_stale(mpesa_payment)
+        return mpesa_payment
+
+    def make_stale(self, mpesa_payment: MpesaPayment) -> None:
+        MpesaPayment.objects.filter(id=mpesa_payment.id).update(
+            created_at=datetime.now() - timedelta(minutes=10)
+        )
+
+    def test_payments_without_a_callback_are_settled_from_their_status(self) -> None:
+        simulator = DarajaSimulator(drop_rate=1.0)
+        simulator.start()
+        try:
+            with override_settings(**simulator.urls):
+                trigger_mpesa_stkpush_payment(100, str(self.user.phone_number))
+                mpesa_payment = MpesaPayment.objects.get()
+                self.make_stale(mpesa_payment)
+
+                self.assertEqual(StkPaymentsPoller.poll(), 1)
+        finally:
+            simulator.stop()
+
+        mpesa_payment.refresh_from_db()
+        self.assertEqual(mpesa_payment.result_code, 0)
+        self.assertEqual(
+            mpesa_payment.receipt_number, mpesa_payment.checkout_request_id
+        )
+        deposit = Transaction.objects.get(
+            user=self.user, type=TransactionTypes.DEPOSIT.value
+        )
+        self.assertEqual(deposit.amount, 100)
+
+    @patch("accounts.stk_queries.query_mpesa_stkpush_status")
+    def test_failed_payments_are_settled_without_a_deposit(self, mock_query) -> None:
+        mock_query.return_value = {
+            **mock_stk_query_result,
+            "ResultCode": "1032",
+            "ResultDesc": "Request cancelled by user",
+        }
+        mpesa_payment = self.create_payment()
+
+        self.assertEqual(StkPaymentsPoller.poll(), 1)
+
+        mpesa_payment.refresh_from_db()
+        self.assertEqual(mpesa_payment.result_code, 1032)
+        self.assertFalse(Transaction.objects.filter(user=self.user))
+
+    @patch("accounts.stk_queries.query_mpesa_stkpush_status", return_value=None)
+    def test_payments_being_processed_are_left_pending(self, mock_query) -> None:
+        mpesa_payment = self.create_payment()
+
+        self.assertEqual(StkPaymentsPoller.poll(), 0)
+
+        mock_query.assert_called_once_with(mpesa_payment.checkout_request_id)
+        mpesa_payment.refresh_from_db()
+        self.assertIsNone(mpesa_payment.result_code)
+
+    @patch("accounts.stk_queries.query_mpesa_stkpush_status")
+    def test_only_stale_payments_without_a_callback_are_queried(
+        self, mock_query
+    ) -> None:
+        MpesaPayment.objects.create(
+            phone_number=str(self.user.phone_number),
+            merchant_request_id="recent",
+            checkout_request_id="ws_CO_recent",
+            response_code=0,
+        )
+        self.create_payment(checkout_request_id="ws_CO_received")
+        MpesaCallback.objects.receive(
+            kind=MpesaCallbackKinds.STKPUSH.value,
+            request_id="ws_CO_received",
+            payload={},
+        )
+
+        StkPaymentsPoller.poll()
+
+        mock_query.assert_not_called()
+
+    @patch("accounts.stk_queries.query_mpesa_stkpush_status")
+    def test_late_callbacks_are_not_credited_again(self, mock_query) -> None:
+        mock_query.return_value = mock_stk_query_result
+        self.create_payment()
+        StkPaymentsPoller.poll()
+
+        received = MpesaCallback.objects.receive(
+            kind=MpesaCallbackKinds.STKPUSH.value,
+            request_id=mock_stk_push_response["CheckoutRequestID"],
+            payload=mock_stk_push_result["Body"]["stkCallback"],
+        )
+
+        self.assertFalse(received)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
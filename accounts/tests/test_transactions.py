@@ -1,3 +1,7 @@
+import csv
+import gzip
+import json
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
@@ -181,6 +185,14 @@ class TransactionListViewTests(BaseUserAPITestCase):
             self.transaction1.external_transaction_id,
         )
 
+    def test_staff_can_search_transactions_by_prefixes(self) -> None:
+        response = self.client.get(self.list_url, {"search": "TX8 description 2"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+
+        response = self.client.get(self.list_url, {"search": "TX9"})
+        self.assertEqual(len(response.data["results"]), 0)
+
     def test_user_can_list_their_own_transactions(self) -> None:
         self.force_authenticate_user()
         response = self.client.get(self.list_url)
@@ -240,3 +252,70 @@ class TransactionRetrieveUserBalanceViewTests(BaseUserAPITestCase):
         self.assertEqual(user_response.status_code, status.HTTP_200_OK)
         self.assertEqual(foreign_response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertIn("balance", user_response.data)
+
+
+class TransactionExportViewTests(BaseUserAPITestCase):
+    def setUp(self) -> None:
+        self.url = reverse("transactions:transaction-export")
+        self.user = self.create_user()
+        self.force_authenticate_staff_user()
+
+        for index, cash_flow in enumerate(
+            [TransactionCashFlow.INWARD.value] * 3 + [TransactionCashFlow.OUTWARD.value]
+        ):
+            Transaction.objects.create(
+                external_transaction_id=f"TX{index}",
+                cash_flow=cash_flow,
+                type=TransactionTypes.DEPOSIT.value,
+                status=TransactionStatuses.SUCCESSFUL.value,
+                service=TransactionServices.MPESA.value,
+                amount=Decimal("10.00"),
+                user=self.user,
+            )
+
+    def get_content(self, response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_staff_can_export_transactions_as_csv(self) -> None:
+        response = self.client.get(self.url, {"cash_flow": "INWARD"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(self.get_content(response).decode().splitlines()))
+        self.assertEqual(
+            [row["external_transaction_id"] for row in rows], ["TX0", "TX1", "TX2"]
+        )
+        self.assertEqual(rows[0]["user__phone_number"], self.user.phone_number)
+
+    def test_staff_can_export_gzipped_json_lines(self) -> None:
+        response = self.client.get(
+            self.url,
+            {
+                "export_format": "jsonl",
+                "gzip": "true",
+                "created_after": (datetime.now() - timedelta(days=1)).isoformat(),
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn("transactions.jsonl.gz", response["Content-Disposition"])
+        lines = gzip.decompress(self.get_content(response)).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[-1])["final_balance"], "20.00")
+
+    def test_date_filters_limit_the_export(self) -> None:
+        response = self.client.get(
+            self.url,
+            {"created_before": (datetime.now() - timedelta(days=1)).isoformat()},
+        )
+        self.assertEqual(self.get_content(response).decode().count("\n"), 1)
+
+    def test_invalid_export_format_is_rejected(self) -> None:
+        response = self.client.get(self.url, {"export_format": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_can_not_export_transactions(self) -> None:
+        self.force_authenticate_user()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
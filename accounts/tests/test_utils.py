@@ -1,9 +1,13 @@
-import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 from django.conf import settings
 from django.core.cache import cache
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from accounts.constants import (
     DEFAULT_B2C_CHARGE,
@@ -24,14 +28,21 @@ from accounts.tests.test_data import (
     withdrawal_obj_instance,
 )
 from accounts.utils import (
+    encrypt_initiator_password,
+    get_initiator_security_credential,
     get_mpesa_access_token,
+    get_mpesa_certificate,
+    get_mpesa_certificate_path,
+    get_mpesa_public_key,
     initiate_b2c_payment,
     initiate_mpesa_stkpush_payment,
     process_b2c_payment,
     process_b2c_payment_result,
     process_mpesa_stk,
+    renew_mpesa_access_tokens,
     trigger_mpesa_stkpush_payment,
 )
+from commons.locks import Locks
 from commons.tests.base_tests import BaseUserAPITestCase
 from commons.utils import calculate_b2c_withdrawal_charge
 
@@ -48,7 +59,7 @@ class TestMpesaSTKPush(TestCase):
         cache.clear()  # Flush all values from redis
         super().tearDownClass()
 
-    @patch("accounts.utils.requests")
+    @patch("accounts.utils.Daraja")
     def test_get_mpesa_access_token(self, mock_requests) -> None:
         expected_access_token = "fake_access_token"
         self.mock_response.json.return_value = {
@@ -60,7 +71,7 @@ class TestMpesaSTKPush(TestCase):
         access_token = get_mpesa_access_token()
         self.assertEqual(access_token, expected_access_token)
 
-    @patch("accounts.utils.requests")
+    @patch("accounts.utils.Daraja")
     def test_get_mpesa_access_token_is_set_in_redis(self, mock_requests) -> None:
         cache.clear()  # Ensure redis is clear for consistent results
         expected_access_token = "fake_access_token"
@@ -75,13 +86,106 @@ class TestMpesaSTKPush(TestCase):
 
         self.assertEqual(mock_requests.get.call_count, 1)
 
+    @patch("accounts.utils.Daraja")
+    def test_expired_token_is_fetched_by_one_worker(self, mock_requests) -> None:
+        cache.clear()
+
+        def get_token(*args, **kwargs):
+            time.sleep(0.3)  # Keep the other workers waiting
+            return self.mock_response
+
+        self.mock_response.json.return_value = {
+            "access_token": "fake_access_token",
+            "expires_in": "3599",
+        }
+        mock_requests.get.side_effect = get_token
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(get_mpesa_access_token) for _ in range(8)]
+            access_tokens = [future.result() for future in futures]
+
+        self.assertEqual(access_tokens, ["fake_access_token"] * 8)
+        self.assertEqual(mock_requests.get.call_count, 1)
+
+    @override_settings(MPESA_TOKEN_WAIT_TIMEOUT=0.3)
+    @patch("accounts.utils.Daraja")
+    def test_token_is_fetched_if_the_other_worker_is_stuck(self, mock_requests) -> None:
+        cache.clear()
+        cache.set("mpesa_access_token_lock", 1)
+        self.mock_response.json.return_value = {
+            "access_token": "fake_access_token",
+            "expires_in": "3599",
+        }
+        mock_requests.get.return_value = self.mock_response
+
+        self.assertEqual(get_mpesa_access_token(), "fake_access_token")
+        self.assertEqual(mock_requests.get.call_count, 1)
+
+    @patch("accounts.utils.Daraja")
+    def test_slow_fetch_does_not_release_the_lock_of_the_next_worker(
+        self, mock_requests
+    ) -> None:
+        cache.clear()
+        lock_tokens = []
+
+        def get_token(*args, **kwargs):
+            # The lock times out during the fetch and another worker takes it
+            cache.delete("mpesa_access_token_lock")
+            lock_tokens.append(Locks.acquire("mpesa_access_token_lock", timeout=60))
+            return self.mock_response
+
+        self.mock_response.json.return_value = {
+            "access_token": "fake_access_token",
+            "expires_in": "3599",
+        }
+        mock_requests.get.side_effect = get_token
+
+        self.assertEqual(get_mpesa_access_token(), "fake_access_token")
+
+        self.assertTrue(Locks.release("mpesa_access_token_lock", lock_tokens[0]))
+
+    @patch("accounts.utils.Daraja")
+    def test_renew_mpesa_access_tokens_replaces_cached_tokens(
+        self, mock_requests
+    ) -> None:
+        cache.set("mpesa_access_token", "old_access_token")
+        cache.set("mpesa_b2c_access_token", "old_access_token")
+        self.mock_response.json.return_value = {
+            "access_token": "new_access_token",
+            "expires_in": "3599",
+        }
+        mock_requests.get.return_value = self.mock_response
+
+        renew_mpesa_access_tokens()
+
+        self.assertEqual(cache.get("mpesa_access_token"), "new_access_token")
+        self.assertEqual(cache.get("mpesa_b2c_access_token"), "new_access_token")
+
+    @patch("accounts.utils.Daraja")
+    def test_renew_mpesa_access_tokens_skips_tokens_being_fetched(
+        self, mock_requests
+    ) -> None:
+        cache.clear()
+        cache.set("mpesa_b2c_access_token_lock", 1)
+        self.mock_response.json.return_value = {
+            "access_token": "new_access_token",
+            "expires_in": "3599",
+        }
+        mock_requests.get.return_value = self.mock_response
+
+        renew_mpesa_access_tokens()
+
+        self.assertEqual(mock_requests.get.call_count, 1)
+        self.assertIsNone(cache.get("mpesa_b2c_access_token"))
+        cache.delete("mpesa_b2c_access_token_lock")
+
     @patch("accounts.utils.get_mpesa_access_token")
     def test_initiate_mpesa_stkpush_payment_returns_successful_response(
         self, mock_get_mpesa_access_token
     ) -> None:
         mock_get_mpesa_access_token.return_value = "fake_access_token"
 
-        with patch("accounts.utils.requests") as mock_requests:
+        with patch("accounts.utils.Daraja") as mock_requests:
             self.mock_response.json.return_value = {
                 "MerchantRequestID": "29115-34620561-1",
                 "CheckoutRequestID": "ws_CO_191220191020363925",
@@ -106,7 +210,7 @@ class TestMpesaSTKPush(TestCase):
             self.assertEqual(response, self.mock_response.json())
 
     @patch("accounts.utils.get_mpesa_access_token")
-    @patch("accounts.utils.requests")
+    @patch("accounts.utils.Daraja")
     def test_initiate_mpesa_stkpush_payment_raises_exception(
         self, mock_get_mpesa_access_token, mock_requests
     ) -> None:
@@ -154,7 +258,7 @@ class TestMpesaB2CPayment(TestCase):
     ) -> None:
         mock_get_mpesa_access_token.return_value = "random_token"
 
-        with patch("accounts.utils.requests") as mock_requests:
+        with patch("accounts.utils.Daraja") as mock_requests:
             self.mock_response.json.return_value = self.sample_b2c_response
             mock_requests.post.return_value = self.mock_response
 
@@ -171,7 +275,7 @@ class TestMpesaB2CPayment(TestCase):
     ) -> None:
         mock_get_mpesa_access_token.return_value = "random_token"
 
-        with patch("accounts.utils.requests") as mock_requests:
+        with patch("accounts.utils.Daraja") as mock_requests:
             self.sample_b2c_response["ResponseCode"] = "1"
             self.mock_response.json.return_value = self.sample_b2c_response
             mock_requests.post.return_value = self.mock_response
@@ -184,6 +288,55 @@ class TestMpesaB2CPayment(TestCase):
             self.assertIsNone(response)
 
 
+class TestInitiatorSecurityCredential(TestCase):
+    def setUp(self) -> None:
+        # Work on a copy so that the real certificate's mtime is never touched
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self.cert_path = shutil.copy(get_mpesa_certificate_path(), temp_dir)
+
+        patcher = patch(
+            "accounts.utils.get_mpesa_certificate_path", return_value=self.cert_path
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        get_mpesa_public_key.cache_clear()
+        encrypt_initiator_password.cache_clear()
+
+    @patch("accounts.utils.get_mpesa_certificate", wraps=get_mpesa_certificate)
+    def test_credential_is_computed_once(self, mock_get_mpesa_certificate) -> None:
+        credential = get_initiator_security_credential()
+
+        self.assertEqual(get_initiator_security_credential(), credential)
+        self.assertEqual(mock_get_mpesa_certificate.call_count, 1)
+
+    @patch("accounts.utils.get_mpesa_certificate", wraps=get_mpesa_certificate)
+    def test_changed_certificate_is_parsed_again(
+        self, mock_get_mpesa_certificate
+    ) -> None:
+        credential = get_initiator_security_credential()
+
+        modified_at = os.stat(self.cert_path).st_mtime_ns + 1_000_000_000
+        os.utime(self.cert_path, ns=(modified_at, modified_at))
+
+        # PKCS1v15 padding is random, so every encryption differs
+        self.assertNotEqual(get_initiator_security_credential(), credential)
+        self.assertEqual(mock_get_mpesa_certificate.call_count, 2)
+
+    @patch("accounts.utils.get_mpesa_certificate", wraps=get_mpesa_certificate)
+    def test_changed_password_is_encrypted_again(
+        self, mock_get_mpesa_certificate
+    ) -> None:
+        credential = get_initiator_security_credential()
+
+        with override_settings(MPESA_B2C_PASSWORD="new-password"):
+            new_credential = get_initiator_security_credential()
+
+        self.assertNotEqual(new_credential, credential)
+        self.assertEqual(mock_get_mpesa_certificate.call_count, 1)
+
+
 class TestProcessB2CPaymentResult(BaseUserAPITestCase):
     def setUp(self) -> None:
         self.user = self.create_user()
@@ -213,7 +366,7 @@ class TestProcessB2CPaymentResult(BaseUserAPITestCase):
             self.sample_b2c_response_success["ResultType"],
         )
         self.assertEqual(
-            json.loads(self.withdrawal.external_response),
+            self.withdrawal.external_response,
             self.sample_b2c_response_success,
         )
 
@@ -236,7 +389,7 @@ class TestProcessB2CPaymentResult(BaseUserAPITestCase):
             self.sample_b2c_response_failure["TransactionID"],
         )
         self.assertEqual(
-            json.loads(self.withdrawal.external_response),
+            self.withdrawal.external_response,
             self.sample_b2c_response_failure,
         )
         self.assertEqual(0, Transaction.objects.count())
@@ -293,9 +446,7 @@ class TestProcessMpesaStk(BaseUserAPITestCase):
         self.assertEqual(self.mpesa_payment.receipt_number, mpesa_reference_no)
         # Ignore this test case for now. But idealy the phone numbers should be same
         # self.assertEqual(mpesa_payment.phone_number, str(self.user.phone_number))
-        self.assertEqual(
-            json.loads(self.mpesa_payment.external_response), self.successful_result
-        )
+        self.assertEqual(self.mpesa_payment.external_response, self.successful_result)
 
     def test_signal_creates_deposit_transaction_instance(self) -> None:
         process_mpesa_stk(mpesa_response_in=self.successful_result)
@@ -308,6 +459,11 @@ class TestProcessMpesaStk(BaseUserAPITestCase):
         self.assertEqual(transaction_obj.status, TransactionStatuses.SUCCESSFUL.value)
         self.assertEqual(transaction_obj.service, TransactionServices.MPESA.value)
         self.assertEqual(transaction_obj.amount, self.mpesa_payment.amount)
+        # Both rows share the payload instead of storing it twice
+        self.assertEqual(
+            transaction_obj.external_response_record_id,
+            self.mpesa_payment.external_response_record_id,
+        )
 
     def test_process_failed_mpesa_stk_response(self) -> None:
         process_mpesa_stk(mpesa_response_in=self.failed_result)
@@ -326,9 +482,7 @@ class TestProcessMpesaStk(BaseUserAPITestCase):
         self.assertIsNone(
             mpesa_payment.transaction_date
         )  # Transaction date should not be updated
-        self.assertEqual(
-            json.loads(mpesa_payment.external_response), self.failed_result
-        )
+        self.assertEqual(mpesa_payment.external_response, self.failed_result)
         self.assertEqual(0, Transaction.objects.count())
 
 
@@ -1,22 +1,26 @@
-import json
 import os
+import time
 from base64 import b64encode
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Optional
 
 import requests
 from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 from cryptography.x509 import Certificate, load_pem_x509_certificate
 from django.conf import settings
 from django.core.cache import cache
 
 from accounts.constants import B2CMpesaCommandIDs, MpesaAccountTypes
+from accounts.daraja import Daraja
 from accounts.models import MpesaPayment, Withdrawal
 from accounts.serializers.mpesa import (
     MpesaPaymentCreateSerializer,
     WithdrawalCreateSerializer,
 )
 from commons.constants import User
+from commons.locks import Locks
 from commons.raw_logger import logger
 from commons.serializers import UserPhoneNumberField
 from commons.utils import md5_hash
@@ -46,37 +50,92 @@ def get_mpesa_access_token(
     Requires the application secret and consumer key.
     We store the key in the server cache(Redis) for a period of 200
     seconds less than the one provided by Mpesa just to be safe.
+    When the token has expired, only one worker fetches it while the others
+    wait for it. The tokens are renewed in the background before they expire.
     """
     logger.info("Retrieving M-Pesa token...")
+    cache_key = "mpesa_b2c_access_token" if IS_B2C else "mpesa_access_token"
 
-    access_token = (
-        cache.get("mpesa_b2c_access_token")
-        if IS_B2C
-        else cache.get("mpesa_access_token")
+    access_token = cache.get(cache_key)
+    if access_token:
+        return access_token
+
+    logger.info("Mpesa access token does not exist. Fetching from API...")
+    access_token = fetch_mpesa_access_token_once(
+        MPESA_CONSUMER_KEY, MPESA_SECRET, cache_key
     )
+    if access_token:
+        return access_token
+
+    # Another worker is fetching the token
+    deadline = time.monotonic() + settings.MPESA_TOKEN_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        access_token = cache.get(cache_key)
+        if access_token:
+            return access_token
+
+    logger.warning("Timed out waiting for the M-Pesa access token. Fetching it...")
+    return fetch_mpesa_access_token(MPESA_CONSUMER_KEY, MPESA_SECRET, cache_key)
+
+
+def fetch_mpesa_access_token_once(
+    consumer_key: str, secret: str, cache_key: str
+) -> Optional[str]:
+    """Fetch the token unless another worker is already fetching it"""
+    lock_key = f"{cache_key}_lock"
+    lock_token = Locks.acquire(lock_key, timeout=settings.MPESA_TOKEN_LOCK_TIMEOUT)
+    if not lock_token:
+        return None
 
-    if not access_token:
-        logger.info("Mpesa access token does not exist. Fetching from API...")
-        url = settings.MPESA_TOKEN_URL
-        auth = requests.auth.HTTPBasicAuth(MPESA_CONSUMER_KEY, MPESA_SECRET)
+    try:
+        return fetch_mpesa_access_token(consumer_key, secret, cache_key)
+    finally:
+        Locks.release(lock_key, lock_token)
 
-        req = requests.get(url, auth=auth, verify=True)
-        res = req.json()
 
-        access_token = res["access_token"]
-        # The timeout set by mpesa is `3599` so we subtract 200 to be safe
-        timeout = int(res["expires_in"]) - 200
+def fetch_mpesa_access_token(consumer_key: str, secret: str, cache_key: str) -> str:
+    """Fetch a new token from the API and store it in the cache"""
+    url = settings.MPESA_TOKEN_URL
+    auth = requests.auth.HTTPBasicAuth(consumer_key, secret)
 
-        # Store the token in the cache for future requests
-        (
-            cache.set("mpesa_b2c_access_token", access_token, timeout=timeout)
-            if IS_B2C
-            else cache.set("mpesa_access_token", access_token, timeout=timeout)
-        )
+    req = Daraja.get(url, auth=auth, endpoint="token")
+    res = req.json()
+
+    access_token = res["access_token"]
+    # The timeout set by mpesa is `3599` so we subtract 200 to be safe
+    timeout = int(res["expires_in"]) - 200
+
+    # Store the token in the cache for future requests
+    cache.set(cache_key, access_token, timeout=timeout)
 
     return access_token
 
 
+def renew_mpesa_access_tokens() -> None:
+    """Replace the cached tokens before they expire"""
+    for consumer_key, secret, cache_key in [
+        (settings.MPESA_CONSUMER_KEY, settings.MPESA_SECRET, "mpesa_access_token"),
+        (
+            settings.MPESA_B2C_CONSUMER_KEY,
+            settings.MPESA_B2C_SECRET,
+            "mpesa_b2c_access_token",
+        ),
+    ]:
+        if fetch_mpesa_access_token_once(consumer_key, secret, cache_key):
+            logger.info(f"Renewed {cache_key}")
+        else:
+            logger.info(f"Skipped renewing {cache_key}. It is being fetched.")
+
+
+def get_mpesa_stkpush_password(
+    business_short_code: str, passkey: str, timestamp: str
+) -> str:
+    return b64encode(
+        bytes(f"{business_short_code}{passkey}{timestamp}", "utf-8")
+    ).decode("utf-8")
+
+
 def initiate_mpesa_stkpush_payment(
     phone_number: str,
     amount: int,
@@ -95,9 +154,7 @@ def initiate_mpesa_stkpush_payment(
     phone_number = str(phone_number).replace("+", "")
     timestamp = datetime.now().strftime(settings.MPESA_DATETIME_FORMAT)
 
-    password = b64encode(
-        bytes(f"{business_short_code}{passkey}{timestamp}", "utf-8")
-    ).decode("utf-8")
+    password = get_mpesa_stkpush_password(business_short_code, passkey, timestamp)
 
     api_url = settings.MPESA_STKPUSH_URL
     headers = {
@@ -120,7 +177,7 @@ def initiate_mpesa_stkpush_payment(
             "TransactionDesc": description,
         }
         logger.info(f"Sending M-Pesa STKPush for Ksh {amount} to {phone_number}")
-        response = requests.post(api_url, json=data, headers=headers, verify=True)
+        response = Daraja.post(api_url, json=data, headers=headers, endpoint="stkpush")
         response_data = response.json()
         logger.info(f"Received M-Pesa STKPush response: {response_data}")
 
@@ -171,6 +228,8 @@ def trigger_mpesa_stkpush_payment(amount: int, phone_number: str) -> Optional[Di
                     "response_code": data["ResponseCode"],
                     "response_description": data["ResponseDescription"],
                     "customer_message": data["CustomerMessage"],
+                    # Replaced by the amount paid once the result is received
+                    "amount": amount,
                 }
             )
             mpesa_payment_serializer.is_valid()
@@ -183,6 +242,38 @@ def trigger_mpesa_stkpush_payment(amount: int, phone_number: str) -> Optional[Di
         raise e
 
 
+def query_mpesa_stkpush_status(checkout_request_id: str) -> Optional[Dict]:
+    """Query the result of an STKPush whose callback has not been received.
+    Returns None while M-Pesa is still processing the request."""
+    access_token = get_mpesa_access_token()
+    business_short_code = settings.MPESA_BUSINESS_SHORT_CODE
+    timestamp = datetime.now().strftime(settings.MPESA_DATETIME_FORMAT)
+    password = get_mpesa_stkpush_password(
+        business_short_code, settings.MPESA_PASS_KEY, timestamp
+    )
+
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {access_token}",
+    }
+    data = {
+        "BusinessShortCode": business_short_code,
+        "Password": password,
+        "Timestamp": timestamp,
+        "CheckoutRequestID": checkout_request_id,
+    }
+    response = Daraja.post(
+        settings.MPESA_STK_QUERY_URL, json=data, headers=headers, endpoint="stkquery"
+    )
+    response_data = response.json()
+    logger.info(f"Received M-Pesa STKPush query response: {response_data}")
+
+    if "ResultCode" in response_data:
+        return response_data
+
+    return None
+
+
 def process_mpesa_stk(
     mpesa_response_in: dict,
 ) -> None:
@@ -195,65 +286,88 @@ def process_mpesa_stk(
     ).first()
 
     if mpesa_payment:
-        logger.info(
-            f"Received response for previous STKPush {mpesa_payment.checkout_request_id}"
-        )
+        apply_mpesa_stk_result(mpesa_payment, mpesa_response_in)
+        mpesa_payment.save()
+        logger.info(f"Saved STKPUsh for {mpesa_payment.phone_number}")
 
-        mpesa_payment.result_code = mpesa_response_in["ResultCode"]
-        mpesa_payment.result_description = mpesa_response_in["ResultDesc"]
-        mpesa_payment.external_response = json.dumps(mpesa_response_in)
 
-        if "CallbackMetadata" in mpesa_response_in:
-            logger.info(
-                f"Processing successful STKPush {mpesa_payment.checkout_request_id}"
-            )
-            metadata_items = mpesa_response_in["CallbackMetadata"]["Item"]
-
-            for item in metadata_items:
-                if item["Name"] == "Amount":
-                    mpesa_payment.amount = item["Value"]
-                if item["Name"] == "MpesaReceiptNumber":
-                    mpesa_payment.receipt_number = item["Value"]
-                if item["Name"] == "TransactionDate":
-                    mpesa_payment.transaction_date = datetime.strptime(
-                        str(item["Value"]), settings.MPESA_DATETIME_FORMAT
-                    )
-                if item["Name"] == "PhoneNumber":
-                    phone_number = phone_field.to_internal_value(str(item["Value"]))
-                    mpesa_payment.phone_number = str(phone_number)
+def apply_mpesa_stk_result(
+    mpesa_payment: MpesaPayment, mpesa_response_in: dict
+) -> None:
+    """Set the STKPush callback on its payment, without saving it"""
+    logger.info(
+        f"Received response for previous STKPush {mpesa_payment.checkout_request_id}"
+    )
 
-        mpesa_payment.save()
-        logger.info(f"Saved STKPUsh for {mpesa_payment.phone_number}")
+    mpesa_payment.result_code = mpesa_response_in["ResultCode"]
+    mpesa_payment.result_description = mpesa_response_in["ResultDesc"]
+    mpesa_payment.external_response = mpesa_response_in
+
+    if "CallbackMetadata" in mpesa_response_in:
+        logger.info(
+            f"Processing successful STKPush {mpesa_payment.checkout_request_id}"
+        )
+        metadata_items = mpesa_response_in["CallbackMetadata"]["Item"]
+
+        for item in metadata_items:
+            if item["Name"] == "Amount":
+                mpesa_payment.amount = item["Value"]
+            if item["Name"] == "MpesaReceiptNumber":
+                mpesa_payment.receipt_number = item["Value"]
+            if item["Name"] == "TransactionDate":
+                mpesa_payment.transaction_date = datetime.strptime(
+                    str(item["Value"]), settings.MPESA_DATETIME_FORMAT
+                )
+            if item["Name"] == "PhoneNumber":
+                phone_number = phone_field.to_internal_value(str(item["Value"]))
+                mpesa_payment.phone_number = str(phone_number)
+
+
+def get_mpesa_certificate_path() -> str:
+    file_name = "ProductionCertificate.cer"
+    current_path = os.path.dirname(__file__)
+    return os.path.join(current_path, file_name)
 
 
 def get_mpesa_certificate() -> str:
     """Load the M-Pesa certification file that will be used for encryption"""
     logger.info("Retrieving M-Pesa certificate...")
 
-    file_name = "ProductionCertificate.cer"
-    current_path = os.path.dirname(__file__)
-    cert_file_path = os.path.join(current_path, file_name)
-
-    cert_file = open(cert_file_path, "r")
+    cert_file = open(get_mpesa_certificate_path(), "r")
     cert_str = cert_file.read()
     cert_file.close()
 
     return cert_str
 
 
-def get_initiator_security_credential() -> str:
-    """Get cert and extract public key"""
-    cert_str = get_mpesa_certificate()
-    cert_obj: Certificate = load_pem_x509_certificate(str.encode(cert_str))
-    public_key = cert_obj.public_key()
+@lru_cache(maxsize=1)
+def get_mpesa_public_key(cert_modified_at: int) -> RSAPublicKey:
+    """Parse the certificate once for every version of the file"""
+    cert_obj: Certificate = load_pem_x509_certificate(
+        str.encode(get_mpesa_certificate())
+    )
+    return cert_obj.public_key()  # type: ignore
+
+
+@lru_cache(maxsize=1)
+def encrypt_initiator_password(cert_modified_at: int, password: str) -> str:
+    public_key = get_mpesa_public_key(cert_modified_at)
 
     # Encrypt key with public key and PKCS1v15 padding as recommended by safaricom
-    byte_password = bytes(settings.MPESA_B2C_PASSWORD, "utf-8")
+    byte_password = bytes(password, "utf-8")
     ciphertext = public_key.encrypt(byte_password, padding=padding.PKCS1v15())
 
     return b64encode(ciphertext).decode("utf-8")
 
 
+def get_initiator_security_credential() -> str:
+    """Get the initiator password encrypted with the certificate's public key.
+    It is computed once per process and again when the certificate file or the
+    password changes."""
+    cert_modified_at = os.stat(get_mpesa_certificate_path()).st_mtime_ns
+    return encrypt_initiator_password(cert_modified_at, settings.MPESA_B2C_PASSWORD)
+
+
 def initiate_b2c_payment(
     *,
     amount: int,
@@ -288,7 +402,7 @@ def initiate_b2c_payment(
             "ResultURL": settings.MPESA_B2C_RESULT_URL,
             "Occassion": occassion,
         }
-        response = requests.post(api_url, json=payload, headers=headers, verify=True)
+        response = Daraja.post(api_url, json=payload, headers=headers, endpoint="b2c")
         response_data = response.json()
 
         logger.info(f"Received B2C payment response: {response_data}")
@@ -363,11 +477,7 @@ def process_b2c_payment_result(mpesa_b2c_result: dict):
                 f"Previous withdrawal request id: {mpesa_b2c_result['ConversationID']} found."
             )
 
-            withdrawal_request.result_type = mpesa_b2c_result["ResultType"]
-            withdrawal_request.result_code = mpesa_b2c_result["ResultCode"]
-            withdrawal_request.result_description = mpesa_b2c_result["ResultDesc"]
-            withdrawal_request.transaction_id = mpesa_b2c_result["TransactionID"]
-            withdrawal_request.external_response = json.dumps(mpesa_b2c_result)
+            apply_b2c_payment_result(withdrawal_request, mpesa_b2c_result)
             withdrawal_request.save()
 
     except Exception as e:
@@ -376,3 +486,12 @@ def process_b2c_payment_result(mpesa_b2c_result: dict):
         )
         logger.warning(f"An error occurred while processing B2C result: {e}")
         raise e
+
+
+def apply_b2c_payment_result(withdrawal: Withdrawal, mpesa_b2c_result: dict) -> None:
+    """Set the B2C result on its withdrawal, without saving it"""
+    withdrawal.result_type = mpesa_b2c_result["ResultType"]
+    withdrawal.result_code = mpesa_b2c_result["ResultCode"]
+    withdrawal.result_description = mpesa_b2c_result["ResultDesc"]
+    withdrawal.transaction_id = mpesa_b2c_result["TransactionID"]
+    withdrawal.external_response = mpesa_b2c_result
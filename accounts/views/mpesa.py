@@ -3,6 +3,9 @@ from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 
+from accounts.constants import MpesaCallbackKinds
+from accounts.models import MpesaCallback
+from accounts.payouts import PayoutDispatcher
 from accounts.permissions import IsMpesaWhiteListedIP
 from accounts.serializers.mpesa import (
     B2CResponseSerializer,
@@ -11,9 +14,8 @@ from accounts.serializers.mpesa import (
     WithdrawAmountSerializer,
 )
 from accounts.tasks import (
-    process_b2c_payment_result_task,
-    process_b2c_payment_task,
-    process_mpesa_stk_task,
+    dispatch_payouts_task,
+    process_mpesa_callbacks_task,
     trigger_mpesa_stkpush_payment_task,
 )
 from commons.raw_logger import logger
@@ -46,8 +48,14 @@ class WithdrawalResultView(GenericAPIView):
         serializer = self.serializer_class(data=request.data)
 
         if serializer.is_valid():
-            # Schedule background task to process the B2C payment result
-            process_b2c_payment_result_task.delay(serializer.validated_data["Result"])
+            result = serializer.validated_data["Result"]
+            # M-Pesa retries callbacks, only process the first one received
+            if MpesaCallback.objects.receive(
+                kind=MpesaCallbackKinds.B2C.value,
+                request_id=result["ConversationID"],
+                payload=result,
+            ):
+                process_mpesa_callbacks_task.delay()
 
             return Response(status=status.HTTP_200_OK)
 
@@ -68,10 +76,14 @@ class STKPushCallbackView(GenericAPIView):
 
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            # Schedule background task
-            process_mpesa_stk_task.delay(
-                serializer.validated_data["Body"]["stkCallback"]
-            )
+            stk_callback = serializer.validated_data["Body"]["stkCallback"]
+            # M-Pesa retries callbacks, only process the first one received
+            if MpesaCallback.objects.receive(
+                kind=MpesaCallbackKinds.STKPUSH.value,
+                request_id=stk_callback["CheckoutRequestID"],
+                payload=stk_callback,
+            ):
+                process_mpesa_callbacks_task.delay()
 
             return Response(status=status.HTTP_200_OK)
 
@@ -111,9 +123,10 @@ class WithdrawalRequestView(GenericAPIView):
         """User makes a post to this endpoint to make a cash withdrawal."""
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            process_b2c_payment_task.delay(
-                user_id=request.user.id, amount=serializer.validated_data["amount"]
+            PayoutDispatcher.enqueue(
+                user=request.user, amount=serializer.validated_data["amount"]
             )
+            dispatch_payouts_task.delay()
             return Response(status=status.HTTP_200_OK)
 
         logger.info(f"WithdrawalRequestView failed with errors: {serializer.errors}")
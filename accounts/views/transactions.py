@@ -1,7 +1,9 @@
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status
 from rest_framework.generics import (
     CreateAPIView,
+    GenericAPIView,
     ListAPIView,
     RetrieveAPIView,
     RetrieveUpdateAPIView,
@@ -9,13 +11,17 @@ from rest_framework.generics import (
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
+from accounts.exports import EXPORT_CONTENT_TYPES, encode_stream, export_transactions
+from accounts.filters import TransactionFilter
 from accounts.models import Transaction
 from accounts.serializers.transactions import (
     TransactionCreateSerializer,
+    TransactionExportSerializer,
     TransactionListSerializer,
     TransactionRetrieveSerializer,
     TransactionRetrieveUpdateSerializer,
 )
+from commons.filters import FullTextSearchFilter
 from commons.pagination import StandardPageNumberPagination
 from commons.permissions import IsStaffOrSelfPermission
 from users.models import User
@@ -38,10 +44,9 @@ class TransactionListView(ListAPIView):
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
     ]
-    search_fields = ["external_transaction_id", "description"]
-    filterset_fields = ["cash_flow", "type", "status"]
+    filterset_class = TransactionFilter
     ordering_fields = ["created_at", "updated_at"]
 
     def get_queryset(self):
@@ -51,12 +56,44 @@ class TransactionListView(ListAPIView):
         return Transaction.objects.filter(user=user)  # type: ignore
 
 
+class TransactionExportView(GenericAPIView):
+    """Stream transactions matching the filters as a CSV or JSON lines file."""
+
+    queryset = Transaction.objects.all()
+    serializer_class = TransactionExportSerializer
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TransactionFilter
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        export_format = serializer.validated_data["export_format"]
+        compress = serializer.validated_data["gzip"]
+
+        transactions = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            encode_stream(
+                export_transactions(transactions, export_format=export_format),
+                compress=compress,
+            ),
+            content_type=(
+                "application/gzip" if compress else EXPORT_CONTENT_TYPES[export_format]
+            ),
+        )
+
+        filename = f"transactions.{export_format}{'.gz' if compress else ''}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class TransactionRetrieveUpdateView(RetrieveUpdateAPIView):
     """Retrieve or update a transaction."""
 
     lookup_field = "id"
     serializer_class = TransactionRetrieveUpdateSerializer
-    queryset = Transaction.objects.all()
+    # Only the detail view loads the provider payload
+    queryset = Transaction.objects.select_related("external_response_record")
     permission_classes = [IsAdminUser]
 
 
@@ -70,6 +107,6 @@ class TransactionRetrieveUserBalanceView(RetrieveAPIView):
 
     def retrieve(self, request, *args, **kwargs):
         user = self.get_object()
-        user_balance = Transaction.objects.get_user_balance(user)
+        user_balance = Transaction.objects.get_cached_user_balance(user)
 
         return Response({"balance": user_balance}, status=status.HTTP_200_OK)
@@ -0,0 +1,96 @@
+from datetime import datetime
+from time import sleep
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from accounts.models import Transaction
+from commons.models import ArchivedRecord, uuid7
+from commons.raw_logger import logger
+from quiz.models import Result, UserAnswer
+
+
+class ArchiveColdRows:
+    """
+    Move rows that the hot paths no longer read out of their tables.
+    Rows are moved in small batches, each in its own transaction, skipping rows
+    locked by live requests so that the tables stay online while archiving.
+    """
+
+    def get_cold_rows(self, cutoff: datetime) -> dict:
+        """Rows older than the cutoff that can be archived, by model"""
+        return {
+            # Only transactions verified by the ledger reconciliation are archived.
+            # The latest transaction of every user is kept to read balances from.
+            Transaction: Transaction.objects.filter(created_at__lt=cutoff)
+            .filter(
+                created_at__lt=F("user__balance_checkpoint__transaction_created_at")
+            )
+            .order_by("created_at"),
+            # Active results are still waiting to be paired
+            Result: Result.objects.filter(
+                created_at__lt=cutoff, is_active=False
+            ).order_by(),
+            UserAnswer: UserAnswer.objects.filter(created_at__lt=cutoff).order_by(),
+        }
+
+    def archive(
+        self, *, cutoff: datetime, batch_size: int = 1000, pause: float = 0.0
+    ) -> dict:
+        """Archive all the cold rows and return the number moved by model.
+        Pause for `pause` seconds between batches to ease the load on the database."""
+        logger.info(f"Archiving rows created before {cutoff}...")
+        archived = {}
+        for model, queryset in self.get_cold_rows(cutoff).items():
+            archived[model._meta.label] = 0
+            while moved := self.archive_batch(queryset, batch_size=batch_size):
+                archived[model._meta.label] += moved
+                sleep(pause)
+
+            logger.info(f"Archived {archived[model._meta.label]} {model._meta.label}.")
+
+        return archived
+
+    def archive_batch(self, queryset, *, batch_size: int) -> int:
+        """Move a batch of rows to the archive in a single statement"""
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        archive_table = connection.ops.quote_name(ArchivedRecord._meta.db_table)
+        now = datetime.now()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cold_rows_sql, params = (
+                queryset.select_for_update(skip_locked=True, of=("self",))
+                .values("id")[:batch_size]
+                .query.sql_with_params()
+            )
+            cursor.execute(
+                f"""
+                WITH cold_rows AS ({cold_rows_sql}),
+                moved_rows AS (
+                    DELETE FROM {table} WHERE id IN (SELECT id FROM cold_rows)
+                    RETURNING *
+                )
+                INSERT INTO {archive_table} (
+                    id, created_at, updated_at, source_table, record_id,
+                    record_created_at, user_id, data
+                )
+                SELECT (%s::uuid[])[
+                        row_number() OVER (ORDER BY moved_rows.created_at)
+                    ],
+                    %s, %s, %s, moved_rows.id, moved_rows.created_at,
+                    moved_rows.user_id, to_jsonb(moved_rows)
+                FROM moved_rows
+                """,
+                (
+                    *params,
+                    # Time-ordered ids, given to the rows in creation order
+                    [uuid7() for _ in range(batch_size)],
+                    now,
+                    now,
+                    queryset.model._meta.db_table,
+                ),
+            )
+            return cursor.rowcount
+
+
+ColdRowsArchiver = ArchiveColdRows()
@@ -27,3 +27,16 @@ class DuoSessionStatuses(str, Enum):
     PAIRED = "PAIRED"
     REFUNDED = "REFUNDED"
     PARTIALLY_REFUNDED = "PARTIALLY_REFUNDED"
+
+
+# Maximum number of related instances, e.g users, a search is narrowed down to
+SEARCH_MAX_RELATED_RESULTS: int = 1000
+
+
+# Celery queues, each consumed by workers sized for its tasks
+class TaskLanes(str, Enum):
+    OTP = "otp"
+    PAYMENTS = "payments"
+    PAIRING = "pairing"
+    NOTIFICATIONS = "notifications"
+    DEFAULT = "default"
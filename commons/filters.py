@@ -0,0 +1,92 @@
+import re
+import uuid
+
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Q
+from phonenumbers import NumberParseException
+from phonenumbers import parse as parse_phone_number
+from rest_framework import filters
+
+from commons.constants import SEARCH_MAX_RELATED_RESULTS
+from users.constants import DEFAULT_COUNTRY_CODE
+
+
+def get_prefix_search_query(search_terms: list[str]) -> SearchQuery | None:
+    """
+    Build a full text query that matches every term as a prefix of the indexed words.
+    Phone numbers are indexed with their leading +, and numbers in national format,
+    e.g 0712..., also match the stored +254712...
+    """
+    terms = []
+    for search_term in search_terms:
+        words = re.findall(r"\w+", search_term)
+        if not words:
+            continue
+
+        term = " & ".join(
+            f"({word}:* | +{word}:*)" if word.isdigit() else f"{word}:*"
+            for word in words
+        )
+        if re.fullmatch(r"\+?\d{3,}", search_term):
+            try:
+                phone_number = parse_phone_number(search_term, DEFAULT_COUNTRY_CODE)
+                term = (
+                    f"{term} | "
+                    f"+{phone_number.country_code}{phone_number.national_number}:*"
+                )
+            except NumberParseException:
+                pass
+
+        terms.append(f"({term})")
+
+    if not terms:
+        return None
+
+    return SearchQuery(" & ".join(terms), search_type="raw", config="simple")
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Search with the `?search=` parameter using the model's `search_vector`.
+    Search vectors are backed by GIN indexes, unlike the `icontains` lookups of the
+    default search filter that scan the whole table.
+
+    Views may set `search_related_fields` to search a related model instead,
+    e.g the players of a duo session. Instances whose id is a search term also match.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        search_query = get_prefix_search_query(search_terms)
+        conditions = Q(pk__in=self.get_uuids(search_terms))
+        related_fields = getattr(view, "search_related_fields", None)
+
+        if related_fields and search_query:
+            related_model = queryset.model._meta.get_field(
+                related_fields[0]
+            ).related_model
+            related_ids = list(
+                related_model.objects.annotate(search=related_model.search_vector)
+                .filter(search=search_query)
+                .values_list("pk", flat=True)[:SEARCH_MAX_RELATED_RESULTS]
+            )
+            for field in related_fields:
+                conditions |= Q(**{f"{field}__in": related_ids})
+
+        elif search_query:
+            queryset = queryset.annotate(search=queryset.model.search_vector)
+            conditions |= Q(search=search_query)
+
+        return queryset.filter(conditions)
+
+    def get_uuids(self, search_terms: list[str]) -> list[uuid.UUID]:
+        uuids = []
+        for search_term in search_terms:
+            try:
+                uuids.append(uuid.UUID(search_term))
+            except ValueError:
+                pass
+        return uuids
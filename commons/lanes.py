@@ -0,0 +1,94 @@
+import time
+from datetime import datetime
+
+from celery.signals import before_task_publish, task_prerun
+from redis.exceptions import RedisError
+
+from commons.constants import TaskLanes
+from commons.metrics import Metrics
+from commons.raw_logger import logger
+from majibu.celery import app
+from notifications.constants import NotificationChannels
+
+# Queue of every task, tasks not listed here go to the default queue
+TASK_LANES = {
+    "commons.tasks.send_sms": TaskLanes.OTP,
+    "commons.tasks.send_push": TaskLanes.NOTIFICATIONS,
+    "accounts.tasks.process_b2c_payment_result_task": TaskLanes.PAYMENTS,
+    "accounts.tasks.process_mpesa_stk_task": TaskLanes.PAYMENTS,
+    "accounts.tasks.trigger_mpesa_stkpush_payment_task": TaskLanes.PAYMENTS,
+    "accounts.tasks.process_b2c_payment_task": TaskLanes.PAYMENTS,
+    "process_mpesa_callbacks": TaskLanes.PAYMENTS,
+    "dispatch_payouts": TaskLanes.PAYMENTS,
+    "query_stale_stkpush_payments": TaskLanes.PAYMENTS,
+    "renew_mpesa_access_tokens": TaskLanes.PAYMENTS,
+    "pairing_service": TaskLanes.PAIRING,
+}
+
+
+def route_task(name: str, args, kwargs, options, task=None, **kw) -> dict:
+    """Celery router sending every task to the queue of its lane.
+    SMS of the outbox are all OTPs, so they never wait behind bulk pushes."""
+    if name == "dispatch_notifications":
+        lane = (
+            TaskLanes.OTP
+            if (kwargs or {}).get("channel") == NotificationChannels.SMS
+            else TaskLanes.NOTIFICATIONS
+        )
+    else:
+        lane = TASK_LANES.get(name, TaskLanes.DEFAULT)
+
+    return {"queue": lane.value}
+
+
+@before_task_publish.connect
+def stamp_published_at(headers: dict | None = None, **kwargs) -> None:
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+@task_prerun.connect
+def observe_queue_wait(task=None, **kwargs) -> None:
+    """Record the seconds the task waited in its queue for a worker.
+    Tasks with a countdown are only due from their eta."""
+    published_at = getattr(task.request, "published_at", None)
+    if published_at is None:
+        return
+
+    due_at = float(published_at)
+    if task.request.eta:
+        due_at = max(due_at, datetime.fromisoformat(task.request.eta).timestamp())
+
+    delivery_info = task.request.delivery_info or {}
+    Metrics.observe(
+        "celery_queue_seconds",
+        max(time.time() - due_at, 0.0),
+        lane=delivery_info.get("routing_key") or TaskLanes.DEFAULT.value,
+    )
+
+
+class MonitorLanes:
+    """
+    Record the number of tasks waiting in the queue of every lane.
+    Queues are Redis lists of the broker, named after their lane.
+    """
+
+    def depths(self) -> dict[str, int]:
+        with app.connection_for_read() as connection:
+            client = connection.default_channel.client
+            return {lane.value: client.llen(lane.value) for lane in TaskLanes}
+
+    def record(self) -> dict[str, int]:
+        try:
+            depths = self.depths()
+        except RedisError as e:
+            logger.warning(f"Failed to read the depth of the task queues: {e}")
+            return {}
+
+        for lane, depth in depths.items():
+            Metrics.set("celery_queue_depth", depth, lane=lane)
+
+        return depths
+
+
+LaneMonitor = MonitorLanes()
@@ -0,0 +1,41 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+
+# Delete the lock only if it is still held with the token of its holder
+RELEASE_IF_HELD_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLocks:
+    """
+    Locks shared by the workers, held in Redis until released or timed out.
+    Every lock stores a token unique to its holder. A holder that outlives the
+    timeout can not release the lock taken by the next one after it.
+    """
+
+    def key(self, name: str) -> str:
+        return cache.make_and_validate_key(name)
+
+    def get_client(self, key: str):
+        return cache._cache.get_client(key, write=True)  # type: ignore
+
+    def acquire(self, name: str, *, timeout: int) -> str | None:
+        """Take the lock and return its token, None if it is already held"""
+        key, token = self.key(name), uuid4().hex
+        if self.get_client(key).set(key, token, nx=True, ex=timeout):
+            return token
+
+        return None
+
+    def release(self, name: str, token: str) -> bool:
+        """Release the lock unless it timed out and was taken by another holder"""
+        key = self.key(name)
+        return bool(self.get_client(key).eval(RELEASE_IF_HELD_SCRIPT, 1, key, token))
+
+
+Locks = RedisLocks()
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from commons.archive import ColdRowsArchiver
+
+
+class Command(BaseCommand):
+    help = (
+        "Move old transactions, results and user answers to the archive. "
+        "Safe to run while the app is live."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive rows created more than this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows moved per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.1,
+            help="Seconds to wait between batches.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        archived = ColdRowsArchiver.archive(
+            cutoff=datetime.now() - timedelta(days=options["days"]),
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+        )
+        for label, count in archived.items():
+            self.stdout.write(self.style.SUCCESS(f"Archived {count} {label}."))
@@ -0,0 +1,68 @@
+import uuid
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from commons.models import uuid7
+
+BENCHMARK_TABLE = "benchmark_uuid_keys"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare insert throughput and primary key index size of random (v4) "
+        "and time-ordered (v7) UUID primary keys in a temporary table."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1_000_000,
+            help="Number of rows inserted for each kind of id.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Number of rows inserted per query.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        for name, generate_id in [("uuid4", uuid.uuid4), ("uuid7", uuid7)]:
+            seconds, index_size = self.benchmark(
+                generate_id, rows=options["rows"], batch_size=options["batch_size"]
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name}: inserted {options['rows']} rows in {seconds:.2f}s "
+                    f"({options['rows'] / seconds:.0f} rows/s), "
+                    f"primary key index is {index_size / 1024 / 1024:.1f} MB."
+                )
+            )
+
+    def benchmark(self, generate_id, *, rows: int, batch_size: int) -> tuple:
+        """Insert rows keyed by the generated ids.
+        Returns the seconds spent inserting and the index size in bytes."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {BENCHMARK_TABLE} "
+                "(id uuid PRIMARY KEY, created_at timestamp NOT NULL DEFAULT now())"
+            )
+
+            seconds = 0.0
+            for offset in range(0, rows, batch_size):
+                ids = [generate_id() for _ in range(min(batch_size, rows - offset))]
+                started_at = perf_counter()
+                cursor.execute(
+                    f"INSERT INTO {BENCHMARK_TABLE} (id) SELECT unnest(%s::uuid[])",
+                    [ids],
+                )
+                seconds += perf_counter() - started_at
+
+            cursor.execute("SELECT pg_relation_size(%s)", [f"{BENCHMARK_TABLE}_pkey"])
+            index_size = cursor.fetchone()[0]
+            cursor.execute(f"DROP TABLE {BENCHMARK_TABLE}")
+
+        return seconds, index_size
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from commons.metrics import Metrics
+
+
+class Command(BaseCommand):
+    help = "Print the counters, gauges and latency histograms recorded by all workers."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "prefix",
+            nargs="?",
+            default="",
+            help="Only print the metrics whose name starts with the prefix.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        for series, values in Metrics.series(options["prefix"]).items():
+            if "value" in values:
+                self.stdout.write(f"{series} value={values['value']:g}")
+                continue
+
+            summary = f"{series} count={values.get('count', 0):.0f}"
+            if "sum" in values and values.get("count"):
+                summary += f" mean={values['sum'] / values['count']:.3f}s"
+
+            buckets = " ".join(
+                f"{field}={value:.0f}"
+                for field, value in values.items()
+                if field.startswith("le_")
+            )
+            self.stdout.write(f"{summary} {buckets}".strip())
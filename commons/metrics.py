@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from commons.raw_logger import logger
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RecordMetrics:
+    """
+    Counters, gauges and latency histograms shared by all the workers through Redis.
+    Every series is a Redis hash named after the metric and its labels.
+    Metrics are best effort, failing to record them never fails the caller.
+    """
+
+    def key(self, name: str, labels: dict) -> str:
+        label_values = ",".join(f"{label}={labels[label]}" for label in sorted(labels))
+        return cache.make_and_validate_key(f"metrics:{name}:{label_values}")
+
+    def get_client(self, key: str, *, write: bool = False):
+        return cache._cache.get_client(key, write=write)  # type: ignore
+
+    def increment(self, name: str, amount: int = 1, **labels) -> None:
+        key = self.key(name, labels)
+        try:
+            self.get_client(key, write=True).hincrby(key, "count", amount)
+        except RedisError as e:
+            logger.warning(f"Failed to record metric {name}: {e}")
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """Set the current value of a gauge, e.g. a queue depth"""
+        key = self.key(name, labels)
+        try:
+            self.get_client(key, write=True).hset(key, "value", value)
+        except RedisError as e:
+            logger.warning(f"Failed to record metric {name}: {e}")
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Add a latency to the histogram of the metric"""
+        key = self.key(name, labels)
+        bucket = next(
+            (f"le_{bound}" for bound in LATENCY_BUCKETS if seconds <= bound),
+            "le_inf",
+        )
+        try:
+            pipeline = self.get_client(key, write=True).pipeline()
+            pipeline.hincrby(key, "count", 1)
+            pipeline.hincrbyfloat(key, "sum", seconds)
+            pipeline.hincrby(key, bucket, 1)
+            pipeline.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to record metric {name}: {e}")
+
+    def get(self, name: str, **labels) -> dict:
+        """Values recorded for the metric and labels"""
+        key = self.key(name, labels)
+        values = self.get_client(key).hgetall(key)
+        return {field.decode(): float(value) for field, value in values.items()}
+
+    def series(self, prefix: str = "") -> dict:
+        """Values of every series whose name starts with the prefix"""
+        pattern = self.key(f"{prefix}*", {}).removesuffix(":")
+        client = self.get_client(pattern)
+        return {
+            key.decode().split("metrics:", 1)[1]: {
+                field.decode(): float(value)
+                for field, value in client.hgetall(key).items()
+            }
+            for key in sorted(client.scan_iter(match=pattern))
+        }
+
+
+Metrics = RecordMetrics()
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:09
+
+import commons.models
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedRecord",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, null=True)),
+                ("source_table", models.CharField(max_length=255)),
+                ("record_id", models.UUIDField()),
+                ("record_created_at", models.DateTimeField()),
+                ("user_id", models.UUIDField(blank=True, null=True)),
+                ("data", models.JSONField(decoder=commons.models.ArchiveDecoder)),
+            ],
+            options={
+                "ordering": ("-created_at",),
+                "indexes": [
+                    models.Index(
+                        fields=["source_table", "user_id", "record_created_at"],
+                        name="archive_user_created_idx",
+                    ),
+                    models.Index(
+                        fields=["source_table", "record_id"], name="archive_record_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:22
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("commons", "0001_archivedrecord"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExternalResponse",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, null=True)),
+                ("payload", models.JSONField()),
+            ],
+            options={
+                "ordering": ("-created_at",),
+            },
+        ),
+    ]
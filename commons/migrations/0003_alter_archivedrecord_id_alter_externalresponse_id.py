@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:45
+
+import commons.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("commons", "0002_externalresponse"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="archivedrecord",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="externalresponse",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
@@ -1,6 +1,30 @@
+import json
+import os
+import time
 import uuid
+from datetime import datetime
+from decimal import Decimal
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID, version 7 of RFC 9562.
+    Ids start with the Unix time in milliseconds followed by a fraction of the
+    millisecond so that new rows are appended to the end of primary key indexes
+    instead of random pages.
+    """
+    timestamp_ms, nanoseconds = divmod(time.time_ns(), 1_000_000)
+    return uuid.UUID(
+        int=(timestamp_ms & (2**48 - 1)) << 80
+        | 0x7 << 76  # Version
+        | (nanoseconds * 4096 // 1_000_000) << 64
+        | 0b10 << 62  # Variant
+        | int.from_bytes(os.urandom(8), "big") & (2**62 - 1)
+    )
 
 
 class Base(models.Model):
@@ -9,10 +33,166 @@ class Base(models.Model):
     Base contains common fields among the models.
     """
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
     class Meta:
         abstract = True
         ordering = ("-created_at",)
+
+
+class ArchiveDecoder(json.JSONDecoder):
+    """Decode archived numbers as decimals so that amounts are restored exactly"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, parse_float=Decimal, **kwargs)
+
+
+class ArchivedRecordManager(models.Manager):
+    def of(self, model):
+        """Archived rows of a model"""
+        return self.filter(source_table=model._meta.db_table)
+
+    def restore(self, model, record):
+        """Rebuild an unsaved instance of the model from an archived row"""
+        return model(
+            **{
+                field.attname: self.to_python(field, record.data[field.column])
+                for field in model._meta.concrete_fields
+                if field.column in record.data
+            }
+        )
+
+    def to_python(self, field, value):
+        value = field.to_python(value)
+        if isinstance(value, datetime) and timezone.is_aware(value):
+            # Rows read from the tables are naive unless USE_TZ is set
+            return value if settings.USE_TZ else timezone.make_naive(value)
+
+        return value
+
+
+class ArchivedRecord(Base):
+    """
+    Cold row moved out of a hot table by the `archive_cold_rows` command.
+    The row is kept as JSON so that the hot table can change without migrating
+    its archive.
+    """
+
+    source_table = models.CharField(max_length=255)
+    record_id = models.UUIDField()
+    record_created_at = models.DateTimeField()
+    user_id = models.UUIDField(null=True, blank=True)
+    data = models.JSONField(decoder=ArchiveDecoder)
+
+    objects = ArchivedRecordManager()
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["source_table", "user_id", "record_created_at"],
+                name="archive_user_created_idx",
+            ),
+            models.Index(
+                fields=["source_table", "record_id"], name="archive_record_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.source_table} {self.record_id}"
+
+
+class ExternalResponseManager(models.Manager):
+    def save_pending(self, objs) -> None:
+        """Save the payloads set on objects that are bulk created"""
+        records = []
+        for obj in objs:
+            if not hasattr(obj, "_pending_external_response"):
+                continue
+
+            payload = obj.__dict__.pop("_pending_external_response")
+            obj.external_response_record = (
+                None if payload is None else ExternalResponse(payload=payload)
+            )
+            if obj.external_response_record:
+                records.append(obj.external_response_record)
+
+        self.bulk_create(records)
+
+
+class ExternalResponse(Base):
+    """
+    Raw payload received from a provider such as M-Pesa or OneSignal.
+    Payloads are kept out of the tables that reference them so that reading
+    those rows does not load the payloads. Rows are never updated.
+    """
+
+    payload = models.JSONField()
+
+    objects = ExternalResponseManager()
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self) -> str:
+        return str(self.id)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("External responses can not be changed once saved.")
+
+        return super().save(*args, **kwargs)
+
+
+class ExternalResponseMixin(models.Model):
+    """
+    Link a model to the provider payloads it receives.
+    `external_response` reads and writes the payload, which is only fetched
+    from the ExternalResponse table when it is read. Setting a new payload
+    saves a new ExternalResponse with the model.
+    """
+
+    external_response_record = models.ForeignKey(
+        ExternalResponse,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        # Payloads are looked up from the row. Models add a partial index on the
+        # rows that have one, which deleting unused payloads checks.
+        db_index=False,
+    )
+
+    class Meta:
+        abstract = True
+
+    @property
+    def external_response(self):
+        if hasattr(self, "_pending_external_response"):
+            return self._pending_external_response
+
+        record = self.external_response_record
+        return record.payload if record else None
+
+    @external_response.setter
+    def external_response(self, payload) -> None:
+        self._pending_external_response = payload
+
+    def save(self, *args, **kwargs):
+        if hasattr(self, "_pending_external_response"):
+            payload = self._pending_external_response
+            del self._pending_external_response
+            self.external_response_record = (
+                None
+                if payload is None
+                else ExternalResponse.objects.create(payload=payload)
+            )
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = [
+                    *kwargs["update_fields"],
+                    "external_response_record",
+                ]
+
+        return super().save(*args, **kwargs)
@@ -8,3 +8,16 @@ class StandardPageNumberPagination(pagination.PageNumberPagination):
     max_page_size: int = int(os.environ["MAXIMUM_PAGE_SIZE"])
     page_query_param: str = "page"
     page_size_query_param = "page_size"
+
+
+class TimeOrderedCursorPagination(pagination.CursorPagination):
+    """
+    Paginate newest first by creation time instead of counting and offsetting
+    rows. Pages have no count and are fetched with the `next` and `previous`
+    links, so endpoints opt in to it next to their page numbered listing.
+    """
+
+    page_size: int = int(os.environ["PAGE_SIZE"])
+    max_page_size: int = int(os.environ["MAXIMUM_PAGE_SIZE"])
+    page_size_query_param = "page_size"
+    ordering = "-created_at"
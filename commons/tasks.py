@@ -1,15 +1,28 @@
+from datetime import datetime, timedelta
+
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
 
-from commons.constants import PUSH_PROVIDERS, SMS_PROVIDERS
+from commons.archive import ColdRowsArchiver
+from commons.constants import SMS_PROVIDERS
+from commons.lanes import LaneMonitor
 from commons.raw_logger import logger
+from notifications.constants import NotificationChannels
+from notifications.models import NotificationOutbox
+from notifications.outbox import NotificationDispatcher
+from notifications.retention import NotificationsPruner
+from notifications.routing import SmsRouter
 
 
 @shared_task  # type: ignore
 def send_sms(*, phone_number: str, type: str, message: str) -> bool:
     logger.info("Sending sms in background...")
-    for provider in SMS_PROVIDERS:
-        if provider.send_sms(phone_number, type, message):
-            return True
+    if SmsRouter.send(
+        SMS_PROVIDERS,
+        lambda provider: provider.send_sms(phone_number, type, message),
+    ):
+        return True
 
     # Raise error if all providers failed here
     logger.error("Failed to send sms in the background")
@@ -18,11 +31,75 @@ def send_sms(*, phone_number: str, type: str, message: str) -> bool:
 
 @shared_task  # type: ignore
 def send_push(*, type: str, title: str, message: str, user_id: str) -> bool:
-    logger.info("Sending push notification in background...")
-    for provider in PUSH_PROVIDERS:
-        if provider.send_push(type=type, title=title, message=message, user_id=user_id):
-            return True
+    """Deprecated, pushes are sent through the outbox. Kept for one release so
+    that pushes queued before the deploy are still sent, then removed."""
+    logger.info("Adding push notification queued before the outbox...")
+    queue_pushes(
+        [{"type": type, "title": title, "message": message, "user_id": user_id}]
+    )
 
-    # Raise error if all providers failed here
-    logger.error("Failed to send push notification in the background")
-    return False
+    return True
+
+
+@shared_task(name="dispatch_notifications")  # type: ignore
+def dispatch_notifications_task(channel: str | None = None) -> int:
+    """Send the pending notifications of the outbox and return the number sent"""
+    return NotificationDispatcher.dispatch(channel=channel)
+
+
+def schedule_outbox_dispatch(channel: str) -> None:
+    """Pushes added within PUSH_BUFFER_SECONDS are sent together,
+    SMS are sent right away. One dispatch is scheduled at a time."""
+    countdown = (
+        settings.PUSH_BUFFER_SECONDS if channel == NotificationChannels.PUSH else 0
+    )
+    if NotificationDispatcher.claim_dispatch(channel, timeout=countdown + 60):
+        dispatch_notifications_task.apply_async(
+            kwargs={"channel": channel}, countdown=countdown
+        )
+
+
+def queue_pushes(pushes: list[dict]) -> None:
+    """Add pushes of `type`, `title`, `message` and `user_id` to the outbox.
+    They are only sent if the current transaction commits."""
+    if not pushes:
+        return
+
+    NotificationOutbox.objects.add_pushes(pushes)
+    transaction.on_commit(
+        lambda: schedule_outbox_dispatch(NotificationChannels.PUSH.value)
+    )
+
+
+def queue_sms(*, phone_number: str, type: str, message: str) -> None:
+    """Add an SMS to the outbox, it is only sent if the current transaction commits"""
+    NotificationOutbox.objects.add_sms(
+        phone_number=phone_number, type=type, message=message
+    )
+    transaction.on_commit(
+        lambda: schedule_outbox_dispatch(NotificationChannels.SMS.value)
+    )
+
+
+@shared_task(name="archive_cold_rows")  # type: ignore
+def archive_cold_rows_task() -> dict:
+    """Move rows older than ARCHIVE_AFTER_DAYS to the archive"""
+    logger.info("Archiving cold rows in background...")
+    return ColdRowsArchiver.archive(
+        cutoff=datetime.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS),
+        batch_size=1000,
+        pause=0.1,
+    )
+
+
+@shared_task(name="prune_notifications")  # type: ignore
+def prune_notifications_task() -> dict:
+    """Delete notifications past their retention"""
+    logger.info("Pruning notifications in background...")
+    return NotificationsPruner.prune(batch_size=1000, pause=0.1)
+
+
+@shared_task(name="record_lane_metrics")  # type: ignore
+def record_lane_metrics_task() -> dict:
+    """Record the number of tasks waiting in every queue"""
+    return LaneMonitor.record()
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+
+from accounts.constants import (
+    TransactionCashFlow,
+    TransactionServices,
+    TransactionStatuses,
+    TransactionTypes,
+)
+from accounts.models import BalanceCheckpoint, Transaction
+from accounts.reconciliation import ReconcileLedger
+from commons.archive import ArchiveColdRows
+from commons.models import ArchivedRecord
+from commons.tests.base_tests import BaseQuizTestCase
+from quiz.models import Result, UserAnswer
+from user_sessions.utils import (
+    get_result_answers,
+    query_sessions_not_played_by_user_in_category,
+)
+
+
+class ArchiveColdRowsTestCase(BaseQuizTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.archiver = ArchiveColdRows()
+        self.old = datetime.now() - timedelta(days=100)
+        self.cutoff = datetime.now() - timedelta(days=90)
+
+        self.transactions = [
+            Transaction.objects.create(
+                external_transaction_id=f"TX{index}",
+                cash_flow=TransactionCashFlow.INWARD.value,
+                type=TransactionTypes.DEPOSIT.value,
+                status=TransactionStatuses.SUCCESSFUL.value,
+                service=TransactionServices.MPESA.value,
+                amount=Decimal("100.55"),
+                user=self.user,
+            )
+            for index in range(3)
+        ]
+        # Includes the stake paid for the session
+        for index, transaction_obj in enumerate(
+            Transaction.objects.order_by("created_at")
+        ):
+            Transaction.objects.filter(id=transaction_obj.id).update(
+                created_at=self.old + timedelta(minutes=index)
+            )
+
+        Result.objects.filter(id=self.result.id).update(
+            created_at=self.old, is_active=False, score=Decimal("75.5")
+        )
+        UserAnswer.objects.filter(id=self.user_answer.id).update(created_at=self.old)
+
+    def test_only_cold_rows_are_archived(self) -> None:
+        # Transactions are only archived once the reconciliation verified them
+        self.archiver.archive(cutoff=self.cutoff, batch_size=2)
+        self.assertEqual(Transaction.objects.count(), 4)
+
+        list(ReconcileLedger().reconcile())
+        archived = self.archiver.archive(cutoff=self.cutoff, batch_size=2)
+
+        self.assertEqual(
+            archived,
+            {"accounts.Transaction": 3, "quiz.Result": 0, "quiz.UserAnswer": 0},
+        )
+        # The latest transaction is kept to read the balance from
+        self.assertEqual(
+            list(Transaction.objects.values_list("id", flat=True)),
+            [self.transactions[2].id],
+        )
+        self.assertFalse(Result.objects.exists())
+        self.assertFalse(UserAnswer.objects.exists())
+
+        record = ArchivedRecord.objects.get(record_id=self.transactions[1].id)
+        self.assertEqual(record.source_table, Transaction._meta.db_table)
+        self.assertEqual(record.user_id, self.user.id)
+        restored = ArchivedRecord.objects.restore(Transaction, record)
+        self.assertEqual(restored.final_balance, Decimal("101.10"))
+        self.assertEqual(restored.created_at, self.old + timedelta(minutes=2))
+
+    def test_archived_rows_get_time_ordered_ids(self) -> None:
+        list(ReconcileLedger().reconcile())
+        self.archiver.archive(cutoff=self.cutoff, batch_size=10)
+
+        records = ArchivedRecord.objects.of(Transaction).order_by("record_created_at")
+        ids = [record.id for record in records]
+        self.assertEqual({id.version for id in ids}, {7})
+        self.assertEqual(ids, sorted(ids))
+
+    def test_active_and_recent_rows_are_not_archived(self) -> None:
+        Result.objects.filter(id=self.result.id).update(is_active=True)
+        UserAnswer.objects.filter(id=self.user_answer.id).update(
+            created_at=datetime.now()
+        )
+
+        self.archiver.archive(cutoff=self.cutoff)
+
+        self.assertTrue(Result.objects.filter(id=self.result.id).exists())
+        self.assertTrue(UserAnswer.objects.filter(id=self.user_answer.id).exists())
+
+    def test_archived_sessions_can_still_be_read(self) -> None:
+        self.archiver.archive(cutoff=self.cutoff)
+
+        data = get_result_answers(user=self.user, session=self.session)
+
+        self.assertEqual(data["score"], 75.5)
+        self.assertEqual(
+            data["questions"],
+            [
+                {
+                    "question": self.question_text,
+                    "choice": self.choice_text,
+                    "is_correct": True,
+                }
+            ],
+        )
+
+    def test_archived_sessions_are_not_played_again(self) -> None:
+        self.archiver.archive(cutoff=self.cutoff)
+
+        self.assertEqual(
+            query_sessions_not_played_by_user_in_category(
+                user=self.user, category=self.category
+            ),
+            [],
+        )
+
+    def test_full_reconciliation_resumes_from_archive(self) -> None:
+        list(ReconcileLedger().reconcile())
+        self.archiver.archive(cutoff=self.cutoff)
+
+        reconciler = ReconcileLedger(full=True)
+        self.assertEqual(list(reconciler.reconcile()), [])
+        self.assertEqual(reconciler.transactions_count, 1)
+        checkpoint = BalanceCheckpoint.objects.get(user=self.user)
+        self.assertEqual(checkpoint.balance, Decimal("201.65"))
+        self.assertEqual(checkpoint.transactions_count, 4)
+
+    def test_command_reports_archived_rows(self) -> None:
+        stdout = StringIO()
+        call_command("archive_cold_rows", "--pause", "0", stdout=stdout)
+
+        self.assertIn("Archived 1 quiz.Result.", stdout.getvalue())
+        self.assertIn("Archived 1 quiz.UserAnswer.", stdout.getvalue())
@@ -0,0 +1,91 @@
+import time
+from datetime import datetime, timedelta
+
+from celery.app.task import Context
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from commons.constants import TaskLanes
+from commons.lanes import LaneMonitor, observe_queue_wait, stamp_published_at
+from commons.metrics import Metrics
+from majibu.celery import app
+from notifications.constants import NotificationChannels
+
+
+class StubTask:
+    def __init__(self, **request) -> None:
+        self.request = Context(**request)
+
+
+class TaskLanesTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def lane(self, name: str, **kwargs) -> str:
+        return app.amqp.router.route({}, name, (), kwargs)["queue"].name
+
+    def test_tasks_are_routed_to_the_queue_of_their_lane(self) -> None:
+        self.assertEqual(self.lane("commons.tasks.send_sms"), TaskLanes.OTP.value)
+        self.assertEqual(self.lane("dispatch_payouts"), TaskLanes.PAYMENTS.value)
+        self.assertEqual(self.lane("pairing_service"), TaskLanes.PAIRING.value)
+        self.assertEqual(self.lane("reconcile_ledger"), TaskLanes.DEFAULT.value)
+
+    def test_outbox_sms_skip_the_bulk_notifications_queue(self) -> None:
+        self.assertEqual(
+            self.lane("dispatch_notifications", channel=NotificationChannels.SMS.value),
+            TaskLanes.OTP.value,
+        )
+        self.assertEqual(
+            self.lane(
+                "dispatch_notifications", channel=NotificationChannels.PUSH.value
+            ),
+            TaskLanes.NOTIFICATIONS.value,
+        )
+        self.assertEqual(
+            self.lane("dispatch_notifications"), TaskLanes.NOTIFICATIONS.value
+        )
+
+    def test_queue_wait_is_observed_per_lane(self) -> None:
+        headers: dict = {}
+        stamp_published_at(headers=headers)
+        headers["published_at"] -= 2
+
+        observe_queue_wait(
+            task=StubTask(**headers, delivery_info={"routing_key": "otp"})
+        )
+
+        values = Metrics.get("celery_queue_seconds", lane=TaskLanes.OTP.value)
+        self.assertEqual(values["count"], 1)
+        self.assertEqual(values["le_2.5"], 1)
+
+    def test_queue_wait_of_delayed_tasks_starts_at_their_eta(self) -> None:
+        eta = datetime.now().astimezone() - timedelta(seconds=0.01)
+
+        observe_queue_wait(
+            task=StubTask(
+                published_at=time.time() - 10,
+                eta=eta.isoformat(),
+                delivery_info={"routing_key": "notifications"},
+            )
+        )
+
+        values = Metrics.get("celery_queue_seconds", lane="notifications")
+        self.assertEqual(values["le_0.05"], 1)
+
+    def test_queue_depths_are_recorded(self) -> None:
+        with app.connection_for_write() as connection:
+            client = connection.default_channel.client
+            client.lpush(TaskLanes.PAIRING.value, "test")
+            try:
+                depths = LaneMonitor.record()
+            finally:
+                client.lrem(TaskLanes.PAIRING.value, 1, "test")
+
+        self.assertGreaterEqual(depths[TaskLanes.PAIRING.value], 1)
+        self.assertEqual(
+            Metrics.get("celery_queue_depth", lane=TaskLanes.PAIRING.value)["value"],
+            depths[TaskLanes.PAIRING.value],
+        )
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from commons.locks import Locks
+
+
+class RedisLocksTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def test_lock_is_held_until_released(self) -> None:
+        token = Locks.acquire("test_lock", timeout=60)
+
+        self.assertIsNotNone(token)
+        self.assertIsNone(Locks.acquire("test_lock", timeout=60))
+        self.assertTrue(Locks.release("test_lock", token))
+        self.assertIsNotNone(Locks.acquire("test_lock", timeout=60))
+
+    def test_lock_taken_by_another_holder_is_not_released(self) -> None:
+        expired_token = Locks.acquire("test_lock", timeout=60)
+        cache.delete("test_lock")  # The lock timed out
+        token = Locks.acquire("test_lock", timeout=60)
+
+        self.assertFalse(Locks.release("test_lock", expired_token))
+        self.assertIsNone(Locks.acquire("test_lock", timeout=60))
+        self.assertTrue(Locks.release("test_lock", token))
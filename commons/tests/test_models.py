@@ -0,0 +1,43 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from commons.models import uuid7
+from notifications.constants import (
+    NotificationChannels,
+    NotificationProviders,
+    NotificationTypes,
+)
+from notifications.models import Notification
+
+
+class UUID7TestCase(TestCase):
+    def test_ids_are_time_ordered(self) -> None:
+        ids = [uuid7() for _ in range(1000)]
+        time.sleep(0.002)
+
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertLess(ids[-1], uuid7())
+        self.assertEqual(ids[0].version, 7)
+        self.assertEqual(ids[0].variant, "specified in RFC 4122")
+
+    def test_new_rows_get_time_ordered_ids(self) -> None:
+        notification = Notification.objects.create(
+            type=NotificationTypes.MARKETING.value,
+            message="Test message",
+            channel=NotificationChannels.PUSH.value,
+            provider=NotificationProviders.ONESIGNAL.value,
+        )
+        self.assertEqual(notification.id.version, 7)
+
+    def test_benchmark_command_reports_both_id_kinds(self) -> None:
+        stdout = StringIO()
+        call_command(
+            "benchmark_uuid_keys", "--rows", "100", "--batch-size", "30", stdout=stdout
+        )
+
+        self.assertIn("uuid4: inserted 100 rows", stdout.getvalue())
+        self.assertIn("uuid7: inserted 100 rows", stdout.getvalue())
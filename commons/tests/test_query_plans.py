@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Q
+
+from accounts.constants import (
+    TransactionCashFlow,
+    TransactionServices,
+    TransactionStatuses,
+    TransactionTypes,
+)
+from accounts.models import MpesaPayment, Transaction
+from commons.filters import get_prefix_search_query
+from commons.tests.base_tests import BaseQuizTestCase
+from notifications.constants import (
+    NotificationChannels,
+    NotificationProviders,
+    NotificationTypes,
+)
+from notifications.models import Notification
+from quiz.models import Result, UserAnswer
+from user_sessions.models import DuoSession
+from users.models import User
+
+
+class HotQueryPlansTestCase(BaseQuizTestCase):
+    """
+    Assert the hottest queries are served by an index.
+    Sequential scans are disabled so that the planner only falls back to them
+    when no index can serve the query, regardless of how small the tables are.
+    Tables are analyzed first so that plans do not depend on stale statistics
+    left by other tests.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            # Lasts until the end of the test case transaction
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertNoSeqScan(self, queryset, index_name: str | None = None) -> None:
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, msg=plan)
+        if index_name:
+            self.assertIn(index_name, plan)
+
+    def test_user_transactions_use_index(self) -> None:
+        # The user's latest posting among many postings of other users
+        Transaction.objects.bulk_post(
+            [
+                Transaction(
+                    external_transaction_id=f"TX{index}{user.username}",
+                    cash_flow=TransactionCashFlow.INWARD.value,
+                    type=TransactionTypes.REWARD.value,
+                    status=TransactionStatuses.SUCCESSFUL.value,
+                    service=TransactionServices.MAJIBU.value,
+                    amount=Decimal("1.0"),
+                    user=user,
+                )
+                for user, postings in [(self.user, 20), (self.foreign_user, 2000)]
+                for index in range(postings)
+            ]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE accounts_transaction")
+
+        self.assertNoSeqScan(
+            Transaction.objects.filter(user=self.user).order_by("-created_at")[:1],
+            "transaction_user_created_idx",
+        )
+
+    def test_pairing_queue_uses_index(self) -> None:
+        self.assertNoSeqScan(
+            Result.objects.filter(
+                is_active=True, session__category=self.category
+            ).order_by("exits_at"),
+            "result_active_session_idx",
+        )
+
+    def test_user_results_use_index(self) -> None:
+        self.assertNoSeqScan(
+            Result.objects.filter(user=self.user, session=self.session),
+            "result_user_session_idx",
+        )
+
+    def test_recent_pairings_use_index(self) -> None:
+        # Either the composite or the foreign key indexes may serve small tables
+        self.assertNoSeqScan(
+            DuoSession.objects.filter(
+                Q(party_a=self.user, party_b=self.foreign_user)
+                | Q(party_a=self.foreign_user, party_b=self.user),
+                created_at__gte=datetime.now() - timedelta(hours=2),
+            )
+        )
+
+    def test_user_answers_use_index(self) -> None:
+        self.assertNoSeqScan(
+            UserAnswer.objects.filter(user=self.user, session=self.session),
+            "useranswer_user_session_idx",
+        )
+
+    def create_notifications(self) -> None:
+        """Notifications of the user among many of others, mostly read"""
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    type=NotificationTypes.SESSION.value,
+                    message="Test message",
+                    channel=NotificationChannels.PUSH.value,
+                    provider=NotificationProviders.ONESIGNAL.value,
+                    user=user,
+                    is_read=index > 0,
+                )
+                for user, count in [(self.user, 200), (self.foreign_user, 2000)]
+                for index in range(count)
+            ]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE notifications_notification")
+
+    def test_unread_notifications_count_uses_index(self) -> None:
+        self.create_notifications()
+        # Counting drops the default ordering
+        self.assertNoSeqScan(
+            Notification.objects.filter(user=self.user, is_read=False).order_by(),
+            "notification_unread_idx",
+        )
+
+    def test_user_notifications_use_index(self) -> None:
+        self.create_notifications()
+        self.assertNoSeqScan(
+            Notification.objects.filter(user=self.user).order_by("-created_at")[:10],
+            "notification_user_created_idx",
+        )
+
+    def test_mpesa_callback_lookup_uses_index(self) -> None:
+        self.assertNoSeqScan(
+            MpesaPayment.objects.filter(checkout_request_id="ws_CO_123"),
+            "mpesapayment_checkout_idx",
+        )
+
+    def test_transaction_search_uses_index(self) -> None:
+        # As counted by the paginator, ordered pages may walk the created_at index
+        self.assertNoSeqScan(
+            Transaction.objects.annotate(search=Transaction.search_vector)
+            .filter(search=get_prefix_search_query(["TX12 deposit"]))
+            .order_by(),
+            "transaction_search_idx",
+        )
+
+    def test_user_search_uses_index(self) -> None:
+        self.assertNoSeqScan(
+            User.objects.annotate(search=User.search_vector).filter(
+                search=get_prefix_search_query(["0712"])
+            ),
+            "user_search_idx",
+        )
@@ -30,4 +30,49 @@ app.conf.beat_schedule = {
         # Run every 3 minutes
         "schedule": crontab(minute="*/3"),
     },
+    # Process callbacks left in the inbox, received callbacks also trigger it
+    "process-mpesa-callbacks-period-task": {
+        "task": "process_mpesa_callbacks",
+        "schedule": crontab(minute="*"),
+    },
+    # Send payouts left in the queue, withdrawal requests also trigger it
+    "dispatch-payouts-period-task": {
+        "task": "dispatch_payouts",
+        "schedule": crontab(minute="*"),
+    },
+    # Query the status of STKPush payments whose callback never arrived
+    "query-stale-stkpush-payments-period-task": {
+        "task": "query_stale_stkpush_payments",
+        "schedule": crontab(minute="*/5"),
+    },
+    # Renew the M-Pesa tokens well before their cache timeout of about an hour
+    "renew-mpesa-access-tokens-period-task": {
+        "task": "renew_mpesa_access_tokens",
+        "schedule": crontab(minute="*/30"),
+    },
+    # Retry failed SMS of the outbox, queued notifications also schedule a dispatch
+    "dispatch-notifications-period-task": {
+        "task": "dispatch_notifications",
+        "schedule": crontab(minute="*"),
+    },
+    # Record the depth of every task queue for the lane metrics
+    "record-lane-metrics-period-task": {
+        "task": "record_lane_metrics",
+        "schedule": crontab(minute="*"),
+    },
+    # Verify the ledger's chained balances from the last checkpoints every night
+    "reconcile-ledger-period-task": {
+        "task": "reconcile_ledger",
+        "schedule": crontab(hour=2, minute=0),
+    },
+    # Archive cold rows after the reconciliation has checkpointed the ledger
+    "archive-cold-rows-period-task": {
+        "task": "archive_cold_rows",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    # Delete old notifications and sent notifications of the outbox
+    "prune-notifications-period-task": {
+        "task": "prune_notifications",
+        "schedule": crontab(hour=4, minute=0),
+    },
 }
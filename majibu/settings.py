@@ -174,6 +174,14 @@ CACHES = {
     }
 }
 
+# Seconds a wallet balance stays in the cache without being written to, kept
+# short so that a balance whose invalidation was missed ages out quickly
+BALANCE_CACHE_TIMEOUT = int(os.environ.get("BALANCE_CACHE_TIMEOUT", 60 * 5))
+# Seconds an unread notifications count is cached before it is rebuilt
+UNREAD_NOTIFICATIONS_CACHE_TIMEOUT = int(
+    os.environ.get("UNREAD_NOTIFICATIONS_CACHE_TIMEOUT", 60 * 10)
+)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=21),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=21),
@@ -232,6 +240,10 @@ SESSION_TOTAL_ANSWERED_WEIGHT = 0.2
 MODERATED_LOWEST_SCORE: float = 70.0
 MODERATED_HIGHEST_SCORE: float = 85.0
 
+# ARCHIVAL
+# Transactions, results and user answers older than this are moved to the archive
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 90))
+
 # Celery settings
 CELERY_CACHE_BACKEND = "default"
 CELERY_TASK_SOFT_TIME_LIMIT = 60 * 5  # Tasks expire after 5 minutes
@@ -240,6 +252,9 @@ CELERY_ACCEPT_CONTENT = {"application/json"}
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "Africa/Nairobi"
+# Tasks are routed to the queue of their lane, see commons.lanes
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_ROUTES = ("commons.lanes.route_task",)
 
 HOST_PINNACLE_USER_ID = os.environ["HOST_PINNACLE_USER_ID"]
 HOST_PINNACLE_PASSWORD = os.environ["HOST_PINNACLE_PASSWORD"]
@@ -268,6 +283,36 @@ SPECTACULAR_SETTINGS = {
 # One Signal
 ONESIGNAL_APP_ID = os.environ["ONESIGNAL_APP_ID"]
 ONESIGNAL_API_KEY = os.environ["ONESIGNAL_API_KEY"]
+# Pushes queued within PUSH_BUFFER_SECONDS are sent together
+PUSH_BUFFER_SECONDS = int(os.environ.get("PUSH_BUFFER_SECONDS", 2))
+# Notifications claimed from the outbox at a time, failed ones are retried
+NOTIFICATIONS_OUTBOX_BATCH_SIZE = int(
+    os.environ.get("NOTIFICATIONS_OUTBOX_BATCH_SIZE", 500)
+)
+NOTIFICATIONS_OUTBOX_MAX_ATTEMPTS = int(
+    os.environ.get("NOTIFICATIONS_OUTBOX_MAX_ATTEMPTS", 3)
+)
+NOTIFICATIONS_SMS_CONCURRENCY = int(os.environ.get("NOTIFICATIONS_SMS_CONCURRENCY", 8))
+# Seconds after which notifications claimed by a dispatcher that never recorded
+# their results are claimed again
+NOTIFICATIONS_OUTBOX_CLAIM_TIMEOUT = int(
+    os.environ.get("NOTIFICATIONS_OUTBOX_CLAIM_TIMEOUT", 60 * 10)
+)
+# Days notifications and sent notifications of the outbox are kept for
+NOTIFICATIONS_RETENTION_DAYS = int(os.environ.get("NOTIFICATIONS_RETENTION_DAYS", 90))
+NOTIFICATIONS_OUTBOX_RETENTION_DAYS = int(
+    os.environ.get("NOTIFICATIONS_OUTBOX_RETENTION_DAYS", 7)
+)
+# Connections to the push and SMS providers, shared by the threads of a worker
+NOTIFICATIONS_POOL_SIZE = int(os.environ.get("NOTIFICATIONS_POOL_SIZE", 20))
+NOTIFICATIONS_CONNECT_TIMEOUT = float(
+    os.environ.get("NOTIFICATIONS_CONNECT_TIMEOUT", 3.05)
+)
+NOTIFICATIONS_READ_TIMEOUT = float(os.environ.get("NOTIFICATIONS_READ_TIMEOUT", 10))
+# SMS are routed to the healthiest provider over its last SMS_ROUTING_WINDOW calls
+SMS_ROUTING_WINDOW = int(os.environ.get("SMS_ROUTING_WINDOW", 50))
+SMS_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("SMS_CIRCUIT_FAILURE_THRESHOLD", 3))
+SMS_CIRCUIT_OPEN_SECONDS = float(os.environ.get("SMS_CIRCUIT_OPEN_SECONDS", 60))
 
 # M-Pesa
 MPESA_BUSINESS_SHORT_CODE = os.environ["MPESA_BUSINESS_SHORT_CODE"]
@@ -288,7 +333,38 @@ MPESA_DATETIME_FORMAT = "%Y%m%d%H%M%S"
 MPESA_PASS_KEY = os.environ["MPESA_PASS_KEY"]
 MPESA_SECRET = os.environ["MPESA_SECRET"]
 MPESA_STKPUSH_URL = os.environ["MPESA_STKPUSH_URL"]
+MPESA_STK_QUERY_URL = os.environ.get(
+    "MPESA_STK_QUERY_URL", "https://api.safaricom.co.ke/mpesa/stkpushquery/v1/query"
+)
 MPESA_TOKEN_URL = os.environ["MPESA_TOKEN_URL"]
+
+# Daraja API client
+MPESA_CONNECT_TIMEOUT = float(os.environ.get("MPESA_CONNECT_TIMEOUT", 3.05))
+MPESA_READ_TIMEOUT = float(os.environ.get("MPESA_READ_TIMEOUT", 30))
+MPESA_MAX_RETRIES = int(os.environ.get("MPESA_MAX_RETRIES", 3))
+MPESA_RETRY_BACKOFF = float(os.environ.get("MPESA_RETRY_BACKOFF", 0.5))  # In seconds
+MPESA_POOL_SIZE = int(os.environ.get("MPESA_POOL_SIZE", 10))
+# Workers wait for the one refreshing the access token for up to this long
+MPESA_TOKEN_WAIT_TIMEOUT = float(os.environ.get("MPESA_TOKEN_WAIT_TIMEOUT", 5))
+MPESA_TOKEN_LOCK_TIMEOUT = int(os.environ.get("MPESA_TOKEN_LOCK_TIMEOUT", 60))
+# B2C payouts are sent in batches from a pool of threads
+MPESA_B2C_RATE_LIMIT = float(os.environ.get("MPESA_B2C_RATE_LIMIT", 5))  # Per second
+MPESA_B2C_CONCURRENCY = int(os.environ.get("MPESA_B2C_CONCURRENCY", 8))
+PAYOUT_BATCH_SIZE = int(os.environ.get("PAYOUT_BATCH_SIZE", 50))
+PAYOUT_DISPATCHER_TIMEOUT = int(os.environ.get("PAYOUT_DISPATCHER_TIMEOUT", 600))
+# Seconds a dispatcher keeps claiming batches, well below CELERY_TASK_SOFT_TIME_LIMIT
+PAYOUT_DISPATCH_TIME_BUDGET = int(os.environ.get("PAYOUT_DISPATCH_TIME_BUDGET", 120))
+MPESA_CALLBACK_BATCH_SIZE = int(os.environ.get("MPESA_CALLBACK_BATCH_SIZE", 100))
+# Seconds callbacks wait for their payment or withdrawal to be saved
+MPESA_CALLBACK_ORPHAN_TIMEOUT = int(
+    os.environ.get("MPESA_CALLBACK_ORPHAN_TIMEOUT", 600)
+)
+# STKPush requests without a result are queried after MPESA_STK_QUERY_DELAY seconds
+MPESA_STK_QUERY_DELAY = int(os.environ.get("MPESA_STK_QUERY_DELAY", 300))
+MPESA_STK_QUERY_MAX_AGE = int(os.environ.get("MPESA_STK_QUERY_MAX_AGE", 86400))
+MPESA_STK_QUERY_BATCH_SIZE = int(os.environ.get("MPESA_STK_QUERY_BATCH_SIZE", 50))
+MPESA_STK_QUERY_RATE_LIMIT = float(os.environ.get("MPESA_STK_QUERY_RATE_LIMIT", 5))
+MPESA_STK_QUERY_CONCURRENCY = int(os.environ.get("MPESA_STK_QUERY_CONCURRENCY", 4))
 WITHDRAWAL_BUFFER_PERIOD = int(os.environ["WITHDRAWAL_BUFFER_PERIOD"])
 
 
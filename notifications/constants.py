@@ -11,6 +11,13 @@ class NotificationProviders(str, Enum):
     ONESIGNAL = "ONESIGNAL"
 
 
+class OutboxStatuses(str, Enum):
+    PENDING = "PENDING"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
 class NotificationTypes(str, Enum):
     OTP = "OTP"
     MARKETING = "MARKETING"
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("commons", "0002_externalresponse"),
+        ("notifications", "0006_notification_notification_user_created_idx_and_more"),
+    ]
+
+    # Existing rows are linked to their payloads by 0011, in batches
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="external_response_record",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="commons.externalresponse",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:45
+
+import commons.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0007_move_external_response"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:45
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("commons", "0003_alter_archivedrecord_id_alter_externalresponse_id"),
+        ("notifications", "0008_alter_notification_id"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(fields=["user", "-id"], name="notification_user_id_idx"),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:05
+
+import commons.models
+import notifications.constants
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0009_notification_user_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationOutbox",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=commons.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, null=True)),
+                (
+                    "channel",
+                    models.CharField(
+                        choices=[
+                            (
+                                notifications.constants.NotificationChannels["SMS"],
+                                "SMS",
+                            ),
+                            (
+                                notifications.constants.NotificationChannels["PUSH"],
+                                "PUSH",
+                            ),
+                        ],
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            (notifications.constants.NotificationTypes["OTP"], "OTP"),
+                            (
+                                notifications.constants.NotificationTypes["MARKETING"],
+                                "MARKETING",
+                            ),
+                            (
+                                notifications.constants.NotificationTypes["DEPOSIT"],
+                                "DEPOSIT",
+                            ),
+                            (
+                                notifications.constants.NotificationTypes["WITHDRAW"],
+                                "WITHDRAW",
+                            ),
+                            (
+                                notifications.constants.NotificationTypes["SESSION"],
+                                "SESSION",
+                            ),
+                        ],
+                        max_length=255,
+                    ),
+                ),
+                ("title", models.CharField(blank=True, default="", max_length=255)),
+                ("message", models.TextField()),
+                (
+                    "recipient",
+                    models.CharField(
+                        help_text="The user id of pushes or the phone number of SMS.",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            (
+                                notifications.constants.OutboxStatuses["PENDING"],
+                                "PENDING",
+                            ),
+                            (notifications.constants.OutboxStatuses["SENT"], "SENT"),
+                            (
+                                notifications.constants.OutboxStatuses["FAILED"],
+                                "FAILED",
+                            ),
+                        ],
+                        default="PENDING",
+                        max_length=255,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ("-created_at",),
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "PENDING")),
+                        fields=["channel", "created_at"],
+                        name="outbox_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
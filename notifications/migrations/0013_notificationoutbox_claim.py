@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:41
+
+import notifications.constants
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0012_remove_external_response"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="claimed_by",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="The dispatch sending the notification.",
+                max_length=255,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notificationoutbox",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    (notifications.constants.OutboxStatuses["PENDING"], "PENDING"),
+                    (notifications.constants.OutboxStatuses["SENDING"], "SENDING"),
+                    (notifications.constants.OutboxStatuses["SENT"], "SENT"),
+                    (notifications.constants.OutboxStatuses["FAILED"], "FAILED"),
+                ],
+                default="PENDING",
+                max_length=255,
+            ),
+        ),
+    ]
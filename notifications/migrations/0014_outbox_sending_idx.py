@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:41
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("notifications", "0013_notificationoutbox_claim"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="notificationoutbox",
+            index=models.Index(
+                condition=models.Q(("status", "SENDING")),
+                fields=["claimed_at"],
+                name="outbox_sending_idx",
+            ),
+        ),
+    ]
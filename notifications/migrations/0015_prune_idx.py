@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:45
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("commons", "0003_alter_archivedrecord_id_alter_externalresponse_id"),
+        ("notifications", "0014_outbox_sending_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(fields=["created_at"], name="notification_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("external_response_record__isnull", False)),
+                fields=["external_response_record"],
+                name="notification_response_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="notificationoutbox",
+            index=models.Index(
+                condition=models.Q(("status__in", ["SENT", "FAILED"])),
+                fields=["created_at"],
+                name="outbox_done_created_idx",
+            ),
+        ),
+    ]
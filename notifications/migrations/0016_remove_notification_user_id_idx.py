@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:57
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("notifications", "0015_prune_idx"),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name="notification",
+            name="notification_user_id_idx",
+        ),
+    ]
@@ -1,17 +1,61 @@
+from collections import Counter
+from datetime import datetime
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
-from commons.models import Base
+from commons.models import Base, ExternalResponseMixin
 from notifications.constants import (
     NotificationChannels,
     NotificationProviders,
     NotificationTypes,
+    OutboxStatuses,
 )
+from notifications.unread_cache import UnreadCounter
 
 User = get_user_model()
 
 
-class Notification(Base):
+class NotificationManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self.count_unread_on_commit(objs)
+        return objs
+
+    def count_unread_on_commit(self, notifications) -> None:
+        """Add the unread notifications to the cached counts of their users"""
+        counts = Counter(
+            str(notification.user_id)
+            for notification in notifications
+            if notification.user_id and not notification.is_read
+        )
+        if counts:
+            transaction.on_commit(lambda: UnreadCounter.increment_many(counts))
+
+    def get_unread_count(self, user) -> int:
+        """Get the user's unread count from the cache, filling it from the db"""
+        count = UnreadCounter.get(user.id)
+        if count is not None:
+            return count
+
+        count = self.filter(user=user, is_read=False).count()
+        UnreadCounter.set(user.id, count)
+        return count
+
+    def mark_read(self, user, *, is_read: bool) -> int:
+        """Set the read state of the user's notifications and return the number
+        changed. Only notifications in the other state are written."""
+        changed_count = self.filter(user=user, is_read=not is_read).update(
+            is_read=is_read, updated_at=datetime.now()
+        )
+        if changed_count:
+            counts = {str(user.id): -changed_count if is_read else changed_count}
+            transaction.on_commit(lambda: UnreadCounter.increment_many(counts))
+
+        return changed_count
+
+
+class Notification(Base, ExternalResponseMixin):
     type = models.CharField(
         max_length=255, choices=[(type, type.value) for type in NotificationTypes]
     )
@@ -33,7 +77,6 @@ class Notification(Base):
         ),
     )
     is_read = models.BooleanField(default=False)
-    external_response = models.JSONField(null=True, blank=True)
     user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -41,8 +84,121 @@ class Notification(Base):
         related_name="notifications",
     )
 
+    objects = NotificationManager()
+
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="notification_user_created_idx"
+            ),
+            models.Index(
+                fields=["user"],
+                condition=models.Q(is_read=False),
+                name="notification_unread_idx",
+            ),
+            # Pruning walks notifications from the oldest
+            models.Index(fields=["created_at"], name="notification_created_idx"),
+            models.Index(
+                fields=["external_response_record"],
+                condition=models.Q(external_response_record__isnull=False),
+                name="notification_response_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        is_created = self._state.adding
+        super().save(*args, **kwargs)
+        if is_created:
+            Notification.objects.count_unread_on_commit([self])
 
     def __str__(self) -> str:
         return f"{self.type} - {self.message}"
+
+
+class NotificationOutboxManager(models.Manager):
+    def add_pushes(self, pushes: list[dict]) -> None:
+        """Add pushes of `type`, `title`, `message` and `user_id` to the outbox"""
+        self.bulk_create(
+            [
+                NotificationOutbox(
+                    channel=NotificationChannels.PUSH.value,
+                    type=push["type"],
+                    title=push["title"],
+                    message=push["message"],
+                    recipient=str(push["user_id"]),
+                )
+                for push in pushes
+            ]
+        )
+
+    def add_sms(self, *, phone_number: str, type: str, message: str) -> None:
+        self.create(
+            channel=NotificationChannels.SMS.value,
+            type=type,
+            message=message,
+            recipient=str(phone_number),
+        )
+
+
+class NotificationOutbox(Base):
+    """
+    Notifications waiting to be sent.
+    They are written in the transaction of the change they notify about, so
+    nothing is sent for changes that are rolled back. A dispatcher sends them
+    in batches once the transaction commits.
+    """
+
+    channel = models.CharField(
+        max_length=255,
+        choices=[(channel, channel.value) for channel in NotificationChannels],
+    )
+    type = models.CharField(
+        max_length=255, choices=[(type, type.value) for type in NotificationTypes]
+    )
+    title = models.CharField(max_length=255, blank=True, default="")
+    message = models.TextField()
+    recipient = models.CharField(
+        max_length=255,
+        help_text="The user id of pushes or the phone number of SMS.",
+    )
+    status = models.CharField(
+        max_length=255,
+        choices=[(status, status.value) for status in OutboxStatuses],
+        default=OutboxStatuses.PENDING.value,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_by = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="The dispatch sending the notification.",
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = NotificationOutboxManager()
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["channel", "created_at"],
+                condition=models.Q(status=OutboxStatuses.PENDING.value),
+                name="outbox_pending_idx",
+            ),
+            models.Index(
+                fields=["claimed_at"],
+                condition=models.Q(status=OutboxStatuses.SENDING.value),
+                name="outbox_sending_idx",
+            ),
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(
+                    status__in=[OutboxStatuses.SENT.value, OutboxStatuses.FAILED.value]
+                ),
+                name="outbox_done_created_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.channel} to {self.recipient} - {self.status}"
@@ -0,0 +1,215 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import groupby
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from commons.constants import SMS_PROVIDERS
+from commons.raw_logger import logger
+from notifications.constants import NotificationChannels, OutboxStatuses
+from notifications.models import NotificationOutbox
+from notifications.push import OneSignal
+from notifications.routing import SmsRouter
+
+
+class DispatchNotifications:
+    """
+    Send the notifications of the outbox in batches.
+    Pending notifications are claimed in a short transaction with SKIP LOCKED,
+    which marks them SENDING with the id of the dispatch, so that concurrent
+    dispatchers never send the same notification. They are sent outside of any
+    transaction and their results are recorded in another one, so a failure
+    after sending never sends them again. Notifications claimed by a dispatch
+    that died before recording them are claimed again after
+    NOTIFICATIONS_OUTBOX_CLAIM_TIMEOUT.
+    Pushes with the same title and message are sent to all their users in one
+    OneSignal call, SMS are sent from a pool of threads. Failed notifications
+    are retried by the next dispatch.
+    """
+
+    def scheduled_key(self, channel: str) -> str:
+        return f"outbox_dispatch_scheduled:{channel}"
+
+    def claim_dispatch(self, channel: str, timeout: int) -> bool:
+        """Returns True if no dispatch of the channel is scheduled yet"""
+        return cache.add(self.scheduled_key(channel), 1, timeout=timeout)
+
+    def dispatch(
+        self, *, channel: str | None = None, batch_size: int | None = None
+    ) -> int:
+        """Send the pending notifications and return the number sent"""
+        if channel:
+            # Notifications added from now on schedule the next dispatch
+            cache.delete(self.scheduled_key(channel))
+
+        self.reclaim_stuck()
+        batch_size = batch_size or settings.NOTIFICATIONS_OUTBOX_BATCH_SIZE
+        sent_count = 0
+        # Failed notifications wait for the next dispatch
+        attempted_ids: set = set()
+        while notifications := self.dispatch_batch(
+            channel, batch_size, attempted_ids=attempted_ids
+        ):
+            attempted_ids.update(notification.id for notification in notifications)
+            sent_count += sum(
+                notification.status == OutboxStatuses.SENT
+                for notification in notifications
+            )
+
+        logger.info(f"Dispatched {sent_count} notifications.")
+        return sent_count
+
+    def dispatch_batch(
+        self, channel: str | None, batch_size: int, *, attempted_ids: set
+    ) -> list[NotificationOutbox]:
+        """Send a batch of pending notifications and return them"""
+        notifications = self.claim_batch(
+            channel, batch_size, attempted_ids=attempted_ids
+        )
+        if not notifications:
+            return []
+
+        self.send_pushes(
+            [n for n in notifications if n.channel == NotificationChannels.PUSH]
+        )
+        self.send_sms(
+            [n for n in notifications if n.channel == NotificationChannels.SMS]
+        )
+        self.record_results(notifications)
+        return notifications
+
+    def claim_batch(
+        self, channel: str | None, batch_size: int, *, attempted_ids: set
+    ) -> list[NotificationOutbox]:
+        with transaction.atomic():
+            notifications = NotificationOutbox.objects.select_for_update(
+                skip_locked=True
+            ).filter(status=OutboxStatuses.PENDING.value)
+            if channel:
+                notifications = notifications.filter(channel=channel)
+            notifications = list(
+                notifications.exclude(id__in=attempted_ids).order_by("created_at")[
+                    :batch_size
+                ]
+            )
+
+            claimed_by, now = uuid4().hex, datetime.now()
+            for notification in notifications:
+                notification.status = OutboxStatuses.SENDING.value
+                notification.claimed_by = claimed_by
+                notification.claimed_at = now
+                notification.attempts += 1
+                notification.updated_at = now
+            NotificationOutbox.objects.bulk_update(
+                notifications,
+                ["status", "claimed_by", "claimed_at", "attempts", "updated_at"],
+            )
+
+        return notifications
+
+    def record_results(self, notifications: list[NotificationOutbox]) -> None:
+        """Save the statuses of the notifications still claimed by their dispatch"""
+        with transaction.atomic():
+            claimed_ids = set(
+                NotificationOutbox.objects.select_for_update()
+                .filter(
+                    id__in=[notification.id for notification in notifications],
+                    status=OutboxStatuses.SENDING.value,
+                    claimed_by=notifications[0].claimed_by,
+                )
+                .values_list("id", flat=True)
+            )
+            if len(claimed_ids) < len(notifications):
+                logger.warning(
+                    f"{len(notifications) - len(claimed_ids)} notifications were "
+                    "claimed again before their results were recorded."
+                )
+
+            now = datetime.now()
+            claimed = [n for n in notifications if n.id in claimed_ids]
+            for notification in claimed:
+                notification.updated_at = now
+            NotificationOutbox.objects.bulk_update(claimed, ["status", "updated_at"])
+
+    def reclaim_stuck(self) -> int:
+        """Release the notifications of dispatches that never recorded their
+        results, they may have been sent. Returns the number released."""
+        released = NotificationOutbox.objects.filter(
+            status=OutboxStatuses.SENDING.value,
+            claimed_at__lt=datetime.now()
+            - timedelta(seconds=settings.NOTIFICATIONS_OUTBOX_CLAIM_TIMEOUT),
+        ).update(
+            status=Case(
+                When(
+                    attempts__gte=settings.NOTIFICATIONS_OUTBOX_MAX_ATTEMPTS,
+                    then=Value(OutboxStatuses.FAILED.value),
+                ),
+                default=Value(OutboxStatuses.PENDING.value),
+            ),
+            updated_at=datetime.now(),
+        )
+        if released:
+            logger.warning(f"Released {released} notifications stuck in sending.")
+
+        return released
+
+    def mark_failed(self, notification: NotificationOutbox) -> None:
+        """Retry the notification unless it ran out of attempts"""
+        if notification.attempts >= settings.NOTIFICATIONS_OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Failed to send {notification}, giving up.")
+            notification.status = OutboxStatuses.FAILED.value
+        else:
+            notification.status = OutboxStatuses.PENDING.value
+
+    def send_pushes(self, notifications: list[NotificationOutbox]) -> None:
+        def group_key(notification: NotificationOutbox) -> tuple:
+            return notification.type, notification.title, notification.message
+
+        for (type, title, message), group in groupby(
+            sorted(notifications, key=group_key), key=group_key
+        ):
+            pushes = list(group)
+            failed_user_ids = set(
+                OneSignal.send_batch(
+                    type=type,
+                    title=title,
+                    message=message,
+                    user_ids=[push.recipient for push in pushes],
+                )
+            )
+            # The responses are saved with the notifications of the users
+            for push in pushes:
+                if push.recipient in failed_user_ids:
+                    self.mark_failed(push)
+                else:
+                    push.status = OutboxStatuses.SENT.value
+
+    def send_sms(self, notifications: list[NotificationOutbox]) -> None:
+        if not notifications:
+            return
+
+        def send(notification: NotificationOutbox) -> bool:
+            return SmsRouter.send(
+                SMS_PROVIDERS,
+                lambda provider: provider.send_sms(
+                    notification.recipient, notification.type, notification.message
+                ),
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=settings.NOTIFICATIONS_SMS_CONCURRENCY
+        ) as executor:
+            results = executor.map(send, notifications)
+
+            for notification, sent in zip(notifications, results):
+                if sent:
+                    notification.status = OutboxStatuses.SENT.value
+                else:
+                    self.mark_failed(notification)
+
+
+NotificationDispatcher = DispatchNotifications()
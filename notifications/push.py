@@ -1,59 +1,77 @@
-import requests
+from dataclasses import dataclass
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import status
 
+from commons.models import ExternalResponse
 from commons.raw_logger import logger
 from notifications.constants import NotificationChannels, NotificationProviders
 from notifications.models import Notification
+from notifications.utils import ProviderSession
 
 User = get_user_model()
 
 
+@dataclass(frozen=True)
+class OneSignalRequest:
+    """Push to send in one OneSignal call. Every call builds its own."""
+
+    title: str
+    message: str
+    user_ids: tuple[str, ...]
+
+    @property
+    def payload(self) -> dict:
+        return {
+            "app_id": settings.ONESIGNAL_APP_ID,
+            "contents": {"en": self.message},
+            "headings": {"en": self.title},
+            "name": "Majibu In-APP Push",
+            "include_external_user_ids": list(self.user_ids),
+            "target_channel": "push",
+            "small_icon": "ic_launcher",
+        }
+
+
 class OneSignalPush:
+    """
+    Send pushes through OneSignal.
+    Nothing about a push is kept on the instance, so the module singleton can
+    be shared by the threads of a worker.
+    """
+
+    max_recipients = 2000  # External user ids OneSignal accepts per call
+
     def __init__(self) -> None:
         self.url = "https://api.onesignal.com/notifications?c=push"
-        self.message = ""
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Basic {settings.ONESIGNAL_API_KEY}",
         }
-        self.user = None
-        self.push_notification_name = "Majibu In-APP Push"
-        self.payload = {
-            "app_id": settings.ONESIGNAL_APP_ID,
-            "contents": {
-                "en": "",
-            },
-            "headings": {"en": ""},
-            "name": "Majibu In-APP Push",
-            "include_external_user_ids": [],
-            "target_channel": "push",
-            "small_icon": "ic_launcher",
-        }
+        self.http = ProviderSession()
 
     def send_push(self, *, type: str, title: str, message: str, user_id: str) -> bool:
         """A code snippet in the app identifies users and sends their user_id to Onesignal.
         We then use the user_id to specify who the message is being sent to."""
         logger.info(f"Sending PUSH notification to {user_id}")
-        self.payload["contents"] = {"en": message}
-        self.payload["headings"] = {"en": title}
-        self.payload["include_external_user_ids"] = [str(user_id)]
+        push_request = OneSignalRequest(
+            title=title, message=message, user_ids=(str(user_id),)
+        )
 
         try:
-            user = User.objects.filter(id=user_id).first()
-            self.user = user if user else self.user
-
             notification_obj = Notification.objects.create(
                 type=type,
                 message=message,
                 channel=NotificationChannels.PUSH.value,
                 provider=NotificationProviders.ONESIGNAL.value,
                 receiving_party=user_id,
-                user=self.user,
+                user=User.objects.filter(id=user_id).first(),
             )
 
-            response = requests.post(self.url, json=self.payload, headers=self.headers)
+            response = self.http.post(
+                self.url, json=push_request.payload, headers=self.headers
+            )
 
             notification_obj.external_response = response.json()
             notification_obj.save()
@@ -68,5 +86,59 @@ class OneSignalPush:
             logger.error(f"Exception occured while sending push to {user_id}: {e}")
             return False
 
+    def send_batch(
+        self, *, type: str, title: str, message: str, user_ids: list[str]
+    ) -> list[str]:
+        """Send the same push to many users and return the users of the failed calls.
+        The notification of every user of a successful call is saved with one query,
+        so that failed calls can be retried without saving them twice."""
+        failed_user_ids: list[str] = []
+        for start in range(0, len(user_ids), self.max_recipients):
+            recipients = user_ids[start : start + self.max_recipients]
+            logger.info(f"Sending PUSH notification to {len(recipients)} users")
+            push_request = OneSignalRequest(
+                title=title,
+                message=message,
+                user_ids=tuple(dict.fromkeys(recipients)),
+            )
+
+            try:
+                response = self.http.post(
+                    self.url, json=push_request.payload, headers=self.headers
+                )
+            except Exception as e:
+                logger.error(f"Exception occured while sending push batch: {e}")
+                failed_user_ids.extend(recipients)
+                continue
+
+            if response.status_code != status.HTTP_200_OK:
+                logger.error(f"Failed to send push batch: {response.text}")
+                failed_user_ids.extend(recipients)
+                continue
+
+            external_response = ExternalResponse.objects.create(payload=response.json())
+            existing_user_ids = {
+                str(user_id)
+                for user_id in User.objects.filter(id__in=recipients).values_list(
+                    "id", flat=True
+                )
+            }
+            Notification.objects.bulk_create(
+                [
+                    Notification(
+                        type=type,
+                        message=message,
+                        channel=NotificationChannels.PUSH.value,
+                        provider=NotificationProviders.ONESIGNAL.value,
+                        receiving_party=user_id,
+                        user_id=user_id if user_id in existing_user_ids else None,
+                        external_response_record=external_response,
+                    )
+                    for user_id in recipients
+                ]
+            )
+
+        return failed_user_ids
+
 
 OneSignal = OneSignalPush()
@@ -0,0 +1,129 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import reduce
+from operator import or_
+from time import sleep
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from commons.models import ExternalResponse
+from commons.raw_logger import logger
+from notifications.constants import OutboxStatuses
+from notifications.models import Notification, NotificationOutbox
+from notifications.unread_cache import UnreadCounter
+
+
+class PruneNotifications:
+    """
+    Delete notifications older than NOTIFICATIONS_RETENTION_DAYS and sent or
+    failed outbox notifications older than NOTIFICATIONS_OUTBOX_RETENTION_DAYS.
+    Rows are deleted in small batches, each in its own transaction, skipping
+    rows locked by live requests so that the tables stay online while pruning.
+    Batches walk the created_at indexes from the oldest row, each starting
+    after the rows deleted by the previous one. Provider responses of the
+    deleted notifications go with them once no other row references them.
+    """
+
+    def get_expired_rows(self, now: datetime) -> dict:
+        """Rows past their retention, by model"""
+        return {
+            Notification: Notification.objects.filter(
+                created_at__lt=now
+                - timedelta(days=settings.NOTIFICATIONS_RETENTION_DAYS)
+            ),
+            # Pending and sending notifications are still waiting to be sent
+            NotificationOutbox: NotificationOutbox.objects.filter(
+                created_at__lt=now
+                - timedelta(days=settings.NOTIFICATIONS_OUTBOX_RETENTION_DAYS),
+                status__in=[OutboxStatuses.SENT.value, OutboxStatuses.FAILED.value],
+            ),
+        }
+
+    def prune(self, *, batch_size: int = 1000, pause: float = 0.0) -> dict:
+        """Delete all the expired rows and return the number deleted by model.
+        Pause for `pause` seconds between batches to ease the load on the database."""
+        pruned = {ExternalResponse._meta.label: 0}
+        for model, queryset in self.get_expired_rows(datetime.now()).items():
+            pruned[model._meta.label] = 0
+            remaining = queryset
+            while last_created_at := self.prune_batch(
+                remaining, batch_size=batch_size, pruned=pruned
+            ):
+                remaining = queryset.filter(created_at__gte=last_created_at)
+                sleep(pause)
+
+            logger.info(f"Pruned {pruned[model._meta.label]} {model._meta.label}.")
+
+        logger.info(f"Pruned {pruned[ExternalResponse._meta.label]} responses.")
+        return pruned
+
+    def prune_batch(
+        self, queryset, *, batch_size: int, pruned: dict
+    ) -> datetime | None:
+        """Delete the oldest rows, add them to `pruned` and return the creation
+        time of the last one, None once there are none left"""
+        model = queryset.model
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(skip_locked=True)
+                .order_by("created_at")
+                .values_list("id", "created_at")[:batch_size]
+            )
+            if not rows:
+                return None
+
+            ids = [id for id, _ in rows]
+            response_ids: set = set()
+            if model is Notification:
+                self.uncount_unread_on_commit(ids)
+                response_ids = set(
+                    Notification.objects.filter(
+                        id__in=ids, external_response_record__isnull=False
+                    ).values_list("external_response_record", flat=True)
+                )
+
+            model.objects.filter(id__in=ids).delete()
+            pruned[model._meta.label] += len(rows)
+            if response_ids:
+                pruned[ExternalResponse._meta.label] += self.prune_responses(
+                    response_ids
+                )
+
+        return rows[-1][1]
+
+    def prune_responses(self, response_ids: set) -> int:
+        """Delete the responses that no row references anymore.
+        Only responses of pruned notifications are checked: responses of
+        archived transactions are still referenced by the archive."""
+        references = [
+            Exists(
+                relation.related_model._base_manager.filter(
+                    **{relation.field.name: OuterRef("pk")}
+                )
+            )
+            for relation in ExternalResponse._meta.get_fields(include_hidden=True)
+            if relation.one_to_many
+        ]
+        deleted, _ = (
+            ExternalResponse.objects.filter(id__in=response_ids)
+            .exclude(reduce(or_, references))
+            .delete()
+        )
+        return deleted
+
+    def uncount_unread_on_commit(self, notification_ids: list) -> None:
+        """Remove the unread notifications from the cached counts of their users"""
+        counts = Counter(
+            str(user_id)
+            for user_id in Notification.objects.filter(
+                id__in=notification_ids, is_read=False, user__isnull=False
+            ).values_list("user_id", flat=True)
+        )
+        if counts:
+            decrements = {user_id: -count for user_id, count in counts.items()}
+            transaction.on_commit(lambda: UnreadCounter.increment_many(decrements))
+
+
+NotificationsPruner = PruneNotifications()
@@ -2,6 +2,7 @@ from django.urls import path
 
 from notifications.views.notifications import (
     MarkNotificationsReadView,
+    NotificationCursorListView,
     NotificationListView,
     UnreadNotificationCountView,
 )
@@ -14,6 +15,11 @@ urlpatterns = [
         NotificationListView.as_view(),
         name="notification-list",
     ),
+    path(
+        "notifications/cursor/",
+        NotificationCursorListView.as_view(),
+        name="notification-cursor-list",
+    ),
     path(
         "notifications/count-unread/",
         UnreadNotificationCountView.as_view(),
@@ -0,0 +1,124 @@
+from time import perf_counter
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from commons.metrics import Metrics
+from commons.raw_logger import logger
+
+
+class RouteProviders:
+    """
+    Send through the healthiest provider first.
+    The outcome and latency of the last calls to every provider are kept in
+    Redis so that all the workers share them. Providers are tried in order of
+    expected seconds per delivered message.
+
+    A provider failing SMS_CIRCUIT_FAILURE_THRESHOLD times in a row has its
+    circuit opened for SMS_CIRCUIT_OPEN_SECONDS. Open providers are only tried
+    once all the others failed. Their calls are forgotten, so the first call
+    after that tries them first: another failure opens the circuit again, a
+    success closes it.
+    """
+
+    def __init__(self, channel: str) -> None:
+        self.channel = channel
+
+    def key(self, provider, suffix: str) -> str:
+        return cache.make_and_validate_key(
+            f"routing:{self.channel}:{provider.name}:{suffix}"
+        )
+
+    def get_client(self, key: str, *, write: bool = False):
+        return cache._cache.get_client(key, write=write)  # type: ignore
+
+    def order(self, providers: list) -> list:
+        """Closed circuits first, each group healthiest first"""
+        if not providers:
+            return providers
+
+        try:
+            pipeline = self.get_client(self.key(providers[0], "outcomes")).pipeline()
+            for provider in providers:
+                pipeline.lrange(self.key(provider, "outcomes"), 0, -1)
+                pipeline.exists(self.key(provider, "open"))
+            results = pipeline.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to read {self.channel} providers health: {e}")
+            return providers
+
+        ranks = {}
+        for index, provider in enumerate(providers):
+            outcomes, is_open = results[2 * index], results[2 * index + 1]
+            ranks[provider.name] = (bool(is_open), self.expected_seconds(outcomes))
+
+        return sorted(providers, key=lambda provider: ranks[provider.name])
+
+    def expected_seconds(self, outcomes: list) -> float:
+        """Mean call latency over the success rate of the calls.
+        Providers without calls yet are tried first."""
+        if not outcomes:
+            return 0.0
+
+        calls = [outcome.decode().split(":") for outcome in outcomes]
+        success_rate = sum(succeeded == "1" for succeeded, _ in calls) / len(calls)
+        latency = sum(float(seconds) for _, seconds in calls) / len(calls)
+        return latency / max(success_rate, 0.01)
+
+    def record(self, provider, *, succeeded: bool, seconds: float) -> None:
+        outcomes_key = self.key(provider, "outcomes")
+        failures_key = self.key(provider, "failures")
+        try:
+            client = self.get_client(outcomes_key, write=True)
+            pipeline = client.pipeline()
+            pipeline.lpush(outcomes_key, f"{int(succeeded)}:{seconds:.4f}")
+            pipeline.ltrim(outcomes_key, 0, settings.SMS_ROUTING_WINDOW - 1)
+            if succeeded:
+                pipeline.delete(failures_key)
+            else:
+                pipeline.incr(failures_key)
+            results = pipeline.execute()
+
+            if not succeeded and results[-1] >= settings.SMS_CIRCUIT_FAILURE_THRESHOLD:
+                logger.warning(f"Opening the circuit of {provider.name}")
+                pipeline = client.pipeline()
+                # Ranked like a new provider once the circuit expires
+                pipeline.delete(outcomes_key)
+                pipeline.set(
+                    self.key(provider, "open"),
+                    1,
+                    px=int(settings.SMS_CIRCUIT_OPEN_SECONDS * 1000),
+                )
+                pipeline.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to record {provider.name} health: {e}")
+
+        Metrics.observe(
+            f"{self.channel}_provider_seconds",
+            seconds,
+            provider=provider.name,
+            outcome="sent" if succeeded else "failed",
+        )
+
+    def send(self, providers: list, send: Callable) -> bool:
+        """Call `send` with one provider after the other until one succeeds"""
+        for provider in self.order(providers):
+            started_at = perf_counter()
+            try:
+                succeeded = bool(send(provider))
+            except Exception as e:
+                logger.error(f"{provider.name} failed to send {self.channel}: {e}")
+                succeeded = False
+
+            self.record(
+                provider, succeeded=succeeded, seconds=perf_counter() - started_at
+            )
+            if succeeded:
+                return True
+
+        return False
+
+
+SmsRouter = RouteProviders("sms")
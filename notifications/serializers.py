@@ -14,7 +14,7 @@ class NotificationListSerializer(serializers.ModelSerializer):
             "type",
             "provider",
             "receiving_party",
-            "external_response",
+            "external_response_record",
             "channel",
         ]
 
@@ -1,39 +1,61 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 
-import requests
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from phonenumbers import parse
 from rest_framework import status
 
 from commons.raw_logger import logger
+from notifications.constants import NotificationProviders
+from notifications.utils import ProviderSession
 
 User = get_user_model()
 
 
 class SMSProvider(ABC):
+    name: str
+
     @abstractmethod
     def send_sms(self, phone_number: str, type: str, message: str) -> bool:
         pass
 
 
-class HostPinnacle(SMSProvider):
-    def __init__(self) -> None:
-        self.url = "https://smsportal.hostpinnacle.co.ke/SMSApi/send"
-        self.user = None
-        self.headers: dict[str, str] = {}
-        self.sms_payload = {
+@dataclass(frozen=True)
+class HostPinnacleRequest:
+    """SMS to send in one HostPinnacle call. Every call builds its own."""
+
+    mobile: str
+    message: str
+
+    @property
+    def payload(self) -> dict:
+        return {
             "userid": settings.HOST_PINNACLE_USER_ID,
             "password": settings.HOST_PINNACLE_PASSWORD,
-            "mobile": "",
+            "mobile": self.mobile,
             "senderid": settings.HOST_PINNACLE_SENDER_ID,
-            "msg": "",
+            "msg": self.message,
             "sendMethod": "quick",
             "msgType": "text",
             "output": "json",
             "duplicatecheck": "true",
         }
-        self.files: list = []
+
+
+class HostPinnacle(SMSProvider):
+    """
+    Send SMS through HostPinnacle.
+    Nothing about an SMS is kept on the instance, so the module singleton can
+    be shared by the threads of a worker.
+    """
+
+    name = NotificationProviders.HOSTPINNACLESMS.value
+
+    def __init__(self) -> None:
+        self.url = "https://smsportal.hostpinnacle.co.ke/SMSApi/send"
+        self.headers: dict[str, str] = {}
+        self.http = ProviderSession()
 
     def format_phone_number(self, phone) -> str:
         """
@@ -45,11 +67,11 @@ class HostPinnacle(SMSProvider):
 
     def send_sms(self, phone_number: str, type: str, message: str) -> bool:
         logger.info(f"Sending {type} SMS to {phone_number}...")
-        self.sms_payload["mobile"] = self.format_phone_number(phone_number)
-        self.sms_payload["msg"] = message
 
         try:
-            self.user = User.objects.filter(phone_number=phone_number).first()
+            sms_request = HostPinnacleRequest(
+                mobile=self.format_phone_number(phone_number), message=message
+            )
 
             # TODO: Should SMS be saved in DB and why? What about OTPs? What about marketing messages?
             # Right now SMS messages are so few, they would not make much of a difference
@@ -60,11 +82,11 @@ class HostPinnacle(SMSProvider):
             #     provider=NotificationProviders.HOSTPINNACLESMS.value,
             #     is_visible_in_app=False,
             #     receiving_party=phone_number,
-            #     user=self.user,
+            #     user=User.objects.filter(phone_number=phone_number).first(),
             # )
 
-            response = requests.post(
-                self.url, headers=self.headers, data=self.sms_payload, files=self.files
+            response = self.http.post(
+                self.url, headers=self.headers, data=sms_request.payload
             )
 
             # notification_obj.external_response = response.json()
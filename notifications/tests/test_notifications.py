@@ -1,3 +1,6 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from rest_framework import status
 from rest_framework.reverse import reverse
 
@@ -67,6 +70,36 @@ class NotificationListViewTests(BaseUserAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 2)
 
+    def test_notifications_are_paginated_by_page_number(self) -> None:
+        response = self.client.get(self.list_url, {"page_size": 2, "page": 2})
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(
+            [result["id"] for result in response.data["results"]],
+            [str(self.notification1.id)],
+        )
+        self.assertIsNotNone(response.data["previous"])
+
+    def test_notifications_are_paginated_newest_first_by_cursor(self) -> None:
+        # Creation time orders the rows whatever their ids
+        Notification.objects.filter(id=self.notification1.id).update(
+            created_at=self.notification3.created_at + timedelta(seconds=1)
+        )
+        cursor_url = reverse("notifications:notification-cursor-list")
+
+        response = self.client.get(cursor_url, {"page_size": 2})
+        self.assertNotIn("count", response.data)
+        self.assertEqual(
+            [result["id"] for result in response.data["results"]],
+            [str(self.notification1.id), str(self.notification3.id)],
+        )
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [result["id"] for result in response.data["results"]],
+            [str(self.notification2.id)],
+        )
+        self.assertIsNone(response.data["next"])
+
     def test_expected_fields_exist_in_response(self) -> None:
         self.force_authenticate_user()
         response = self.client.get(self.list_url)
@@ -75,6 +108,9 @@ class NotificationListViewTests(BaseUserAPITestCase):
         self.assertIn("id", result_in)
         self.assertIn("message", result_in)
         self.assertIn("is_read", result_in)
+        # Provider payloads are not part of the list
+        self.assertNotIn("external_response", result_in)
+        self.assertNotIn("external_response_record", result_in)
 
     def test_unread_notifications_count_is_correct(self) -> None:
         self.force_authenticate_user()
@@ -91,3 +127,105 @@ class NotificationListViewTests(BaseUserAPITestCase):
             0, Notification.objects.filter(is_read=False, user=self.user).count()
         )
         self.assertEqual(2, Notification.objects.filter(user=self.user).count())
+
+
+class UnreadNotificationCountTests(BaseUserAPITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = self.create_user()
+        self.force_authenticate_user()
+        self.count_url = reverse("notifications:count-unread")
+        self.create_notification()
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def create_notification(self) -> Notification:
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(
+                type=NotificationTypes.SESSION.value,
+                message="You won!",
+                channel=NotificationChannels.PUSH.value,
+                provider=NotificationProviders.ONESIGNAL.value,
+                receiving_party=str(self.user.id),
+                user=self.user,
+            )
+
+    def get_count(self) -> int:
+        return self.client.get(self.count_url).data["count"]
+
+    def test_count_is_served_from_the_cache(self) -> None:
+        self.assertEqual(self.get_count(), 1)
+
+        # Bypasses the cache, so the cached count is not rebuilt
+        Notification.objects.filter(user=self.user).update(is_read=True)
+
+        self.assertEqual(self.get_count(), 1)
+
+    def test_created_notifications_increment_the_count(self) -> None:
+        self.assertEqual(self.get_count(), 1)
+
+        self.create_notification()
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.bulk_create(
+                [
+                    Notification(
+                        type=NotificationTypes.SESSION.value,
+                        message="You won!",
+                        channel=NotificationChannels.PUSH.value,
+                        provider=NotificationProviders.ONESIGNAL.value,
+                        user=self.user,
+                    )
+                    for _ in range(3)
+                ]
+            )
+
+        self.assertEqual(self.get_count(), 5)
+        self.assertEqual(
+            Notification.objects.filter(user=self.user, is_read=False).count(), 5
+        )
+
+    def test_marking_notifications_read_resets_the_count(self) -> None:
+        self.assertEqual(self.get_count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse("notifications:update-read"), data={"is_read": True}
+            )
+
+        self.assertEqual(self.get_count(), 0)
+
+    def test_unchanged_count_is_not_modified(self) -> None:
+        response = self.client.get(self.count_url)
+        etag = response["ETag"]
+
+        response = self.client.get(self.count_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.content)
+
+        self.create_notification()
+        response = self.client.get(self.count_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_mark_read_only_writes_notifications_that_change(self) -> None:
+        read = self.create_notification()
+        Notification.objects.filter(id=read.id).update(is_read=True)
+        read.refresh_from_db()
+        self.assertEqual(self.get_count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            changed_count = Notification.objects.mark_read(self.user, is_read=True)
+
+        self.assertEqual(changed_count, 1)
+        self.assertEqual(
+            Notification.objects.get(id=read.id).updated_at, read.updated_at
+        )
+        self.assertEqual(self.get_count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            changed_count = Notification.objects.mark_read(self.user, is_read=False)
+
+        self.assertEqual(changed_count, 2)
+        self.assertEqual(self.get_count(), 2)
@@ -0,0 +1,253 @@
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.test import TransactionTestCase, override_settings
+
+from commons.tasks import queue_pushes, queue_sms, send_push
+from commons.tests.base_tests import BaseUserAPITestCase, random_phone
+from notifications.constants import (
+    NotificationChannels,
+    NotificationTypes,
+    OutboxStatuses,
+    PushNotifications,
+)
+from notifications.models import Notification, NotificationOutbox
+from notifications.outbox import NotificationDispatcher
+from notifications.push import OneSignal
+from notifications.tests.test_routing import StubSMSProvider
+from users.models import User
+
+
+def mock_onesignal_post() -> patch:
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"id": "batch", "errors": []}
+    return patch.object(OneSignal.http, "post", return_value=mock_response)
+
+
+def session_pushes(users: list, message: str) -> list[dict]:
+    return [
+        {
+            "type": NotificationTypes.SESSION.value,
+            "title": PushNotifications.SESSION_RESULTS.title,
+            "message": message,
+            "user_id": user.id,
+        }
+        for user in users
+    ]
+
+
+class NotificationDispatcherTestCase(BaseUserAPITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.users = [
+            User.objects.create_user(phone_number=random_phone(), password="pass1234")
+            for _ in range(10)
+        ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        patcher = mock_onesignal_post()
+        self.mock_post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def queue_otp(self) -> None:
+        queue_sms(
+            phone_number="+254703456789",
+            type=NotificationTypes.OTP.value,
+            message="Your OTP is 1234",
+        )
+
+    def test_identical_pushes_are_sent_in_one_call(self) -> None:
+        queue_pushes(session_pushes(self.users, "You won!"))
+        queue_pushes(session_pushes(self.users, "You lost."))
+
+        self.assertEqual(NotificationDispatcher.dispatch(batch_size=15), 20)
+
+        self.assertEqual(self.mock_post.call_count, 3)
+        self.assertEqual(Notification.objects.count(), 20)
+        self.assertFalse(
+            NotificationOutbox.objects.exclude(status=OutboxStatuses.SENT.value)
+        )
+
+    def test_pushes_of_rolled_back_transactions_are_never_sent(self) -> None:
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                queue_pushes(session_pushes(self.users, "You won!"))
+                raise ValueError("The payouts failed")
+
+        self.assertEqual(NotificationDispatcher.dispatch(), 0)
+        self.mock_post.assert_not_called()
+
+    def test_sms_are_sent_through_the_providers(self) -> None:
+        provider = StubSMSProvider("stub")
+        self.queue_otp()
+
+        with patch("notifications.outbox.SMS_PROVIDERS", [provider]):
+            self.assertEqual(
+                NotificationDispatcher.dispatch(channel=NotificationChannels.SMS.value),
+                1,
+            )
+
+        self.assertEqual(provider.calls_count, 1)
+        outbox = NotificationOutbox.objects.get()
+        self.assertEqual(outbox.status, OutboxStatuses.SENT.value)
+        self.assertEqual(outbox.attempts, 1)
+
+    @override_settings(NOTIFICATIONS_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_sms_are_retried_until_the_maximum_attempts(self) -> None:
+        provider = StubSMSProvider("stub", is_down=True)
+        self.queue_otp()
+
+        with patch("notifications.outbox.SMS_PROVIDERS", [provider]):
+            self.assertEqual(NotificationDispatcher.dispatch(), 0)
+            outbox = NotificationOutbox.objects.get()
+            self.assertEqual(outbox.status, OutboxStatuses.PENDING.value)
+
+            NotificationDispatcher.dispatch()
+            NotificationDispatcher.dispatch()
+
+        # Each dispatch tries a failed SMS once
+        self.assertEqual(provider.calls_count, 2)
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.status, OutboxStatuses.FAILED.value)
+
+    def test_failed_pushes_are_retried(self) -> None:
+        queue_pushes(session_pushes(self.users, "You won!"))
+        self.mock_post.return_value.status_code = 500
+
+        self.assertEqual(NotificationDispatcher.dispatch(), 0)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(
+            set(NotificationOutbox.objects.values_list("status", "attempts")),
+            {(OutboxStatuses.PENDING.value, 1)},
+        )
+
+        self.mock_post.return_value.status_code = 200
+        self.assertEqual(NotificationDispatcher.dispatch(), 10)
+        self.assertEqual(Notification.objects.count(), 10)
+
+    def test_sent_notifications_are_not_sent_again_when_recording_fails(self) -> None:
+        queue_pushes(session_pushes(self.users, "You won!"))
+
+        with patch.object(
+            NotificationDispatcher,
+            "record_results",
+            side_effect=DatabaseError("Connection lost"),
+        ):
+            with self.assertRaises(DatabaseError):
+                NotificationDispatcher.dispatch()
+
+        self.assertEqual(NotificationDispatcher.dispatch(), 0)
+        self.mock_post.assert_called_once()
+        self.assertFalse(
+            NotificationOutbox.objects.exclude(status=OutboxStatuses.SENDING.value)
+        )
+
+    @override_settings(NOTIFICATIONS_OUTBOX_CLAIM_TIMEOUT=60)
+    def test_notifications_stuck_in_sending_are_claimed_again(self) -> None:
+        queue_pushes(session_pushes(self.users[:2], "You won!"))
+        stuck, claimed = NotificationOutbox.objects.all()
+        NotificationOutbox.objects.filter(id=stuck.id).update(
+            status=OutboxStatuses.SENDING.value,
+            claimed_at=datetime.now() - timedelta(seconds=61),
+            attempts=1,
+        )
+        NotificationOutbox.objects.filter(id=claimed.id).update(
+            status=OutboxStatuses.SENDING.value,
+            claimed_at=datetime.now(),
+            attempts=1,
+        )
+
+        self.assertEqual(NotificationDispatcher.dispatch(), 1)
+
+        stuck.refresh_from_db()
+        claimed.refresh_from_db()
+        self.assertEqual(stuck.status, OutboxStatuses.SENT.value)
+        self.assertEqual(stuck.attempts, 2)
+        self.assertEqual(claimed.status, OutboxStatuses.SENDING.value)
+
+    @patch("commons.tasks.dispatch_notifications_task.apply_async")
+    def test_pushes_queued_before_the_outbox_are_added_to_it(self, _) -> None:
+        push = session_pushes(self.users[:1], "You won!")[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_push(**push)
+
+        self.assertEqual(NotificationDispatcher.dispatch(), 1)
+        self.assertEqual(Notification.objects.get().user, self.users[0])
+
+    @patch("commons.tasks.dispatch_notifications_task.apply_async")
+    def test_one_dispatch_is_scheduled_per_window(self, mock_apply_async) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_pushes(session_pushes(self.users, "You won!"))
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_pushes(session_pushes(self.users, "You lost."))
+        mock_apply_async.assert_called_once()
+
+        NotificationDispatcher.dispatch(channel=NotificationChannels.PUSH.value)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_pushes(session_pushes(self.users, "You won!"))
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+
+class ConcurrentDispatchersTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.users = [
+            User.objects.create_user(phone_number=random_phone(), password="pass1234")
+            for _ in range(5)
+        ]
+        patcher = mock_onesignal_post()
+        self.mock_post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    @patch("commons.tasks.dispatch_notifications_task.apply_async")
+    def test_notifications_are_sent_outside_of_transactions(self, _) -> None:
+        queue_pushes(session_pushes(self.users, "You won!"))
+        in_transaction = []
+        response = self.mock_post.return_value
+        self.mock_post.side_effect = lambda *args, **kwargs: (
+            in_transaction.append(connection.in_atomic_block) or response
+        )
+
+        self.assertEqual(NotificationDispatcher.dispatch(), 5)
+        self.assertEqual(in_transaction, [False])
+
+    @patch("commons.tasks.dispatch_notifications_task.apply_async")
+    def test_notifications_locked_by_a_dispatcher_are_skipped(self, _) -> None:
+        queue_pushes(session_pushes(self.users, "You won!"))
+        locked = NotificationOutbox.objects.order_by("created_at").first()
+        is_locked, release = threading.Event(), threading.Event()
+
+        def hold_lock() -> None:
+            try:
+                with transaction.atomic():
+                    NotificationOutbox.objects.select_for_update().get(id=locked.id)
+                    is_locked.set()
+                    release.wait(timeout=10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        is_locked.wait(timeout=10)
+        try:
+            self.assertEqual(NotificationDispatcher.dispatch(), 4)
+        finally:
+            release.set()
+            thread.join()
+
+        locked.refresh_from_db()
+        self.assertEqual(locked.status, OutboxStatuses.PENDING.value)
+        self.assertEqual(NotificationDispatcher.dispatch(), 1)
+        self.assertEqual(Notification.objects.count(), 5)
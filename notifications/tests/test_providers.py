@@ -1,10 +1,17 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from unittest.mock import Mock, patch
 
-from commons.tests.base_tests import BaseUserAPITestCase
+from django.db import connection
+from django.test import TransactionTestCase
+
+from commons.tests.base_tests import BaseUserAPITestCase, random_phone
 from notifications.constants import Messages, NotificationTypes, PushNotifications
 from notifications.models import Notification
-from notifications.push import OneSignal
+from notifications.push import OneSignal, OneSignalPush, OneSignalRequest
 from notifications.sms import HostPinnacleSMS
+from users.models import User
 
 
 class OneSignalPushTest(BaseUserAPITestCase):
@@ -12,7 +19,7 @@ class OneSignalPushTest(BaseUserAPITestCase):
         self.user = self.create_user()
         self.push_service = OneSignal
 
-    @patch("notifications.push.requests.post")
+    @patch.object(OneSignal.http, "post")
     def test_send_push_success(self, mock_post_request) -> None:
         # Arrange
         mock_response = Mock()
@@ -32,7 +39,11 @@ class OneSignalPushTest(BaseUserAPITestCase):
         self.assertTrue(result)
         mock_post_request.assert_called_once_with(
             self.push_service.url,
-            json=self.push_service.payload,
+            json=OneSignalRequest(
+                title=PushNotifications.WELCOME_MESSAGE.title,
+                message=PushNotifications.WELCOME_MESSAGE.message,
+                user_ids=(str(self.user.id),),
+            ).payload,
             headers=self.push_service.headers,
         )
 
@@ -41,7 +52,7 @@ class OneSignalPushTest(BaseUserAPITestCase):
             notification.message, PushNotifications.WELCOME_MESSAGE.message
         )
 
-    @patch("notifications.push.requests.post")
+    @patch.object(OneSignal.http, "post")
     def test_send_push_failure(self, mock_post_request) -> None:
         # Arrange
         mock_response = Mock()
@@ -61,7 +72,11 @@ class OneSignalPushTest(BaseUserAPITestCase):
         self.assertFalse(result)
         mock_post_request.assert_called_once_with(
             self.push_service.url,
-            json=self.push_service.payload,
+            json=OneSignalRequest(
+                title=PushNotifications.WELCOME_MESSAGE.title,
+                message=PushNotifications.WELCOME_MESSAGE.message,
+                user_ids=(str(self.user.id),),
+            ).payload,
             headers=self.push_service.headers,
         )
 
@@ -71,13 +86,73 @@ class OneSignalPushTest(BaseUserAPITestCase):
         )
 
 
+class OneSignalBatchTest(BaseUserAPITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.users = [
+            User.objects.create_user(phone_number=random_phone(), password="pass1234")
+            for _ in range(10)
+        ]
+
+    def setUp(self) -> None:
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"id": "batch", "errors": []}
+        patcher = patch.object(OneSignal.http, "post", return_value=mock_response)
+        self.mock_post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send_batch(self) -> list[str]:
+        return OneSignal.send_batch(
+            type=NotificationTypes.SESSION.value,
+            title=PushNotifications.SESSION_RESULTS.title,
+            message="You won!",
+            user_ids=[str(user.id) for user in self.users],
+        )
+
+    def test_batch_is_sent_in_one_call(self) -> None:
+        self.assertEqual(self.send_batch(), [])
+
+        self.mock_post.assert_called_once()
+        recipients = self.mock_post.call_args.kwargs["json"][
+            "include_external_user_ids"
+        ]
+        self.assertEqual(set(recipients), {str(user.id) for user in self.users})
+        notification = Notification.objects.get(user=self.users[0])
+        self.assertEqual(notification.external_response["id"], "batch")
+
+    @patch.object(OneSignalPush, "max_recipients", 4)
+    def test_recipients_are_split_into_calls_of_the_maximum_size(self) -> None:
+        self.assertEqual(self.send_batch(), [])
+        self.assertEqual(self.mock_post.call_count, 3)
+        self.assertEqual(Notification.objects.count(), 10)
+
+    @patch.object(OneSignalPush, "max_recipients", 4)
+    def test_recipients_of_failed_calls_are_returned(self) -> None:
+        failed_response = Mock(status_code=400, text="Bad request")
+        self.mock_post.side_effect = [
+            self.mock_post.return_value,
+            Exception("Connection reset"),
+            failed_response,
+        ]
+
+        failed_user_ids = self.send_batch()
+
+        self.assertEqual(failed_user_ids, [str(user.id) for user in self.users[4:]])
+        # Failed calls are retried, so only the sent notifications are saved
+        self.assertEqual(
+            set(Notification.objects.values_list("user_id", flat=True)),
+            {user.id for user in self.users[:4]},
+        )
+
+
 class HostPinnacleTest(BaseUserAPITestCase):
     def setUp(self) -> None:
         # Set up any necessary initial data
         self.user = self.create_user()
         self.sms_service = HostPinnacleSMS
 
-    @patch("notifications.sms.requests.post")
+    @patch.object(HostPinnacleSMS.http, "post")
     def test_send_sms_success(self, mock_post_request) -> None:
         # Arrange
         mock_response = Mock()
@@ -99,7 +174,7 @@ class HostPinnacleTest(BaseUserAPITestCase):
         # notification = Notification.objects.get(user=self.user)
         # self.assertEqual(notification.message, Messages.OTP_SMS.value)
 
-    @patch("notifications.sms.requests.post")
+    @patch.object(HostPinnacleSMS.http, "post")
     def test_send_sms_failure(self, mock_post_request) -> None:
         # Arrange
         mock_response = Mock()
@@ -121,7 +196,7 @@ class HostPinnacleTest(BaseUserAPITestCase):
         # notification = Notification.objects.get(user=self.user)
         # self.assertEqual(notification.message, Messages.OTP_SMS.value)
 
-    @patch("notifications.sms.requests.post")
+    @patch.object(HostPinnacleSMS.http, "post")
     def test_send_sms_exception(self, mock_post_request) -> None:
         # Arrange
         mock_post_request.side_effect = Exception("Network error")
@@ -138,3 +213,82 @@ class HostPinnacleTest(BaseUserAPITestCase):
         mock_post_request.assert_called_once()
         # notification = Notification.objects.get(user=self.user)
         # self.assertEqual(notification.message, Messages.OTP_SMS.value)
+
+
+class ConcurrentProvidersTest(TransactionTestCase):
+    """The provider singletons are shared by the threads of a worker"""
+
+    def setUp(self) -> None:
+        users = [User(phone_number=random_phone()) for _ in range(40)]
+        for user in users:
+            user.set_unusable_password()
+        self.users = User.objects.bulk_create(users)
+        self.in_flight_changes: list[dict] = []
+
+    def record_post(self, url: str, **kwargs) -> Mock:
+        payload = kwargs.get("json") or kwargs.get("data")
+        sent = deepcopy(payload)
+        time.sleep(0.005)  # Let other threads send in the meantime
+        if payload != sent:
+            self.in_flight_changes.append(sent)
+
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {"sent": sent}
+        return response
+
+    def run_in_threads(self, func, items: list) -> list:
+        def run(item):
+            try:
+                return func(item)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            return list(executor.map(run, items))
+
+    def test_pushes_are_not_crossed(self) -> None:
+        with patch.object(OneSignal.http, "post", side_effect=self.record_post):
+            results = self.run_in_threads(
+                lambda user: OneSignal.send_push(
+                    type=NotificationTypes.MARKETING.value,
+                    title=f"Title for {user.id}",
+                    message=f"Message for {user.id}",
+                    user_id=str(user.id),
+                ),
+                self.users,
+            )
+
+        self.assertTrue(all(results))
+        self.assertEqual(self.in_flight_changes, [])
+        for notification in Notification.objects.all():
+            sent = notification.external_response["sent"]
+            self.assertEqual(
+                notification.message, f"Message for {notification.user_id}"
+            )
+            self.assertEqual(
+                sent["include_external_user_ids"], [str(notification.user_id)]
+            )
+            self.assertEqual(sent["contents"]["en"], notification.message)
+            self.assertEqual(
+                sent["headings"]["en"], f"Title for {notification.user_id}"
+            )
+
+    def test_sms_are_not_crossed(self) -> None:
+        with patch.object(
+            HostPinnacleSMS.http, "post", side_effect=self.record_post
+        ) as mock_post:
+            results = self.run_in_threads(
+                lambda user: HostPinnacleSMS.send_sms(
+                    phone_number=str(user.phone_number),
+                    type=NotificationTypes.OTP.value,
+                    message=f"Code for {user.phone_number}",
+                ),
+                self.users,
+            )
+
+        self.assertTrue(all(results))
+        self.assertEqual(self.in_flight_changes, [])
+        for call in mock_post.call_args_list:
+            payload = call.kwargs["data"]
+            self.assertEqual(payload["msg"], f"Code for +{payload['mobile']}")
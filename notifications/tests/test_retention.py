@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from commons.models import ExternalResponse
+from commons.tests.base_tests import BaseUserAPITestCase
+from notifications.constants import (
+    NotificationChannels,
+    NotificationProviders,
+    NotificationTypes,
+    OutboxStatuses,
+)
+from notifications.models import Notification, NotificationOutbox
+from notifications.retention import NotificationsPruner
+
+
+@override_settings(
+    NOTIFICATIONS_RETENTION_DAYS=90, NOTIFICATIONS_OUTBOX_RETENTION_DAYS=7
+)
+class NotificationsPrunerTestCase(BaseUserAPITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = self.create_user()
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def create_notifications(
+        self, count: int, *, days_old: int, response: ExternalResponse | None = None
+    ) -> None:
+        notifications = Notification.objects.bulk_create(
+            [
+                Notification(
+                    type=NotificationTypes.SESSION.value,
+                    message="You won!",
+                    channel=NotificationChannels.PUSH.value,
+                    provider=NotificationProviders.ONESIGNAL.value,
+                    user=self.user,
+                    external_response_record=response,
+                )
+                for _ in range(count)
+            ]
+        )
+        Notification.objects.filter(
+            id__in=[notification.id for notification in notifications]
+        ).update(created_at=datetime.now() - timedelta(days=days_old))
+
+    def test_expired_notifications_are_deleted_in_batches(self) -> None:
+        self.create_notifications(5, days_old=100)
+        self.create_notifications(2, days_old=10)
+
+        pruned = NotificationsPruner.prune(batch_size=2)
+
+        self.assertEqual(pruned["notifications.Notification"], 5)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_pruned_unread_notifications_leave_the_cached_count(self) -> None:
+        self.create_notifications(3, days_old=100)
+        self.create_notifications(1, days_old=10)
+        self.assertEqual(Notification.objects.get_unread_count(self.user), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationsPruner.prune()
+
+        self.assertEqual(Notification.objects.get_unread_count(self.user), 1)
+
+    def test_only_sent_outbox_notifications_are_deleted(self) -> None:
+        for status in OutboxStatuses:
+            NotificationOutbox.objects.create(
+                channel=NotificationChannels.SMS.value,
+                type=NotificationTypes.OTP.value,
+                message="Your OTP is 1234",
+                recipient="+254703456789",
+                status=status.value,
+            )
+        NotificationOutbox.objects.update(created_at=datetime.now() - timedelta(days=8))
+
+        pruned = NotificationsPruner.prune()
+
+        self.assertEqual(pruned["notifications.NotificationOutbox"], 2)
+        self.assertEqual(
+            set(NotificationOutbox.objects.values_list("status", flat=True)),
+            {OutboxStatuses.PENDING.value, OutboxStatuses.SENDING.value},
+        )
+
+    def test_unreferenced_responses_are_pruned_with_their_notifications(self) -> None:
+        pruned_response = ExternalResponse.objects.create(payload={"id": "old"})
+        kept_response = ExternalResponse.objects.create(payload={"id": "recent"})
+        self.create_notifications(3, days_old=100, response=pruned_response)
+        self.create_notifications(1, days_old=100, response=kept_response)
+        self.create_notifications(1, days_old=10, response=kept_response)
+
+        pruned = NotificationsPruner.prune(batch_size=2)
+
+        self.assertEqual(pruned["notifications.Notification"], 4)
+        self.assertEqual(pruned["commons.ExternalResponse"], 1)
+        self.assertEqual(list(ExternalResponse.objects.all()), [kept_response])
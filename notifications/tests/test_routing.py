@@ -0,0 +1,97 @@
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from commons.tasks import send_sms
+from notifications.constants import NotificationTypes
+from notifications.routing import SmsRouter
+from notifications.sms import SMSProvider
+
+
+class StubSMSProvider(SMSProvider):
+    def __init__(self, name: str, *, delay: float = 0.0, is_down: bool = False):
+        self.name = name
+        self.delay = delay
+        self.is_down = is_down
+        self.calls_count = 0
+
+    def send_sms(self, phone_number: str, type: str, message: str) -> bool:
+        self.calls_count += 1
+        time.sleep(self.delay)  # A provider that is down times out
+        return not self.is_down
+
+
+@override_settings(SMS_CIRCUIT_FAILURE_THRESHOLD=3, SMS_CIRCUIT_OPEN_SECONDS=60)
+class SmsRouterTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def send(self) -> bool:
+        return send_sms(
+            phone_number="+254703456789",
+            type=NotificationTypes.OTP.value,
+            message="Your OTP is 1234",
+        )
+
+    def send_many(self, providers: list, count: int) -> list[float]:
+        """Send SMS and return the seconds each took"""
+        latencies = []
+        with patch("commons.tasks.SMS_PROVIDERS", providers):
+            for _ in range(count):
+                started_at = time.perf_counter()
+                self.assertTrue(self.send())
+                latencies.append(time.perf_counter() - started_at)
+
+        return latencies
+
+    def test_faster_provider_is_tried_first(self) -> None:
+        slow = StubSMSProvider("slow", delay=0.05)
+        fast = StubSMSProvider("fast", delay=0.001)
+
+        self.send_many([slow, fast], 10)
+
+        # Each provider is tried once, then the fast one takes the traffic
+        self.assertEqual(slow.calls_count, 1)
+        self.assertEqual(fast.calls_count, 9)
+
+    def test_provider_that_is_down_is_skipped(self) -> None:
+        down = StubSMSProvider("down", delay=0.1, is_down=True)
+        backup = StubSMSProvider("backup", delay=0.001)
+
+        latencies = self.send_many([down, backup], 20)
+
+        # Tried until its circuit opens, never after that
+        self.assertLessEqual(down.calls_count, 3)
+        self.assertEqual(backup.calls_count, 20)
+        self.assertLess(max(latencies[3:]), 0.05)
+
+    def test_open_circuit_is_retried_once_it_expires(self) -> None:
+        provider = StubSMSProvider("flaky", is_down=True)
+        backup = StubSMSProvider("backup", delay=0.01)
+        with patch("commons.tasks.SMS_PROVIDERS", [provider, backup]):
+            with override_settings(SMS_CIRCUIT_OPEN_SECONDS=0.2):
+                for _ in range(3):
+                    SmsRouter.send([provider], lambda p: p.send_sms("", "", ""))
+                self.assertEqual(SmsRouter.order([provider, backup])[0], backup)
+
+                time.sleep(0.25)
+                provider.is_down = False
+                self.assertEqual(SmsRouter.order([provider, backup])[0], provider)
+                self.assertTrue(self.send())
+
+        # The trial call closed the circuit
+        failures_key = SmsRouter.key(provider, "failures")
+        self.assertIsNone(SmsRouter.get_client(failures_key).get(failures_key))
+
+    def test_all_providers_are_tried_when_every_circuit_is_open(self) -> None:
+        down = StubSMSProvider("down", is_down=True)
+        with patch("commons.tasks.SMS_PROVIDERS", [down]):
+            for _ in range(5):
+                self.assertFalse(self.send())
+
+        self.assertEqual(down.calls_count, 5)
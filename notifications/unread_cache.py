@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from commons.raw_logger import logger
+
+# Add to the counts that are cached, missing counts are rebuilt from the db
+INCREMENT_CACHED_SCRIPT = """
+local updated = 0
+for index, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBY', key, ARGV[index])
+        updated = updated + 1
+    end
+end
+return updated
+"""
+
+
+class UnreadNotificationsCache:
+    """
+    Number of unread notifications of every user, cached in Redis.
+    Created notifications add to the counts once they commit. A missing count
+    is rebuilt from the database and never incremented, so that it can not
+    start from a partial value. Counts expire after
+    UNREAD_NOTIFICATIONS_CACHE_TIMEOUT, which bounds the drift of a count
+    rebuilt while a notification was being committed.
+    The cache is best effort, callers fall back to the database when it fails.
+    """
+
+    def key(self, user_id) -> str:
+        return cache.make_and_validate_key(f"unread_notifications:{user_id}")
+
+    def get_client(self, key: str, *, write: bool = False):
+        return cache._cache.get_client(key, write=write)  # type: ignore
+
+    def get(self, user_id) -> int | None:
+        """Get the cached count of a user, None on a miss"""
+        key = self.key(user_id)
+        try:
+            cached = self.get_client(key).get(key)
+        except RedisError as e:
+            logger.warning(f"Failed to read unread count of {user_id}: {e}")
+            return None
+
+        return None if cached is None else max(int(cached), 0)
+
+    def set(self, user_id, count: int) -> bool:
+        """Cache a count rebuilt from the database, unless one was cached since"""
+        key = self.key(user_id)
+        try:
+            return bool(
+                self.get_client(key, write=True).set(
+                    key, count, nx=True, ex=settings.UNREAD_NOTIFICATIONS_CACHE_TIMEOUT
+                )
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to write unread count of {user_id}: {e}")
+            return False
+
+    def increment_many(self, counts: dict) -> None:
+        """Add to the cached counts of the users, e.g. `{user_id: 1}`"""
+        keys = [self.key(user_id) for user_id in counts]
+        if not keys:
+            return
+
+        try:
+            self.get_client(keys[0], write=True).eval(
+                INCREMENT_CACHED_SCRIPT, len(keys), *keys, *counts.values()
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to increment unread counts: {e}")
+            self.delete_many(counts)
+
+    def delete_many(self, user_ids) -> None:
+        """Drop cached counts, they are rebuilt from the database on the next read"""
+        keys = [self.key(user_id) for user_id in user_ids]
+        if not keys:
+            return
+
+        try:
+            self.get_client(keys[0], write=True).delete(*keys)
+        except RedisError as e:
+            logger.warning(f"Failed to delete unread counts: {e}")
+
+
+UnreadCounter = UnreadNotificationsCache()
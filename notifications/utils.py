@@ -0,0 +1,46 @@
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class ProviderSession:
+    """
+    Keep-alive connections to a notifications provider.
+    The pool is shared by the threads of a worker, forked workers create
+    their own so that they never share a socket.
+    """
+
+    def __init__(self) -> None:
+        self._session: requests.Session | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self.create_session()
+                    self._pid = os.getpid()
+
+        return self._session
+
+    def create_session(self) -> requests.Session:
+        adapter = HTTPAdapter(pool_maxsize=settings.NOTIFICATIONS_POOL_SIZE)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault(
+            "timeout",
+            (
+                settings.NOTIFICATIONS_CONNECT_TIMEOUT,
+                settings.NOTIFICATIONS_READ_TIMEOUT,
+            ),
+        )
+        return self.session.post(url, **kwargs)
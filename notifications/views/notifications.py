@@ -1,8 +1,10 @@
+from django.utils.http import parse_etags, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status
 from rest_framework.generics import GenericAPIView, ListAPIView
 from rest_framework.response import Response
 
+from commons.pagination import TimeOrderedCursorPagination
 from notifications.models import Notification
 from notifications.serializers import (
     MarkNotificationsReadSerializer,
@@ -32,14 +34,30 @@ class NotificationListView(ListAPIView):
         return Notification.objects.filter(user=user)  # type: ignore
 
 
+class NotificationCursorListView(NotificationListView):
+    """List Notifications by cursor, newest first.
+    Pages are read from the index without counting or offsetting rows."""
+
+    pagination_class = TimeOrderedCursorPagination
+
+
 class UnreadNotificationCountView(GenericAPIView):
+    """The count is tagged with an ETag, polls sending it back in If-None-Match
+    get an empty 304 response until the count changes."""
+
     serializer_class = UnreadNotificationCountSerializer
 
     def get(self, request, *args, **kwargs):
-        user = request.user
-        count = Notification.objects.filter(user=user, is_read=False).count()
+        count = Notification.objects.get_unread_count(request.user)
+        headers = {
+            "ETag": quote_etag(f"unread-{count}"),
+            "Cache-Control": "private, no-cache",
+        }
+        if headers["ETag"] in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
         serializer = UnreadNotificationCountSerializer({"count": count})
-        return Response(serializer.data)
+        return Response(serializer.data, headers=headers)
 
 
 class MarkNotificationsReadView(GenericAPIView):
@@ -49,8 +67,7 @@ class MarkNotificationsReadView(GenericAPIView):
         serializer = MarkNotificationsReadSerializer(data=request.data)
         if serializer.is_valid():
             is_read = serializer.validated_data["is_read"]
-            user = request.user
-            Notification.objects.filter(user=user).update(is_read=is_read)
+            Notification.objects.mark_read(request.user, is_read=is_read)
             return Response(
                 {"message": "Notifications updated successfully."},
                 status=status.HTTP_200_OK,
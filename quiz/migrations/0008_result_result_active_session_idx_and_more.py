@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:37
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("quiz", "0007_alter_result_exits_at"),
+        ("user_sessions", "0005_duosession_duosession_parties_idx_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="result",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["session", "exits_at"],
+                name="result_active_session_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="result",
+            index=models.Index(
+                fields=["user", "session"], name="result_user_session_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="useranswer",
+            index=models.Index(
+                fields=["user", "session"], name="useranswer_user_session_idx"
+            ),
+        ),
+    ]
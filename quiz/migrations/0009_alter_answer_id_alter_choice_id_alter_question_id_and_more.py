@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:45
+
+import commons.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0008_result_result_active_session_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="answer",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="choice",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="question",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="result",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="useranswer",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
@@ -51,6 +51,14 @@ class UserAnswer(Base):
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     session = models.ForeignKey(Session, on_delete=models.CASCADE)
 
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["user", "session"], name="useranswer_user_session_idx"
+            ),
+        ]
+
 
 class Result(Base):
     """Results Model"""
@@ -98,6 +106,18 @@ class Result(Base):
         help_text="Time after which the session should be paired or refunded.",
     )
 
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            # Pairing queue and available sessions only look at active results
+            models.Index(
+                fields=["session", "exits_at"],
+                condition=models.Q(is_active=True),
+                name="result_active_session_idx",
+            ),
+            models.Index(fields=["user", "session"], name="result_user_session_idx"),
+        ]
+
     @property
     def category(self):
         return self.session.category
@@ -42,7 +42,7 @@ class QuizRequestSerializer(serializers.Serializer):
             )
 
         # 4. Assert user balance is sufficient
-        user_balance = Transaction.objects.get_user_balance(user=user)
+        user_balance = Transaction.objects.get_cached_user_balance(user=user)
         withdrawal_amount = settings.SESSION_STAKE
 
         if user_balance < withdrawal_amount:
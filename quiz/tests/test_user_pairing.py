@@ -1,12 +1,14 @@
+import math
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 from django.conf import settings
 
+from accounts.models import Transaction
 from commons.constants import DuoSessionStatuses, SessionCategories
 from commons.tests.base_tests import BaseQuizTestCase
 from quiz.models import Result
-from quiz.user_pairing import PairingService
+from quiz.user_pairing import PairingService, PairUsers
 from user_sessions.constants import SESSION_BUFFER_TIME
 from user_sessions.models import DuoSession
 from users.models import User
@@ -563,6 +565,9 @@ class TestPairInstancesTestCase(BaseQuizTestCase):
         self.pair_users.is_partial_refund = MagicMock()  # type: ignore
         self.pair_users.is_full_refund = MagicMock()  # type: ignore
         self.pair_users.create_duo_session = MagicMock()  # type: ignore
+        save_duo_sessions = patch.object(self.pair_users, "save_duo_sessions")
+        save_duo_sessions.start()
+        self.addCleanup(save_duo_sessions.stop)
         self.pair_users.is_pool_below_threshold = MagicMock()  # type: ignore
 
     def tearDown(self) -> None:
@@ -634,6 +639,22 @@ class TestPairInstancesTestCase(BaseQuizTestCase):
             winner=self.result4.user,
         )
 
+    def test_pair_instances_saves_each_batch_separately(self) -> None:
+        """Assert a run is paired and saved in batches instead of all at once."""
+        self.pair_users.is_partial_refund.return_value = True  # type: ignore
+        self.pair_users.to_exclude = []
+
+        self.pair_users.pair_instances(
+            queue_ordered_by_exits_at=Result.objects.all().order_by("exits_at"),
+            queue_ordered_by_score=Result.objects.all().order_by("score"),
+            batch_size=2,
+        )
+
+        self.assertEqual(
+            self.pair_users.save_duo_sessions.call_count,  # type: ignore
+            math.ceil(Result.objects.count() / 2),
+        )
+
     def test_get_winner_party_a_wins(self):
         winner = self.pair_users.get_winner(self.result1, self.result2)
         self.assertEqual(winner, self.result1)
@@ -691,3 +712,48 @@ class DeactivateInstancesTestCase(BaseQuizTestCase):
         # Assert that the is_active field remains unchanged
         self.assertTrue(self.result1.is_active)
         self.assertTrue(self.result2.is_active)
+
+
+class SaveDuoSessionsTestCase(BaseQuizTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.pair_users = PairUsers()
+
+    def test_save_duo_sessions_funds_wallets_in_one_batch(self) -> None:
+        """Assert duo sessions of a batch are saved together and the players are funded."""
+        duo_sessions = [
+            self.pair_users.create_duo_session(
+                party_a=self.user,
+                party_b=self.foreign_user,
+                session=self.session,
+                duo_session_status=DuoSessionStatuses.PAIRED.value,
+                winner=self.foreign_user,
+            ),
+            self.pair_users.create_duo_session(
+                party_a=self.staff_user,
+                party_b=None,
+                session=self.session,
+                duo_session_status=DuoSessionStatuses.REFUNDED.value,
+                winner=None,
+            ),
+        ]
+
+        # Unsaved duo sessions of the batch still count as recent pairings
+        self.assertFalse(DuoSession.objects.exists())
+        self.assertTrue(
+            self.pair_users.have_been_paired_recently(
+                self.foreign_user, self.user, duo_sessions
+            )
+        )
+
+        self.pair_users.save_duo_sessions(duo_sessions)
+
+        self.assertEqual(DuoSession.objects.count(), 2)
+        self.assertEqual(
+            Transaction.objects.get_user_balance(self.foreign_user),
+            int(settings.SESSION_PAYOUT_RATIO * settings.SESSION_STAKE),
+        )
+        self.assertEqual(
+            Transaction.objects.get_user_balance(self.staff_user),
+            int(settings.SESSION_REFUND_RATIO * settings.SESSION_STAKE),
+        )
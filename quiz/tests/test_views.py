@@ -65,7 +65,7 @@ class QuizViewTests(BaseUserAPITestCase):
 
     @patch("quiz.serializers.is_business_open", return_value=True)
     @patch(
-        "quiz.serializers.Transaction.objects.get_user_balance",
+        "quiz.serializers.Transaction.objects.get_cached_user_balance",
         return_value=100,
     )
     @patch(
@@ -123,7 +123,7 @@ class QuizViewTests(BaseUserAPITestCase):
 
     @patch("quiz.serializers.is_business_open", return_value=True)
     @patch(
-        "quiz.serializers.Transaction.objects.get_user_balance",
+        "quiz.serializers.Transaction.objects.get_cached_user_balance",
         return_value=100,
     )
     def test_view_fails_for_invalid_session_id(
@@ -137,7 +137,7 @@ class QuizViewTests(BaseUserAPITestCase):
 
     @patch("quiz.serializers.is_business_open", return_value=False)
     @patch(
-        "quiz.serializers.Transaction.objects.get_user_balance",
+        "quiz.serializers.Transaction.objects.get_cached_user_balance",
         return_value=100,
     )
     def test_view_fails_when_business_closed(
@@ -156,7 +156,7 @@ class QuizViewTests(BaseUserAPITestCase):
 
     @patch("quiz.serializers.is_business_open", return_value=True)
     @patch(
-        "quiz.serializers.Transaction.objects.get_user_balance",
+        "quiz.serializers.Transaction.objects.get_cached_user_balance",
         return_value=100,
     )
     def test_view_fails_when_withdrawal_request_in_queue(
@@ -180,7 +180,7 @@ class QuizViewTests(BaseUserAPITestCase):
 
     @patch("quiz.serializers.is_business_open", return_value=True)
     @patch(
-        "quiz.serializers.Transaction.objects.get_user_balance",
+        "quiz.serializers.Transaction.objects.get_cached_user_balance",
         return_value=10,
     )
     def test_view_fails_if_user_has_insufficient_balance(
@@ -203,7 +203,7 @@ class QuizViewTests(BaseUserAPITestCase):
 
     @patch("quiz.serializers.is_business_open", return_value=True)
     @patch(
-        "quiz.serializers.Transaction.objects.get_user_balance",
+        "quiz.serializers.Transaction.objects.get_cached_user_balance",
         return_value=100,
     )
     def test_view_fails_if_active_session_exists(
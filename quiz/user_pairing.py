@@ -3,6 +3,7 @@ from typing import Iterable
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Q
 from scipy.stats import skew
 
@@ -10,15 +11,12 @@ from commons.constants import DuoSessionStatuses
 from commons.raw_logger import logger
 from quiz.models import Result
 from user_sessions.models import DuoSession
+from user_sessions.utils import post_duo_session_payouts
 
 User = get_user_model()
 
 
 class PairUsers:
-    def __init__(self) -> None:
-        """Set up initial fields"""
-        pass
-
     def execute_pairing(self, category: str) -> None:
         """Orchestrate the pairing process."""
         logger.info("Executing pairing process...")
@@ -195,7 +193,9 @@ class PairUsers:
     #         return True
     #     return False
 
-    def have_been_paired_recently(self, party_a, party_b) -> bool:
+    def have_been_paired_recently(
+        self, party_a, party_b, duo_sessions: Iterable[DuoSession] = ()
+    ) -> bool:
         """Prevents system from pairing party_a to same party_b user always."""
         two_hours_ago = datetime.now() - timedelta(hours=2)
 
@@ -205,9 +205,17 @@ class PairUsers:
             created_at__gte=two_hours_ago,
         )
 
-        return paired_sessions.exists()
+        # Duo sessions of the current batch are only saved once the batch is paired
+        paired_in_current_batch = any(
+            {duo_session.party_a, duo_session.party_b} == {party_a, party_b}
+            for duo_session in duo_sessions
+        )
+
+        return paired_in_current_batch or paired_sessions.exists()
 
-    def find_closest_instance(self, target_instance, instances) -> Result | None:
+    def find_closest_instance(
+        self, target_instance, instances, duo_sessions: Iterable[DuoSession] = ()
+    ) -> Result | None:
         """
         Find the instance with the closest score to the target_instance from the given instances.
         """
@@ -240,7 +248,7 @@ class PairUsers:
                 closest_instance.total_answered == 0
                 # Can not pair to the same user within two hour time frame
                 or self.have_been_paired_recently(
-                    target_instance.user, closest_instance.user
+                    target_instance.user, closest_instance.user, duo_sessions
                 )
             ):
                 logger.info(f"No close instance found for {target_instance.id}")
@@ -256,10 +264,28 @@ class PairUsers:
         Result.objects.filter(id__in=result_ids).update(is_active=False)
 
     def pair_instances(
-        self, *, queue_ordered_by_exits_at, queue_ordered_by_score
+        self,
+        *,
+        queue_ordered_by_exits_at,
+        queue_ordered_by_score,
+        batch_size: int = 500,
     ) -> None:
+        """Pair the results in batches, each in its own short transaction"""
         logger.info("Starting pair instances service...")
-        for result in queue_ordered_by_exits_at:
+        results = list(queue_ordered_by_exits_at)
+
+        for start in range(0, len(results), batch_size):
+            queue_ordered_by_score = self.pair_batch(
+                results[start : start + batch_size], queue_ordered_by_score
+            )
+
+    @transaction.atomic
+    def pair_batch(self, results, queue_ordered_by_score):
+        """Pair a batch of results, then save their duo sessions and fund the players.
+        Returns the score-ordered queue without the results that were paired."""
+        duo_sessions: list[DuoSession] = []
+
+        for result in results:
             # Re-set default values:
             winner, party_a, party_b = None, None, None
             duo_session_status = None
@@ -288,7 +314,7 @@ class PairUsers:
                 else:
                     # Find the next instance with the closest score
                     closest_instance = self.find_closest_instance(
-                        result, queue_ordered_by_score
+                        result, queue_ordered_by_score, duo_sessions
                     )
 
                     if closest_instance:
@@ -305,13 +331,17 @@ class PairUsers:
                         instances_to_deactivate = [party_a]
 
                 self.deactivate_instances(instances_to_deactivate)
-                self.create_duo_session(
+                duo_session = self.create_duo_session(
                     party_a=party_a.user,
                     party_b=party_b.user if party_b else None,
                     session=party_a.session,
                     duo_session_status=duo_session_status,
                     winner=winner.user if winner else None,
                 )
+                duo_sessions.append(duo_session)
+
+        self.save_duo_sessions(duo_sessions)
+        return queue_ordered_by_score
 
     def get_winner(self, party_a, party_b) -> Result:
         """Return the winner between two result instances"""
@@ -329,11 +359,11 @@ class PairUsers:
         winner,
         session,
         duo_session_status: str,
-    ) -> None:
+    ) -> DuoSession:
         """Create a DuoSession instance.
-        This is the final step before funding wallets."""
+        The instance is saved with the rest of its batch in `save_duo_sessions`."""
         logger.info(f"Creating duo session with status: {duo_session_status}")
-        DuoSession.objects.create(
+        return DuoSession(
             party_a=party_a,
             party_b=party_b,
             session=session,
@@ -342,5 +372,15 @@ class PairUsers:
             winner=winner,
         )
 
+    def save_duo_sessions(self, duo_sessions: list[DuoSession]) -> None:
+        """Save the duo sessions of a batch and fund the players' wallets.
+        This is the final step of pairing a batch."""
+        if not duo_sessions:
+            return
+
+        logger.info(f"Saving {len(duo_sessions)} duo sessions...")
+        DuoSession.objects.bulk_create(duo_sessions)
+        post_duo_session_payouts(duo_sessions)
+
 
 PairingService = PairUsers()
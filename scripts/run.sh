@@ -33,4 +33,4 @@ python manage.py runserver
 
 # Start Celery in a different terminal
 # celery -A majibu.celery beat
-# celery -A majibu worker --loglevel=info
+# celery -A majibu worker -Q otp,payments,pairing,notifications,default --loglevel=info
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:37
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("user_sessions", "0004_alter_duosession_updated_at_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="duosession",
+            index=models.Index(
+                fields=["party_a", "party_b", "created_at"],
+                name="duosession_parties_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="session",
+            index=models.Index(fields=["category"], name="session_category_idx"),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:45
+
+import commons.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_sessions", "0005_duosession_duosession_parties_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="duosession",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="poolsessionstat",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="session",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="usersessionstat",
+            name="id",
+            field=models.UUIDField(
+                default=commons.models.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
@@ -51,6 +51,12 @@ class Session(Base):
     )
     _questions = models.TextField(db_column="questions")
 
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["category"], name="session_category_idx"),
+        ]
+
     @property
     def questions(self) -> list[str]:
         return self._questions.replace(" ", "").split(",")
@@ -86,6 +92,15 @@ class DuoSession(Base):
         User, on_delete=models.SET_NULL, null=True, blank=True, related_name="winner"
     )
 
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["party_a", "party_b", "created_at"],
+                name="duosession_parties_idx",
+            ),
+        ]
+
     @property
     def category(self):
         return self.session.category if self.session else None
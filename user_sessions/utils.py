@@ -1,10 +1,35 @@
+import math
 import random
+from uuid import uuid4
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Subquery
+from django.db.models import Q, Subquery, UUIDField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
 
+from accounts.constants import (
+    TransactionCashFlow,
+    TransactionServices,
+    TransactionStatuses,
+    TransactionTypes,
+)
+from accounts.models import Transaction
+from commons.constants import DuoSessionStatuses
+from commons.models import ArchivedRecord
 from commons.raw_logger import logger
+from commons.tasks import queue_pushes
+from notifications.constants import NotificationTypes, PushNotifications
 from quiz.models import Answer, Result, UserAnswer
+from user_sessions.constants import (
+    PARTIALLY_REFUND_SESSION_DESCRIPTION,
+    REFUND_SESSION_DESCRIPTION,
+    SESSION_LOSS_MESSAGE,
+    SESSION_PARTIAL_REFUND_MESSAGE,
+    SESSION_REFUND_MESSAGE,
+    SESSION_WIN_DESCRIPION,
+    SESSION_WIN_MESSAGE,
+)
 from user_sessions.models import DuoSession, Session
 
 User = get_user_model()
@@ -40,7 +65,11 @@ def mask_phone_number(phone_number: str) -> str:
 
 def get_result_answers(*, user, session) -> dict:
     logger.info(f"Getting result answers for {user.phone_number}")
-    result = Result.objects.get(user=user, session=session)
+    try:
+        result = Result.objects.get(user=user, session=session)
+    except Result.DoesNotExist:
+        result = get_archived_result(user=user, session=session)
+
     data = {
         "username": user.username,
         "phone_number": mask_phone_number(str(user.phone_number)),
@@ -50,7 +79,9 @@ def get_result_answers(*, user, session) -> dict:
         "questions": [],
     }
 
-    user_answers = UserAnswer.objects.filter(user=user, session=session)
+    user_answers = list(
+        UserAnswer.objects.filter(user=user, session=session)
+    ) or get_archived_user_answers(user=user, session=session)
     for answer in user_answers:
         correct_choice = Answer.objects.get(question=answer.question)
 
@@ -67,6 +98,37 @@ def get_result_answers(*, user, session) -> dict:
     return data
 
 
+def get_archived_result(*, user, session) -> Result:
+    """Restore the result of a session that was moved to the archive"""
+    record = (
+        ArchivedRecord.objects.of(Result)
+        .filter(user_id=user.id, data__session_id=str(session.id))
+        .first()
+    )
+    if record is None:
+        raise Result.DoesNotExist("Result matching query does not exist.")
+
+    return ArchivedRecord.objects.restore(Result, record)
+
+
+def get_archived_user_answers(*, user, session) -> list[UserAnswer]:
+    """Restore the answers of a session that were moved to the archive"""
+    records = ArchivedRecord.objects.of(UserAnswer).filter(
+        user_id=user.id, data__session_id=str(session.id)
+    )
+    return [ArchivedRecord.objects.restore(UserAnswer, record) for record in records]
+
+
+def get_archived_played_sessions(*, user):
+    """Ids of the sessions played by the user whose results were archived"""
+    return (
+        ArchivedRecord.objects.of(Result)
+        .filter(user_id=user.id)
+        .annotate(session_id=Cast(KT("data__session_id"), UUIDField()))
+        .values("session_id")
+    )
+
+
 def query_available_active_sessions(*, user, category) -> list:
     """
     Query Results model and get all results that are not paired.
@@ -85,6 +147,7 @@ def query_available_active_sessions(*, user, category) -> list:
     available_sessions = (
         Result.objects.filter(is_active=True, session__category=category)
         .exclude(session_id__in=played_sessions)
+        .exclude(session_id__in=get_archived_played_sessions(user=user))
         .values_list("session_id", flat=True)
     )
 
@@ -106,6 +169,7 @@ def query_sessions_not_played_by_user_in_category(*, user, category) -> list:
     available_sessions = (
         Session.objects.filter(category=category)
         .exclude(id__in=Subquery(played_sessions))
+        .exclude(id__in=get_archived_played_sessions(user=user))
         .values_list("id", flat=True)
     )
 
@@ -126,3 +190,139 @@ def get_available_session(*, user, category) -> str | None:
         )
 
     return random.choice(available_session_ids) if available_session_ids else None
+
+
+def create_session_transaction(
+    *, user, type: str, amount: int, description: str
+) -> Transaction:
+    """Create an unsaved inward transaction that funds a session player."""
+    return Transaction(
+        external_transaction_id=str(uuid4()),
+        cash_flow=TransactionCashFlow.INWARD.value,
+        type=type,
+        status=TransactionStatuses.SUCCESSFUL.value,
+        service=TransactionServices.MAJIBU.value,
+        amount=amount,
+        description=description,
+        user=user,
+    )
+
+
+def post_duo_session_payouts(duo_sessions: list[DuoSession]) -> None:
+    """
+    Fund the wallets of duo session players and notify them of the results.
+    Payouts for all the duo sessions are posted to the ledger at once.
+    """
+    transactions = []
+    pushes = []
+
+    for duo_session in duo_sessions:
+        category = duo_session.category
+
+        """Update party_a's wallet to reflect the partial refund"""
+        if duo_session.status == DuoSessionStatuses.PARTIALLY_REFUNDED.value:
+            logger.info(
+                f"Partially refund {duo_session.party_a.phone_number} for session {category}."
+            )
+            partial_refund_amount = math.floor(
+                settings.SESSION_PARTIAL_REFUND_RATIO * float(duo_session.amount)
+            )  # Round down to the nearest digit
+
+            transactions.append(
+                create_session_transaction(
+                    user=duo_session.party_a,
+                    type=TransactionTypes.REFUND.value,
+                    amount=partial_refund_amount,
+                    description=PARTIALLY_REFUND_SESSION_DESCRIPTION.format(
+                        duo_session.party_a.phone_number, category
+                    ),
+                )
+            )
+            pushes.append(
+                {
+                    "message": SESSION_PARTIAL_REFUND_MESSAGE.format(
+                        partial_refund_amount, category
+                    ),
+                    "user_id": duo_session.party_a.id,
+                }
+            )
+
+        """Update party_a's wallet to reflect full refund"""
+        if duo_session.status == DuoSessionStatuses.REFUNDED.value:
+            logger.info(
+                f"Refund {duo_session.party_a.phone_number} for session {category}."
+            )
+            refund_amount = math.floor(
+                settings.SESSION_REFUND_RATIO * float(duo_session.amount)
+            )  # Round down to the nearest digit
+
+            transactions.append(
+                create_session_transaction(
+                    user=duo_session.party_a,
+                    type=TransactionTypes.REFUND.value,
+                    amount=refund_amount,
+                    description=REFUND_SESSION_DESCRIPTION.format(
+                        duo_session.party_a.phone_number, category
+                    ),
+                )
+            )
+            pushes.append(
+                {
+                    "message": SESSION_REFUND_MESSAGE.format(refund_amount, category),
+                    "user_id": duo_session.party_a.id,
+                }
+            )
+
+        """Updates the winner's wallet to reflect the new amount"""
+        if duo_session.status == DuoSessionStatuses.PAIRED.value:
+            logger.info(
+                f"Fund {duo_session.winner.phone_number} for session {category}."
+            )
+            amount_won = math.floor(
+                settings.SESSION_PAYOUT_RATIO * float(duo_session.amount)
+            )  # Round down to the nearest digit
+
+            transactions.append(
+                create_session_transaction(
+                    user=duo_session.winner,
+                    type=TransactionTypes.REWARD.value,
+                    amount=amount_won,
+                    description=SESSION_WIN_DESCRIPION.format(
+                        duo_session.party_a.phone_number, category
+                    ),
+                )
+            )
+
+            # Get the opponent id
+            opponent = (
+                duo_session.party_a
+                if duo_session.winner != duo_session.party_a
+                else duo_session.party_b
+            )
+            pushes.append(
+                {
+                    "message": SESSION_WIN_MESSAGE.format(amount_won, category),
+                    "user_id": duo_session.winner.id,
+                }
+            )
+            pushes.append(
+                {
+                    "message": SESSION_LOSS_MESSAGE.format(category),
+                    "user_id": opponent.id,
+                }
+            )
+
+    Transaction.objects.bulk_post(transactions)
+    logger.info(f"Posted {len(transactions)} duo session payouts successfully.")
+
+    # Only sent to the players once their payouts are committed
+    queue_pushes(
+        [
+            {
+                "type": NotificationTypes.SESSION.value,
+                "title": PushNotifications.SESSION_RESULTS.title,
+                **push,
+            }
+            for push in pushes
+        ]
+    )
@@ -12,6 +12,7 @@ from rest_framework.generics import GenericAPIView, ListAPIView, RetrieveAPIView
 from rest_framework.response import Response
 
 from commons.errors import ErrorCodes
+from commons.filters import FullTextSearchFilter
 from commons.pagination import StandardPageNumberPagination
 from commons.permissions import IsDuoSessionPlayer, IsStaffOrSelfPermission
 from commons.utils import is_business_open
@@ -102,14 +103,9 @@ class DuoSessionListView(ListAPIView):
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
-        filters.SearchFilter,
-    ]
-    search_fields = [
-        "id",
-        "party_a__phone_number",
-        "party_b__phone_number",
-        "winner__phone_number",
+        FullTextSearchFilter,
     ]
+    search_related_fields = ["party_a", "party_b", "winner"]
     filterset_fields = ["status"]
     ordering_fields = ["created_at"]
 
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:53
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0005_alter_user_updated_at"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="user",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "phone_number", "username", config="simple"
+                ),
+                name="user_search_idx",
+            ),
+        ),
+    ]
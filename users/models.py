@@ -5,6 +5,8 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
@@ -63,6 +65,10 @@ class UserManager(BaseUserManager):
         )
 
 
+# Words staff search users by. Served by a GIN index on the same expression
+USER_SEARCH_VECTOR = SearchVector("phone_number", "username", config="simple")
+
+
 class User(AbstractBaseUser, PermissionsMixin, Base):
     """The default user model"""
 
@@ -75,6 +81,7 @@ class User(AbstractBaseUser, PermissionsMixin, Base):
     is_staff = models.BooleanField(default=False)
 
     objects = UserManager()
+    search_vector = USER_SEARCH_VECTOR
 
     USERNAME_FIELD: str = "phone_number"
     REQUIRED_FIELDS: list[str] = []  # type: ignore
@@ -88,3 +95,4 @@ class User(AbstractBaseUser, PermissionsMixin, Base):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [GinIndex(USER_SEARCH_VECTOR, name="user_search_idx")]
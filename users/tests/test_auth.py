@@ -11,8 +11,8 @@ from users.otp import create_otp
 
 
 class RegisterViewTestCase(APITestCase):
-    @patch("users.views.auth.send_push.delay")
-    @patch("users.views.auth.send_sms.delay")
+    @patch("users.views.auth.queue_pushes")
+    @patch("users.views.auth.queue_sms")
     def test_view_creates_user(self, send_sms_mock, _) -> None:
         """Assert registration view creates user."""
         data = {
@@ -46,8 +46,8 @@ class RegisterViewTestCase(APITestCase):
         self.assertFalse(user.is_staff)
         self.assertEqual(phone_number, "+254701456761")
 
-    @patch("users.views.auth.send_push.delay")
-    @patch("users.views.auth.send_sms.delay")
+    @patch("users.views.auth.queue_pushes")
+    @patch("users.views.auth.queue_sms")
     def test_view_creates_user_with_national_phone_number(
         self, send_sms_mock, _
     ) -> None:
@@ -58,8 +58,8 @@ class RegisterViewTestCase(APITestCase):
         self.assertEqual(response.status_code, 201)
         self.assertTrue(User.objects.filter(phone_number="+254701686761").exists())
 
-    @patch("users.views.auth.send_push.delay")
-    @patch("users.views.auth.send_sms.delay")
+    @patch("users.views.auth.queue_pushes")
+    @patch("users.views.auth.queue_sms")
     def test_view_throttles_requests(self, send_sms_mock, _):
         """Assert the view throttles requests."""
         data = {"phone_number": "+254701451731", "password": "passwordAl123"}
@@ -165,9 +165,9 @@ class ResendOTPVerificationTestCase(BaseUserAPITestCase):
         self.url = reverse("auth:resend-otp")
         self.data = {"phone_number": str(self.user.phone_number)}
 
-    @patch("users.views.auth.send_push.delay")
+    @patch("users.views.auth.queue_pushes")
     @patch("users.views.auth.create_otp")
-    @patch("users.views.auth.send_sms.delay")
+    @patch("users.views.auth.queue_sms")
     def test_throttling(self, mock_send_sms, mock_create_otp, _) -> None:
         for _ in range(20):  # Assuming throttle limit is 5 requests per hour
             response = self.client.post(self.url, self.data, format="json")
@@ -175,9 +175,9 @@ class ResendOTPVerificationTestCase(BaseUserAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
         AuthenticationThrottle.cache.clear()
 
-    @patch("users.views.auth.send_push.delay")
+    @patch("users.views.auth.queue_pushes")
     @patch("users.views.auth.create_otp")
-    @patch("users.views.auth.send_sms.delay")
+    @patch("users.views.auth.queue_sms")
     def test_user_is_already_verified(self, mock_send_sms, mock_create_otp, _) -> None:
         self.user.is_verified = True
         self.user.save()
@@ -185,9 +185,9 @@ class ResendOTPVerificationTestCase(BaseUserAPITestCase):
         response = self.client.post(self.url, self.data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @patch("users.views.auth.send_push.delay")
+    @patch("users.views.auth.queue_pushes")
     @patch("users.views.auth.create_otp")
-    @patch("users.views.auth.send_sms.delay")
+    @patch("users.views.auth.queue_sms")
     def test_user_does_not_exist(self, mock_send_sms, mock_create_otp, _):
         data = {"phone_number": "+254711111111"}
         response = self.client.post(self.url, data, format="json")
@@ -204,8 +204,8 @@ class PasswordResetTestCase(APITestCase):
         self.password_reset_url = reverse("auth:password-reset-request")
         self.password_reset_confirm_url = reverse("auth:password-reset-confirm")
 
-    @patch("users.views.auth.send_push.delay")
-    @patch("users.views.auth.send_sms.delay")
+    @patch("users.views.auth.queue_pushes")
+    @patch("users.views.auth.queue_sms")
     def test_view_sends_otp(self, send_sms_mock, _):
         """Assert view sends OTP to validate user"""
         response = self.client.post(
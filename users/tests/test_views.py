@@ -219,6 +219,20 @@ class UserListAPIViewTests(BaseUserAPITestCase):
         response = client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_staff_can_search_users_by_phone_number_prefix(self) -> None:
+        for search in ["+2547034567", "2547034567", "07034567"]:
+            response = self.client.get(self.list_url, {"search": search})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count"], 2)
+
+        response = self.client.get(self.list_url, {"search": "0703456785"})
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["id"], str(self.user1.id))
+
+    def test_staff_can_search_users_by_username_prefix(self) -> None:
+        response = self.client.get(self.list_url, {"search": "TestUser"})
+        self.assertEqual(response.data["count"], 2)
+
 
 class LatestAppVersionViewTest(BaseUserAPITestCase):
     def setUp(self) -> None:
@@ -6,7 +6,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from commons.tasks import send_push, send_sms
+from commons.tasks import queue_pushes, queue_sms
 from commons.throttles import AuthenticationThrottle
 from commons.utils import md5_hash
 from notifications.constants import Messages, NotificationTypes, PushNotifications
@@ -47,16 +47,20 @@ class RegisterView(CreateAPIView):
         otp = create_otp(phone_number)
 
         message = Messages.OTP_SMS.value.format(otp)
-        send_sms.delay(
+        queue_sms(
             phone_number=phone_number, type=NotificationTypes.OTP.value, message=message
         )
 
         # Send Push Notification Welcome Message
-        send_push.delay(
-            type=NotificationTypes.MARKETING.value,
-            title=PushNotifications.WELCOME_MESSAGE.title,
-            message=PushNotifications.WELCOME_MESSAGE.message,
-            user_id=user.id,
+        queue_pushes(
+            [
+                {
+                    "type": NotificationTypes.MARKETING.value,
+                    "title": PushNotifications.WELCOME_MESSAGE.title,
+                    "message": PushNotifications.WELCOME_MESSAGE.message,
+                    "user_id": user.id,
+                }
+            ]
         )
 
         return user
@@ -75,7 +79,7 @@ class ResendOTPVerificationView(GenericAPIView):
             otp = create_otp(phone_number)
 
             message = Messages.OTP_SMS.value.format(otp)
-            send_sms.delay(
+            queue_sms(
                 phone_number=phone_number,
                 type=NotificationTypes.OTP.value,
                 message=message,
@@ -124,7 +128,7 @@ class PasswordResetRequestView(GenericAPIView):
             otp = create_otp(phone_number)
 
             message = Messages.OTP_SMS.value.format(otp)
-            send_sms.delay(
+            queue_sms(
                 phone_number=phone_number,
                 type=NotificationTypes.OTP.value,
                 message=message,
@@ -9,6 +9,7 @@ from rest_framework.generics import (
 )
 from rest_framework.response import Response
 
+from commons.filters import FullTextSearchFilter
 from commons.pagination import StandardPageNumberPagination
 from commons.permissions import IsStaffOrSelfPermission, IsStaffPermission
 from users.models import User
@@ -39,9 +40,8 @@ class UserListView(ListAPIView):
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
     ]
-    search_fields = ["phone_number", "username"]
     filterset_fields = ["is_active", "is_verified", "is_staff"]
     ordering_fields = ["created_at"]
 